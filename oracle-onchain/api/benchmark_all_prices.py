@@ -0,0 +1,164 @@
+"""
+Measures /db/all-prices/ on a large price history, against the previous
+query that grouped the whole prices table by symbol, and the cost of
+keeping latest_prices current on insert.
+
+The server is copied into a temporary directory with its own
+local_settings.py and database, so the real ones are left alone. The history
+is generated inside SQLite, one price per second spread over --symbols
+symbols and --sources sources, so inserts go through the latest_prices
+trigger like the API's.
+
+Usage: poetry run python3 benchmark_all_prices.py [--rows 10000000] \
+    [--symbols 1000] [--sources 3] [--repeat 20]
+"""
+import argparse
+import importlib.util
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from werkzeug.security import generate_password_hash
+
+API_DIR = Path(__file__).resolve().parent
+API_USERNAME = "benchmark"
+API_PASSWORD = "benchmark"
+CHUNK_ROWS = 1000000
+
+# the query of /db/all-prices/ before latest_prices
+PREVIOUS_QUERY = """
+    SELECT p.*
+    FROM prices p
+    INNER JOIN (
+        SELECT symbol, MAX(created_at) AS max_created_at
+        FROM prices
+        GROUP BY symbol
+    ) latest_prices
+    ON p.symbol = latest_prices.symbol AND p.created_at = latest_prices.max_created_at
+"""
+
+INSERT_QUERY = """
+    WITH RECURSIVE seq(i) AS (
+        SELECT :first
+        UNION ALL
+        SELECT i + 1 FROM seq WHERE i < :last
+    )
+    INSERT INTO prices (
+        created_at,
+        updated_at,
+        timeframe,
+        status,
+        source,
+        asset_type,
+        symbol,
+        price,
+        bid,
+        offer,
+        sell_asset,
+        buy_asset,
+        api_username
+    )
+    SELECT
+        datetime(1700000000 + i, 'unixepoch'),
+        datetime(1700000000 + i, 'unixepoch'),
+        '1m',
+        'active',
+        i % :sources,
+        'other',
+        'A' || (i / :sources % :symbols) || 'XLM',
+        '1.' || (i % 10000),
+        '1.' || (i % 10000),
+        '1.' || (i % 10000),
+        'XLM',
+        'A' || (i / :sources % :symbols),
+        'benchmark'
+    FROM seq
+"""
+
+
+def import_server(work_dir: Path):
+    shutil.copy(API_DIR / "server.py", work_dir)
+    shutil.copy(API_DIR / "db.py", work_dir)
+    settings = {
+        "DB_PATH": str(work_dir / "db.sqlite3"),
+        "API_USERS": {API_USERNAME: generate_password_hash(API_PASSWORD)},
+        "CONTRACTS": {},
+    }
+    (work_dir / "local_settings.py").write_text(
+        "".join(f"{key} = {value!r}\n" for key, value in settings.items())
+    )
+    mod_spec = importlib.util.spec_from_file_location("server", work_dir / "server.py")
+    assert mod_spec and mod_spec.loader
+    server = importlib.util.module_from_spec(mod_spec)
+    sys.modules["server"] = server
+    mod_spec.loader.exec_module(server)
+    return server
+
+
+def measure(name: str, run, repeat: int):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = run()
+        durations.append(time.perf_counter() - start)
+    print(
+        f"{name:<32} {rows:>6} rows  median={statistics.median(durations) * 1000:9.2f} ms"
+        f"  max={max(durations) * 1000:9.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--symbols", type=int, default=1000)
+    parser.add_argument("--sources", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="benchmark_all_prices_"))
+    try:
+        server = import_server(work_dir)
+        start = time.perf_counter()
+        for first in range(1, args.rows + 1, CHUNK_ROWS):
+            last = min(first + CHUNK_ROWS - 1, args.rows)
+            with server.cursor_ctx() as cursor:
+                cursor.execute(
+                    INSERT_QUERY,
+                    {
+                        "first": first,
+                        "last": last,
+                        "sources": args.sources,
+                        "symbols": args.symbols,
+                    },
+                )
+            elapsed = time.perf_counter() - start
+            print(f"inserted {last} rows, {last / elapsed:,.0f} rows/s", end="\r")
+        print()
+
+        def run_query(query):
+            with server.cursor_ctx() as cursor:
+                cursor.execute(query)
+                return len(cursor.fetchall())
+
+        api = server.app.test_client()
+
+        def run_endpoint():
+            response = api.get(
+                "/db/all-prices/", auth=(API_USERNAME, API_PASSWORD)
+            )
+            assert response.status_code == 200
+            return len(response.json["prices"])
+
+        measure("/db/all-prices/", run_endpoint, args.repeat)
+        measure("latest_prices query", lambda: len(server.get_all_prices()), args.repeat)
+        # the previous query scans the whole table, so it is run fewer times
+        measure("previous query", lambda: run_query(PREVIOUS_QUERY), 3)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
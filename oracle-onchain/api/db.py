@@ -0,0 +1,101 @@
+"""
+SQLite access shared by the API server and feed_bulk_from_db.py.
+
+Every thread of every process (a gunicorn worker, the feeder and its worker
+threads) opens one connection on first use and keeps reusing it, so requests
+don't pay for connecting and configuring the connection, and sqlite3 reuses
+its prepared statements across queries. The database runs in WAL mode so
+readers don't block the writer and vice versa; concurrent writers wait for
+each other up to busy_timeout instead of failing with "database is locked".
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Union
+
+PRAGMAS: Dict[str, Union[str, int]] = {
+    "journal_mode": "WAL",
+    # durable up to the last checkpoint in WAL mode, without a fsync per commit
+    "synchronous": "NORMAL",
+    # in KiB when negative: 64 MiB of page cache per connection
+    "cache_size": -65536,
+    "mmap_size": 256 * 1024 * 1024,
+    # milliseconds
+    "busy_timeout": 5000,
+}
+# prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 256
+
+
+class Database:
+    def __init__(
+        self,
+        path,
+        pragmas: Optional[Dict[str, Union[str, int]]] = None,
+        detect_types: int = 0,
+    ):
+        """
+        Args:
+            path: The path of the SQLite database.
+            pragmas (Dict[str, Union[str, int]], optional): Overrides of PRAGMAS.
+            detect_types (int, optional): Passed to sqlite3.connect().
+        """
+        self.path = path
+        self.pragmas = dict(PRAGMAS, **(pragmas or {}))
+        self.detect_types = detect_types
+        self.local = threading.local()
+        self.pid = os.getpid()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            detect_types=self.detect_types,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the calling thread, opening it on first use.
+        """
+        if os.getpid() != self.pid:
+            # connections must not be used across a fork, e.g. when gunicorn
+            # preloads the app, so the child opens its own
+            self.local = threading.local()
+            self.pid = os.getpid()
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.connect()
+            self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def cursor(self):
+        """
+        Yields a cursor of the calling thread's connection, committing on
+        success and rolling back on error.
+        """
+        conn = self.connection()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        except Exception as e:
+            conn.rollback()
+            raise e
+        else:
+            conn.commit()
+        finally:
+            cursor.close()
+
+    def close(self):
+        """
+        Closes the connection of the calling thread, if any.
+        """
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
@@ -1,5 +1,8 @@
 import base64
-from decimal import Decimal
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+import hashlib
+import hmac
 import json
 import logging
 from datetime import datetime
@@ -8,10 +11,11 @@ import os
 import importlib.util
 from pathlib import Path
 from subprocess import check_output
-from contextlib import contextmanager
 import sys
+import tempfile
+import threading
+import time
 from typing import Optional
-import sqlite3
 
 from flask import Flask, Response, request
 from flask_cors import CORS
@@ -27,6 +31,15 @@ sys.modules["local_settings"] = local_settings
 assert mod_spec.loader
 mod_spec.loader.exec_module(local_settings)
 
+db_mod_spec = importlib.util.spec_from_file_location(
+    "db", Path(__file__).resolve().parent / "db.py"
+)
+assert db_mod_spec
+db = importlib.util.module_from_spec(db_mod_spec)
+sys.modules["db"] = db
+assert db_mod_spec.loader
+db_mod_spec.loader.exec_module(db)
+
 CURRENT_DIR = Path(__file__).parent.resolve()
 DATA_DIR = CURRENT_DIR / "data"
 DATA_DIR.mkdir(exist_ok=True)
@@ -38,28 +51,31 @@ logging.basicConfig(
 )
 
 LATEST_PRICES_JSON_FILE_PATH = Path(__file__).parent.resolve() / "latest_prices.json"
+# the snapshot of LATEST_PRICES_JSON_FILE_PATH last seen by this worker, see
+# get_latest_prices_snapshot()
+latest_prices_cache = {"snapshot": None}
+
+# seconds a successfully verified username and password are remembered, so
+# that polling clients don't pay for check_password_hash() on every request;
+# 0 disables the cache
+CREDENTIALS_CACHE_TTL = getattr(local_settings, "CREDENTIALS_CACHE_TTL", 300)
+CREDENTIALS_CACHE_SIZE = 1024
+# the cache is keyed by an HMAC of the credentials rather than the credentials
+# themselves, with a key that only lives in this worker's memory
+credentials_cache_key = os.urandom(32)
+credentials_cache: OrderedDict = OrderedDict()
+credentials_cache_lock = threading.Lock()
 
 auth = HTTPBasicAuth()
 auth.error_handler(lambda status: ({"error": "Unauthorized"}, status))
 db_path = getattr(local_settings, "DB_PATH", None)
 if db_path is None:
     db_path = Path(__file__).parent.resolve() / "db.sqlite3"
+database = db.Database(db_path, getattr(local_settings, "DB_PRAGMAS", None))
 
 
-@contextmanager
 def cursor_ctx():
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    try:
-        yield cursor
-    except Exception as e:
-        conn.rollback()
-        raise e
-    else:
-        conn.commit()
-    finally:
-        conn.close()
+    return database.cursor()
 
 
 def db_create_tables():
@@ -96,6 +112,106 @@ def db_create_tables():
             );
             """
         )
+        # backs the per-symbol updates done by feed_bulk_from_db.py
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS prices_source_symbol_idx
+            ON prices (source, symbol, id)
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS feed_bulk_from_db_state (
+                id                  INTEGER PRIMARY KEY CHECK (id = 1),
+                last_price_id       INTEGER NOT NULL
+            );
+            """
+        )
+        # last price fed to each contract, to skip prices that didn't move
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS feed_bulk_from_db_onchain_prices (
+                base                TEXT NOT NULL,
+                source              INTEGER NOT NULL,
+                asset               TEXT NOT NULL,
+                price               TEXT NOT NULL,
+                timestamp           INTEGER NOT NULL,
+                PRIMARY KEY (base, source, asset)
+            );
+            """
+        )
+        # batches submitted by feed_bulk_from_db.py, to confirm the ones left
+        # in flight by a crash instead of sending them again
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS feed_bulk_from_db_journal (
+                id                  INTEGER PRIMARY KEY,
+                created_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                base                TEXT NOT NULL,
+                command             TEXT NOT NULL,
+                prices              TEXT NOT NULL,
+                timestamp           INTEGER NOT NULL,
+                last_price_id       INTEGER NOT NULL,
+                max_price_id        INTEGER NOT NULL,
+                tx_hash             TEXT NULL,
+                tx_expires_at       INTEGER NULL,
+                status              TEXT NOT NULL
+            );
+            """
+        )
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS feed_bulk_from_db_journal_status_idx
+            ON feed_bulk_from_db_journal (status);
+            """
+        )
+        # latest price of each (source, symbol), kept current by a trigger in
+        # the transaction of every insert, so reading it doesn't depend on the
+        # size of the price history
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS latest_prices (
+                source              INTEGER NOT NULL,
+                symbol              TEXT NOT NULL,
+                price_id            INTEGER NOT NULL,
+                PRIMARY KEY (source, symbol)
+            );
+            """
+        )
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS latest_prices_symbol_idx
+            ON latest_prices (symbol, price_id);
+            """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS prices_latest_prices_trigger
+            AFTER INSERT ON prices
+            BEGIN
+                INSERT INTO latest_prices (source, symbol, price_id)
+                VALUES (NEW.source, NEW.symbol, NEW.id)
+                ON CONFLICT (source, symbol) DO UPDATE
+                SET price_id = excluded.price_id
+                WHERE excluded.price_id > latest_prices.price_id;
+            END;
+            """
+        )
+        # fills latest_prices from the rows inserted before the trigger existed,
+        # on every start, so a start racing another worker's inserts can't
+        # leave it behind. Like the trigger, only a newer row replaces an entry
+        cursor.execute(
+            """
+            INSERT INTO latest_prices (source, symbol, price_id)
+            SELECT source, symbol, MAX(id)
+            FROM prices
+            GROUP BY source, symbol
+            ON CONFLICT (source, symbol) DO UPDATE
+            SET price_id = excluded.price_id
+            WHERE excluded.price_id > latest_prices.price_id
+            """
+        )
 
 
 def init_app():
@@ -111,10 +227,31 @@ app = init_app()
 
 @auth.verify_password
 def verify_password(username, password):
-    if username in local_settings.API_USERS and check_password_hash(
-        local_settings.API_USERS.get(username), password
-    ):
-        return username
+    password_hash = local_settings.API_USERS.get(username)
+    if password_hash is None:
+        return None
+    # Basic auth usernames can't contain a colon, so this is unambiguous
+    digest = hmac.new(
+        credentials_cache_key, f"{username}:{password}".encode(), hashlib.sha256
+    ).digest()
+    now = time.monotonic()
+    with credentials_cache_lock:
+        cached = credentials_cache.get(digest)
+    # a cached entry only counts for the hash it was verified against, so
+    # changing or removing the user in API_USERS invalidates it
+    if cached is not None:
+        cached_password_hash, expires_at = cached
+        if cached_password_hash == password_hash and expires_at > now:
+            return username
+    if not check_password_hash(password_hash, password):
+        return None
+    if CREDENTIALS_CACHE_TTL > 0:
+        with credentials_cache_lock:
+            credentials_cache[digest] = (password_hash, now + CREDENTIALS_CACHE_TTL)
+            credentials_cache.move_to_end(digest)
+            while len(credentials_cache) > CREDENTIALS_CACHE_SIZE:
+                credentials_cache.popitem(last=False)
+    return username
 
 
 @app.before_request
@@ -163,11 +300,16 @@ def parse_source(source: Optional[str] = None):
 def parse_price(price: Optional[str] = None):
     if price is None:
         return None, "Missing payload field 'price'"
+    # Decimal() also takes a (sign, digits, exponent) sequence
+    if not isinstance(price, (str, int, float)):
+        return None, "Invalid 'price', must be a decimal number"
     try:
         price_d = Decimal(price)
-        return str(price_d), None
-    except (ValueError, TypeError):
-        return None, "Invalid 'source', must be an integer"
+    except (ValueError, TypeError, InvalidOperation):
+        return None, "Invalid 'price', must be a decimal number"
+    if not price_d.is_finite():
+        return None, "Invalid 'price', must be a decimal number"
+    return str(price_d), None
 
 
 def parse_asset_type(asset_type: Optional[str] = None):
@@ -182,6 +324,60 @@ def parse_asset_type(asset_type: Optional[str] = None):
     return asset_type, None
 
 
+# columns of a price entry posted to /db/add-prices/, in insertion order
+PRICE_ENTRY_FIELDS = (
+    "timeframe",
+    "status",
+    "source",
+    "asset_type",
+    "symbol",
+    "price",
+    "bid",
+    "offer",
+    "sell_asset",
+    "buy_asset",
+)
+OPTIONAL_PRICE_ENTRY_FIELDS = ("timeframe", "status")
+# columns stored as posted, which must be strings
+TEXT_PRICE_ENTRY_FIELDS = (
+    "timeframe",
+    "status",
+    "asset_type",
+    "symbol",
+    "sell_asset",
+    "buy_asset",
+)
+
+
+def parse_price_entry(item, api_username: str):
+    """
+    Validates a price entry posted to /db/add-prices/.
+
+    Returns:
+        The row to insert (the values of PRICE_ENTRY_FIELDS and the API
+        username), or None, and the error.
+    """
+    if not isinstance(item, dict):
+        return None, "Each price entry must be an object"
+    for field in PRICE_ENTRY_FIELDS:
+        if item.get(field) is None and field not in OPTIONAL_PRICE_ENTRY_FIELDS:
+            return None, f"Missing payload field '{field}'"
+    for field in TEXT_PRICE_ENTRY_FIELDS:
+        if item.get(field) is not None and not isinstance(item[field], str):
+            return None, f"Invalid '{field}', must be a string"
+    _, err = parse_source(item["source"])
+    if err:
+        return None, err
+    _, err = parse_asset_type(item["asset_type"])
+    if err:
+        return None, err
+    for field in ("price", "bid", "offer"):
+        _, err = parse_price(item[field])
+        if err:
+            return None, err.replace("'price'", f"'{field}'")
+    return tuple(item.get(field) for field in PRICE_ENTRY_FIELDS) + (api_username,), None
+
+
 def get_feed_bulk_from_db_latest_log():
     query = """
         SELECT
@@ -190,7 +386,7 @@ def get_feed_bulk_from_db_latest_log():
             output,
             success
         FROM feed_bulk_from_db_logs
-        ORDER BY created_at DESC LIMIT 1
+        ORDER BY id DESC LIMIT 1
     """
     with cursor_ctx() as cursor:
         cursor.execute(query)
@@ -200,6 +396,27 @@ def get_feed_bulk_from_db_latest_log():
         return entries
 
 
+def get_all_prices():
+    """
+    Returns the latest price of each symbol: the newest of the latest prices
+    of its sources, read from latest_prices.
+    """
+    query = """
+        SELECT p.*
+        FROM latest_prices lp
+        INNER JOIN prices p ON p.id = lp.price_id
+        WHERE lp.price_id = (
+            SELECT MAX(price_id)
+            FROM latest_prices
+            WHERE symbol = lp.symbol
+        )
+        ORDER BY p.id
+    """
+    with cursor_ctx() as cursor:
+        cursor.execute(query)
+        return [dict(row) for row in cursor.fetchall()]
+
+
 @app.route("/soroban/add-price/", methods=["POST", "OPTIONS"])
 @auth.login_required
 def add_price():
@@ -252,34 +469,111 @@ def get_enum_variable_name(enum_class, value):
     raise ValueError(f"Value {value} not found in the {enum_class.__name__} IntEnum.")
 
 
-def file_modified_timestamp(file_path: str | Path) -> datetime:
-    file_path = str(file_path)
-    if os.path.exists(file_path):
-        modified_timestamp = os.path.getmtime(file_path)
-        modified_datetime = datetime.utcfromtimestamp(modified_timestamp)
-        modified_datetime_utc = modified_datetime.replace(tzinfo=pytz.utc)
-        return modified_datetime_utc
-    else:
-        raise RuntimeError(f"File not found: {file_path}")
+def build_latest_prices_snapshot(prices_json: str, stat_result: os.stat_result):
+    """
+    Builds the /db/get-prices/ response of a version of latest_prices.json.
+    The file is replaced by a rename on every write, so its inode, mtime and
+    size identify the version, the same way in every worker.
+    """
+    modified_at = datetime.fromtimestamp(stat_result.st_mtime, tz=pytz.utc)
+    version = (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+    # the file already holds the JSON of the prices, so it isn't parsed
+    body = (
+        f'{{"json_modified_at":{json.dumps(modified_at.isoformat())},'
+        f'"prices":{prices_json}}}\n'
+    )
+    return {
+        "version": version,
+        "etag": "-".join(f"{part:x}" for part in version),
+        "modified_at": modified_at,
+        "body": body,
+    }
+
+
+def write_latest_prices_snapshot(prices: list):
+    """
+    Replaces latest_prices.json atomically, so that concurrent writers and
+    readers (other gunicorn workers) never see a partially written file.
+    """
+    prices_json = json.dumps(prices)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=LATEST_PRICES_JSON_FILE_PATH.parent, prefix=".latest_prices.", suffix=".json"
+    )
+    try:
+        with os.fdopen(fd, "w") as json_file:
+            os.fchmod(json_file.fileno(), 0o644)
+            json_file.write(prices_json)
+            json_file.flush()
+            stat_result = os.fstat(json_file.fileno())
+        os.replace(tmp_path, LATEST_PRICES_JSON_FILE_PATH)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    latest_prices_cache["snapshot"] = build_latest_prices_snapshot(
+        prices_json, stat_result
+    )
+
+
+def get_latest_prices_snapshot():
+    """
+    Returns the current snapshot of latest_prices.json, reading the file only
+    when another worker replaced it since it was last read.
+
+    Returns:
+        The snapshot (see build_latest_prices_snapshot), or None if no prices
+        were added yet.
+    """
+    snapshot = latest_prices_cache["snapshot"]
+    try:
+        stat_result = os.stat(LATEST_PRICES_JSON_FILE_PATH)
+    except FileNotFoundError:
+        return None
+    version = (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+    if snapshot is None or snapshot["version"] != version:
+        with open(LATEST_PRICES_JSON_FILE_PATH, "r") as json_file:
+            prices_json = json_file.read()
+            # the version of the file actually read, in case it was replaced
+            # after the stat above
+            stat_result = os.fstat(json_file.fileno())
+        snapshot = build_latest_prices_snapshot(prices_json, stat_result)
+        latest_prices_cache["snapshot"] = snapshot
+    return snapshot
 
 
 @app.route("/db/add-prices/", methods=["POST", "OPTIONS"])
 @auth.login_required
 def api_db_add_prices():
+    """
+    Add a list of prices to the database in a single transaction. Invalid
+    entries are skipped and reported in "rejected" with their index.
+    """
     data = request.json
     if not isinstance(data, list):
         return {
             "error": "The payload must be a list, each item of the list being a price entry object"
         }, 400
     api_username = get_auth_basic_username(request)
-    items = []
+    rows = []
+    accepted = []
+    rejected = []
+    for index, item in enumerate(data):
+        row, err = parse_price_entry(item, api_username)
+        if err:
+            rejected.append({"index": index, "error": err})
+        else:
+            rows.append(row)
+            accepted.append(item)
+    # a payload whose entries were all rejected is an error, an empty one isn't
+    if rejected and not rows:
+        return {
+            "success": False,
+            "inserted": 0,
+            "rejected": rejected,
+            "feed_bulk_from_db_latest_log": get_feed_bulk_from_db_latest_log(),
+        }, 400
     with cursor_ctx() as cursor:
-        for item in data:
-            item_values = dict(item)
-            item_values["api_username"] = api_username
-            items.append(item_values)
-            cursor.execute(
-                """
+        cursor.executemany(
+            """
             INSERT INTO prices (
                 timeframe,
                 status,
@@ -292,26 +586,15 @@ def api_db_add_prices():
                 sell_asset,
                 buy_asset,
                 api_username
-            ) VALUES (
-                :timeframe,
-                :status,
-                :source,
-                :asset_type,
-                :symbol,
-                :price,
-                :bid,
-                :offer,
-                :sell_asset,
-                :buy_asset,
-                :api_username
-            )
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
-                item_values,
-            )
-    with open(LATEST_PRICES_JSON_FILE_PATH, "w") as json_file:
-        json.dump(data, json_file)
+            rows,
+        )
+    write_latest_prices_snapshot(accepted)
     return {
-        "success": True,
+        "success": not rejected,
+        "inserted": len(rows),
+        "rejected": rejected,
         "feed_bulk_from_db_latest_log": get_feed_bulk_from_db_latest_log(),
     }
 
@@ -320,16 +603,20 @@ def api_db_add_prices():
 @auth.login_required
 def api_db_get_prices():
     """
-    Return latest prices added to the blockchain contract
+    Return latest prices added to the blockchain contract. Responses carry an
+    ETag and a Last-Modified header, and requests revalidating the current
+    version get a 304.
     """
-    with open(LATEST_PRICES_JSON_FILE_PATH, "r") as json_file:
-        data = json.load(json_file)
-    return {
-        "json_modified_at": file_modified_timestamp(
-            LATEST_PRICES_JSON_FILE_PATH
-        ).isoformat(),
-        "prices": data,
-    }
+    snapshot = get_latest_prices_snapshot()
+    if snapshot is None:
+        return {"error": "No prices were added yet"}, 404
+    response = Response(snapshot["body"], mimetype="application/json")
+    # clients polling with If-None-Match or If-Modified-Since get a 304 until
+    # the next /db/add-prices/
+    response.set_etag(snapshot["etag"])
+    response.last_modified = snapshot["modified_at"]
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 @app.route("/db/all-prices/", methods=["GET", "OPTIONS"])
@@ -338,18 +625,4 @@ def api_db_all_prices():
     """
     Return all prices in the database. Symbols are unique, so the latest price for each symbol is returned.
     """
-    query = """
-        SELECT p.*
-        FROM prices p
-        INNER JOIN (
-            SELECT symbol, MAX(created_at) AS max_created_at
-            FROM prices
-            GROUP BY symbol
-        ) latest_prices
-        ON p.symbol = latest_prices.symbol AND p.created_at = latest_prices.max_created_at
-    """
-    prices = []
-    with cursor_ctx() as cursor:
-        cursor.execute(query)
-        prices = [dict(row) for row in cursor.fetchall()]
-    return {"prices": prices}
+    return {"prices": get_all_prices()}
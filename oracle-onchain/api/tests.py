@@ -0,0 +1,295 @@
+"""
+Tests of the API server. As in benchmark_all_prices.py, the server is copied
+into a temporary directory with its own local_settings.py and database.
+
+Usage: poetry run python3 -m unittest tests
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from werkzeug.security import generate_password_hash
+
+from benchmark_all_prices import API_PASSWORD, API_USERNAME, import_server
+
+
+class ServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = Path(tempfile.mkdtemp(prefix="server_tests_"))
+        self.server = import_server(self.work_dir)
+        self.api = self.server.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def get_latest_prices(self):
+        with self.server.cursor_ctx() as cursor:
+            cursor.execute("SELECT source, symbol, price_id FROM latest_prices")
+            return {
+                (row["source"], row["symbol"]): row["price_id"]
+                for row in cursor.fetchall()
+            }
+
+    def build_entry(self, **fields):
+        return dict(
+            {
+                "timeframe": "1m",
+                "status": "active",
+                "source": 0,
+                "asset_type": "other",
+                "symbol": "EURXLM",
+                "price": "1.5",
+                "bid": "1.5",
+                "offer": "1.5",
+                "sell_asset": "XLM",
+                "buy_asset": "EUR",
+            },
+            **fields,
+        )
+
+    def post(self, payload):
+        return self.api.post(
+            "/db/add-prices/", json=payload, auth=(API_USERNAME, API_PASSWORD)
+        )
+
+
+class LatestPricesBackfillTests(ServerTestCase):
+    def insert_price(self, cursor, symbol: str):
+        cursor.execute(
+            """
+            INSERT INTO prices (
+                source, asset_type, symbol, price, bid, offer, sell_asset, buy_asset
+            ) VALUES (0, 'other', ?, '1.5', '1.5', '1.5', 'XLM', ?)
+            """,
+            (symbol + "XLM", symbol),
+        )
+
+    def test_backfills_a_partially_filled_table(self):
+        with self.server.cursor_ctx() as cursor:
+            # rows inserted before the trigger existed
+            cursor.execute("DROP TRIGGER prices_latest_prices_trigger")
+            for symbol in ("EUR", "USD", "EUR"):
+                self.insert_price(cursor, symbol)
+            # an entry written meanwhile, e.g. by another worker
+            cursor.execute(
+                "INSERT INTO latest_prices (source, symbol, price_id) VALUES (0, 'BRLXLM', 10)"
+            )
+        self.server.db_create_tables()
+        self.assertEqual(
+            self.get_latest_prices(),
+            {(0, "EURXLM"): 3, (0, "USDXLM"): 2, (0, "BRLXLM"): 10},
+        )
+
+    def test_doesnt_replace_newer_entries(self):
+        with self.server.cursor_ctx() as cursor:
+            for symbol in ("EUR", "USD"):
+                self.insert_price(cursor, symbol)
+            cursor.execute(
+                "UPDATE latest_prices SET price_id = 10 WHERE symbol = 'EURXLM'"
+            )
+        self.server.db_create_tables()
+        self.assertEqual(
+            self.get_latest_prices(), {(0, "EURXLM"): 10, (0, "USDXLM"): 2}
+        )
+
+
+class AddPricesTests(ServerTestCase):
+    def test_adds_prices(self):
+        response = self.post(
+            [self.build_entry(), self.build_entry(timeframe=None, status=None, price=1.6)]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["inserted"], 2)
+        self.assertEqual(response.json["rejected"], [])
+
+    def test_rejects_invalid_entries(self):
+        invalid_entries = [
+            ("symbol", ["EURXLM"]),
+            ("sell_asset", {"code": "XLM"}),
+            ("buy_asset", 1),
+            ("timeframe", ["1m"]),
+            ("status", True),
+            ("asset_type", ["other"]),
+            ("price", [0, [1, 5], -1]),
+            ("bid", {"value": "1.5"}),
+            ("source", [0]),
+        ]
+        response = self.post(
+            [self.build_entry()]
+            + [self.build_entry(**{field: value}) for field, value in invalid_entries]
+            + [self.build_entry(symbol=None), "EURXLM"]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["inserted"], 1)
+        self.assertEqual(
+            [rejection["index"] for rejection in response.json["rejected"]],
+            list(range(1, len(invalid_entries) + 3)),
+        )
+        for rejection, (field, _) in zip(response.json["rejected"], invalid_entries):
+            self.assertIn(f"'{field}'", rejection["error"])
+        self.assertEqual(self.get_latest_prices(), {(0, "EURXLM"): 1})
+
+    def test_all_entries_rejected(self):
+        response = self.post([self.build_entry(symbol=["EURXLM"])])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json["success"])
+        self.assertEqual(response.json["inserted"], 0)
+        self.assertEqual(
+            set(response.json), set(self.post([self.build_entry()]).json)
+        )
+
+    def test_empty_list(self):
+        response = self.post([])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json,
+            {
+                "success": True,
+                "inserted": 0,
+                "rejected": [],
+                "feed_bulk_from_db_latest_log": [],
+            },
+        )
+
+
+class GetPricesTests(ServerTestCase):
+    def get(self, **headers):
+        return self.api.get(
+            "/db/get-prices/", headers=headers, auth=(API_USERNAME, API_PASSWORD)
+        )
+
+    def test_not_found_before_any_prices(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("error", response.json)
+
+    def test_returns_the_latest_prices(self):
+        self.post([self.build_entry()])
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json["prices"]), 1)
+        self.assertEqual(response.json["prices"][0]["symbol"], "EURXLM")
+        self.assertTrue(response.headers["ETag"])
+        self.assertEqual(
+            response.last_modified,
+            datetime.fromisoformat(response.json["json_modified_at"]).replace(
+                microsecond=0
+            ),
+        )
+
+    def test_not_modified(self):
+        self.post([self.build_entry()])
+        response = self.get()
+        self.assertEqual(
+            self.get(**{"If-None-Match": response.headers["ETag"]}).status_code, 304
+        )
+        self.assertEqual(
+            self.get(
+                **{"If-Modified-Since": response.headers["Last-Modified"]}
+            ).status_code,
+            304,
+        )
+        self.assertEqual(self.get(**{"If-None-Match": '"other"'}).status_code, 200)
+
+    def test_new_version_after_adding_prices(self):
+        self.post([self.build_entry()])
+        etag = self.get().headers["ETag"]
+        self.post([self.build_entry(price="1.6")])
+        response = self.get(**{"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.json["prices"][0]["price"], "1.6")
+
+    def test_rereads_a_file_replaced_by_another_worker(self):
+        self.post([self.build_entry()])
+        etag = self.get().headers["ETag"]
+        # written the way another worker would, without going through this
+        # worker's cache
+        json_file_path = self.server.LATEST_PRICES_JSON_FILE_PATH
+        tmp_path = json_file_path.with_name(".latest_prices.test.json")
+        tmp_path.write_text(json.dumps([self.build_entry(symbol="USDXLM")]))
+        os.replace(tmp_path, json_file_path)
+        response = self.get(**{"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.json["prices"][0]["symbol"], "USDXLM")
+
+
+class CredentialsCacheTests(ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.check_password_hash = mock.patch.object(
+            self.server, "check_password_hash", wraps=self.server.check_password_hash
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def verify(self, username=API_USERNAME, password=API_PASSWORD):
+        return self.server.verify_password(username, password)
+
+    def test_cached_credentials_skip_the_hash_check(self):
+        self.assertEqual(self.verify(), API_USERNAME)
+        self.assertEqual(self.verify(), API_USERNAME)
+        self.assertEqual(self.check_password_hash.call_count, 1)
+        response = self.api.get("/db/get-prices/", auth=(API_USERNAME, API_PASSWORD))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.check_password_hash.call_count, 1)
+
+    def test_rejects_a_wrong_password(self):
+        self.assertEqual(self.verify(), API_USERNAME)
+        for _ in range(2):
+            self.assertIsNone(self.verify(password=API_PASSWORD + "x"))
+        self.assertEqual(self.check_password_hash.call_count, 3)
+        response = self.api.get("/db/get-prices/", auth=(API_USERNAME, "x"))
+        self.assertEqual(response.status_code, 401)
+
+    def test_changing_the_user_invalidates_the_entry(self):
+        self.assertEqual(self.verify(), API_USERNAME)
+        self.server.local_settings.API_USERS[API_USERNAME] = generate_password_hash(
+            "new password"
+        )
+        self.assertIsNone(self.verify())
+        self.assertEqual(self.verify(password="new password"), API_USERNAME)
+        self.assertEqual(self.check_password_hash.call_count, 3)
+
+    def test_removing_the_user_invalidates_the_entry(self):
+        self.assertEqual(self.verify(), API_USERNAME)
+        del self.server.local_settings.API_USERS[API_USERNAME]
+        self.assertIsNone(self.verify())
+
+    def test_entries_expire(self):
+        monotonic = mock.patch.object(self.server.time, "monotonic").start()
+        monotonic.return_value = 1000
+        self.assertEqual(self.verify(), API_USERNAME)
+        monotonic.return_value = 1000 + self.server.CREDENTIALS_CACHE_TTL - 1
+        self.assertEqual(self.verify(), API_USERNAME)
+        self.assertEqual(self.check_password_hash.call_count, 1)
+        monotonic.return_value = 1000 + self.server.CREDENTIALS_CACHE_TTL
+        self.assertEqual(self.verify(), API_USERNAME)
+        self.assertEqual(self.check_password_hash.call_count, 2)
+
+    def test_zero_ttl_disables_the_cache(self):
+        self.server.CREDENTIALS_CACHE_TTL = 0
+        for _ in range(2):
+            self.assertEqual(self.verify(), API_USERNAME)
+        self.assertEqual(self.check_password_hash.call_count, 2)
+        self.assertEqual(len(self.server.credentials_cache), 0)
+
+    def test_cache_is_bounded(self):
+        self.server.CREDENTIALS_CACHE_SIZE = 2
+        usernames = ["user1", "user2", "user3"]
+        for username in usernames:
+            self.server.local_settings.API_USERS[username] = generate_password_hash(
+                API_PASSWORD
+            )
+            self.assertEqual(self.verify(username), username)
+        self.assertEqual(len(self.server.credentials_cache), 2)
+        # the least recently used entry was evicted
+        self.assertEqual(self.verify("user3"), "user3")
+        self.assertEqual(self.check_password_hash.call_count, 3)
+        self.assertEqual(self.verify("user1"), "user1")
+        self.assertEqual(self.check_password_hash.call_count, 4)
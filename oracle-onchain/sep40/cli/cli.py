@@ -1,3 +1,8 @@
+import time
+
+STARTED_AT = time.perf_counter()
+
+import atexit
 import base64
 import enum
 import importlib.util
@@ -9,13 +14,14 @@ from typing import NoReturn, Optional
 from colorama import init as colorama_init
 from colorama import Fore
 from colorama import Style
-from lightecho_stellar_oracle import InsufficientBalance, OracleClient
-import requests
-from stellar_sdk import Keypair
-from stellar_sdk import scval
-from stellar_sdk.soroban_server import SorobanServer
 import typer
 
+# the SDK (and stellar_sdk with it) and requests are imported by the commands
+# that use them, so that --help and the rpc commands start fast
+
+# (phase, time at its end), see mark_phase()
+phases = [("imports", time.perf_counter())]
+
 mod_spec = importlib.util.spec_from_file_location(
     "local_settings", Path(__file__).resolve().parent / "local_settings.py"
 )
@@ -24,6 +30,7 @@ local_settings = importlib.util.module_from_spec(mod_spec)
 sys.modules["local_settings"] = local_settings
 assert mod_spec.loader
 mod_spec.loader.exec_module(local_settings)
+phases.append(("local_settings", time.perf_counter()))
 
 MAX_DECIMAL_PLACES = 18
 EXIT_CODE_INSUFFICIENT_BALANCE = 2
@@ -37,6 +44,7 @@ app.add_typer(rpc_app, name="rpc")
 
 state = {
     "verbose": False,
+    "read_mode": "transaction",
     "source_secret": local_settings.SOURCE_SECRET,
     "admin_secret": local_settings.ADMIN_SECRET,
     "oracle_contract_id": local_settings.ORACLE_CONTRACT_ID,
@@ -45,13 +53,7 @@ state = {
     "horizon_url": local_settings.HORIZON_URL,
     "add_prices_success_heartbeat_url": local_settings.ADD_PRICES_SUCCESS_HEARTBEAT_URL,
 }
-state["kp"] = Keypair.from_secret(state["source_secret"])
-state["admin_kp"] = Keypair.from_secret(state["admin_secret"])
-state["soroban_server"] = SorobanServer(state["rpc_server_url"])
-state["source_acc"] = state["soroban_server"].load_account(state["kp"].public_key)
-state["admin_source_acc"] = state["soroban_server"].load_account(
-    state["admin_kp"].public_key
-)
+phases.append(("cli setup", time.perf_counter()))
 
 
 class AssetType(enum.Enum):
@@ -73,16 +75,58 @@ def vprint(msg: str):
         print(msg)
 
 
+def mark_phase(name: str):
+    phases.append((name, time.perf_counter()))
+
+
+def print_phases():
+    mark_phase("command")
+    print("Startup timings:", file=sys.stderr)
+    previous = STARTED_AT
+    for name, ended_at in phases:
+        print(f"  {name:<16} {(ended_at - previous) * 1000:8.1f} ms", file=sys.stderr)
+        previous = ended_at
+    print(f"  {'total':<16} {(previous - STARTED_AT) * 1000:8.1f} ms", file=sys.stderr)
+
+
+def get_oracle_client(admin: bool = False):
+    """
+    Returns the OracleClient signing with the source account, or with the
+    admin account, creating it on first use.
+    """
+    key = "admin_oracle_client" if admin else "oracle_client"
+    if key not in state:
+        from lightecho_stellar_oracle import OracleClient
+        from stellar_sdk import Keypair
+
+        mark_phase("sdk import")
+        state[key] = OracleClient(
+            contract_id=state["oracle_contract_id"],
+            signer=Keypair.from_secret(
+                state["admin_secret"] if admin else state["source_secret"]
+            ),
+            network="custom",
+            custom_rpc_url=state["rpc_server_url"],
+            custom_network_passphrase=str(state["network_passphrase"]),
+            read_mode=state["read_mode"],
+        )
+        mark_phase("oracle client")
+    return state[key]
+
+
 def print_contract_output(tx_hash, tx_data):
     print("Output:")
     print(tx_data)
-    print("Horizon tx:")
-    print(f"{state['horizon_url']}/transactions/{tx_hash}")
+    if tx_hash is not None:
+        print("Horizon tx:")
+        print(f"{state['horizon_url']}/transactions/{tx_hash}")
     print()
     print("Success!")
 
 
 def perform_rpc_request(payload: dict):
+    import requests
+
     resp = requests.post(
         state["rpc_server_url"],
         json=payload,
@@ -99,8 +143,10 @@ def invoke_oracle_client_function_and_print_output(function_name, *args, **kwarg
     Wraps the invocation of an OracleClient function and prints the output.
     Handles specific exceptions and exits with the appropriate code.
     """
+    from lightecho_stellar_oracle import InsufficientBalance
+
     try:
-        tx_hash, tx_data = getattr(state["oracle_client"], function_name)(
+        tx_hash, tx_data = getattr(get_oracle_client(), function_name)(
             *args, **kwargs
         )
     except InsufficientBalance:
@@ -114,8 +160,10 @@ def invoke_oracle_admin_function_and_print_output(function_name, *args, **kwargs
     output.
     Handles specific exceptions and exits with the appropriate code.
     """
+    from lightecho_stellar_oracle import InsufficientBalance
+
     try:
-        tx_hash, tx_data = getattr(state["admin_oracle_client"], function_name)(
+        tx_hash, tx_data = getattr(get_oracle_client(admin=True), function_name)(
             *args, **kwargs
         )
     except InsufficientBalance:
@@ -124,6 +172,8 @@ def invoke_oracle_admin_function_and_print_output(function_name, *args, **kwargs
 
 
 def build_asset_enum(asset_type: AssetType, asset: str):
+    from stellar_sdk import scval
+
     if asset_type == AssetType.stellar:
         return scval.to_enum("Stellar", scval.to_address(asset))
     elif asset_type == AssetType.other:
@@ -242,6 +292,10 @@ def oracle_add_price(
         ...,
         help="Timestamp",
     ),
+    light: bool = typer.Option(
+        False,
+        help="Invoke add_prices_light() instead, for an already registered source and asset (publishes no newprices event)",
+    ),
 ):
     prices = [
         {
@@ -252,8 +306,12 @@ def oracle_add_price(
             "timestamp": timestamp,
         }
     ]
-    invoke_oracle_admin_function_and_print_output("add_prices", prices)
+    invoke_oracle_admin_function_and_print_output(
+        "add_prices_light" if light else "add_prices", prices
+    )
     if state["add_prices_success_heartbeat_url"]:
+        import requests
+
         requests.get(state["add_prices_success_heartbeat_url"])
     else:
         print_error("No ADD_PRICES_SUCCESS_HEARTBEAT_URL set")
@@ -264,11 +322,17 @@ def oracle_add_prices_base64(
     prices_base64: str = typer.Argument(
         ...,
         help='A base64-encoded JSON list of prices. Each item in the list must be a dictionary, example: {"source": 0, "asset_type": "other", "asset": "USD", "price": "1.00", "timestamp": 12345678}',
-    )
+    ),
+    light: bool = typer.Option(
+        False,
+        help="Invoke add_prices_light() instead, for already registered sources and assets (publishes no newprices event)",
+    ),
 ):
     decoded_bytes = base64.b64decode(prices_base64)
     decoded_list = json.loads(decoded_bytes)
-    invoke_oracle_admin_function_and_print_output("add_prices", decoded_list)
+    invoke_oracle_admin_function_and_print_output(
+        "add_prices_light" if light else "add_prices", decoded_list
+    )
 
 
 @oracle_app.command("base", help="oracle: invoke base()")
@@ -366,26 +430,26 @@ def rpc_get_events(start_ledger: int, pagination_limit: Optional[int] = 2):
 def main(
     verbose: bool = typer.Option(False, "-v", "--verbose"),
     oracle_contract_id: Optional[str] = typer.Option(None, "--oracle-contract-id"),
+    simulate_reads: bool = typer.Option(
+        False,
+        "--simulate-reads",
+        help="Answer read-only oracle commands from a transaction simulation instead of sending a transaction",
+    ),
+    timings: bool = typer.Option(
+        False,
+        "--timings",
+        help="Print how long each startup phase and the command took, to stderr",
+    ),
 ):
     if verbose:
         state["verbose"] = True
     if oracle_contract_id:
         state["oracle_contract_id"] = oracle_contract_id
-
-    state["oracle_client"] = OracleClient(
-        contract_id=state["oracle_contract_id"],
-        signer=Keypair.from_secret(state["source_secret"]),
-        network="custom",
-        custom_rpc_url=state["rpc_server_url"],
-        custom_network_passphrase=state["network_passphrase"],
-    )
-    state["admin_oracle_client"] = OracleClient(
-        contract_id=state["oracle_contract_id"],
-        signer=Keypair.from_secret(state["admin_secret"]),
-        network="custom",
-        custom_rpc_url=state["rpc_server_url"],
-        custom_network_passphrase=str(state["network_passphrase"]),
-    )
+    if simulate_reads:
+        state["read_mode"] = "simulation"
+    if timings:
+        atexit.register(print_phases)
+    # the oracle clients are created on first use, see get_oracle_client()
 
 
 if __name__ == "__main__":
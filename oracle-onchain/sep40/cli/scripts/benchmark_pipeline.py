@@ -0,0 +1,222 @@
+"""
+Measures the throughput of the whole price pipeline offline: prices are
+posted to the API (/db/add-prices/), fed by feed_bulk_from_db.py and sent by
+OracleClient to a local fake Soroban RPC (see fake_soroban_rpc.py), so the
+numbers can be compared before and after a performance change without
+touching testnet.
+
+The API and the feeder are copied into a temporary directory with their own
+local_settings.py and database, so the real ones are left alone. Every cycle
+posts one price per asset and runs one feeder cycle; the once-per-resolution
+gate of the feeder is disabled so that consecutive cycles all feed.
+
+Usage: poetry run python3 benchmark_pipeline.py [--cycles 10] [--assets 100] \
+    [--bases 1] [--batch-size 10] [--ledger-close-time 1] [--latency 0] \
+    [--pipelined]
+
+Besides the CLI dependencies, the interpreter needs the ones of the API
+(flask, flask-cors, flask-httpauth, pytz).
+"""
+import argparse
+import importlib.util
+import json
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from stellar_sdk import Keypair, Network, StrKey
+from werkzeug.security import generate_password_hash
+
+from fake_soroban_rpc import FakeSorobanRpc, build_results
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+API_DIR = SCRIPTS_DIR.parent.parent.parent / "api"
+API_USERNAME = "benchmark"
+API_PASSWORD = "benchmark"
+
+
+def import_copy(path: Path, name: str):
+    mod_spec = importlib.util.spec_from_file_location(name, path)
+    assert mod_spec and mod_spec.loader
+    module = importlib.util.module_from_spec(mod_spec)
+    sys.modules[name] = module
+    mod_spec.loader.exec_module(module)
+    return module
+
+
+def write_settings(path: Path, **settings):
+    path.write_text("".join(f"{key} = {value!r}\n" for key, value in settings.items()))
+
+
+def setup(work_dir: Path, rpc: FakeSorobanRpc, bases, batch_size: int):
+    """
+    Lays out copies of the API and the feeder under work_dir, mirroring the
+    repository layout, and imports them.
+    """
+    db_path = str(work_dir / "api" / "db.sqlite3")
+    api_dir = work_dir / "api"
+    scripts_dir = work_dir / "sep40" / "cli" / "scripts"
+    api_dir.mkdir(parents=True)
+    scripts_dir.mkdir(parents=True)
+    shutil.copy(API_DIR / "server.py", api_dir)
+    shutil.copy(API_DIR / "db.py", api_dir)
+    shutil.copy(SCRIPTS_DIR / "feed_bulk_from_db.py", scripts_dir)
+    write_settings(
+        api_dir / "local_settings.py",
+        DB_PATH=db_path,
+        API_USERS={API_USERNAME: generate_password_hash(API_PASSWORD)},
+        CONTRACTS={},
+    )
+    write_settings(
+        scripts_dir.parent / "local_settings.py",
+        API_DB_PATH=db_path,
+        ADMIN_SECRET=Keypair.random().secret,
+        ORACLE_CONTRACTS={
+            base: StrKey.encode_contract(Keypair.random().raw_public_key())
+            for base in bases
+        },
+        # every base but the first sends from its own account, as in production
+        ORACLE_CONTRACT_SOURCE_SECRETS={
+            base: Keypair.random().secret for base in bases[1:]
+        },
+        RPC_URL=rpc.url,
+        NETWORK_PASSPHRASE=rpc.network_passphrase,
+    )
+    # the server logs to api/data/server.log, and so does the feeder once the
+    # root logger is configured
+    server = import_copy(api_dir / "server.py", "server")
+    feeder = import_copy(scripts_dir / "feed_bulk_from_db.py", "feed_bulk_from_db")
+    feeder.BATCH_SIZE = batch_size
+    return server, feeder
+
+
+def build_payload(bases, assets, prices):
+    payload = []
+    for base in bases:
+        for asset in assets:
+            prices[(base, asset)] *= 1 + random.uniform(-0.01, 0.01)
+            price = f"{prices[(base, asset)]:.8f}"
+            payload.append(
+                {
+                    "timeframe": "1m",
+                    "status": "active",
+                    "source": 0,
+                    "asset_type": "other",
+                    "symbol": f"{asset}{base}",
+                    "price": price,
+                    "bid": price,
+                    "offer": price,
+                    "sell_asset": base,
+                    "buy_asset": asset,
+                }
+            )
+    return payload
+
+
+def count_fed_prices(feeder) -> int:
+    with feeder.cursor_ctx() as cursor:
+        cursor.execute(
+            "SELECT prices FROM feed_bulk_from_db_journal WHERE status = 'success'"
+        )
+        return sum(len(json.loads(row["prices"])) for row in cursor.fetchall())
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, round(q * (len(values) - 1)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--assets", type=int, default=100, help="assets per base")
+    parser.add_argument("--bases", type=int, default=1, help="contracts to feed")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--ledger-close-time", type=float, default=1.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="per RPC call")
+    parser.add_argument("--pipelined", action="store_true")
+    args = parser.parse_args()
+
+    bases = ["XLM"] + [f"B{i}" for i in range(1, args.bases)]
+    assets = [f"A{i:04d}" for i in range(args.assets)]
+    prices = {(base, asset): random.uniform(0.1, 10) for base in bases for asset in assets}
+    rpc = FakeSorobanRpc(
+        build_results(assets, [0]),
+        network_passphrase=Network.TESTNET_NETWORK_PASSPHRASE,
+        ledger_close_time=args.ledger_close_time,
+        latency=args.latency,
+    )
+    rpc.start()
+    work_dir = Path(tempfile.mkdtemp(prefix="benchmark_pipeline_"))
+    try:
+        server, feeder = setup(work_dir, rpc, bases, args.batch_size)
+        feeder.get_latest_fed_window = lambda: None
+        api = server.app.test_client()
+        ingest_durations, feed_durations = [], []
+        rpc_calls: Counter = Counter()
+        started_at = time.perf_counter()
+        for cycle in range(args.cycles):
+            payload = build_payload(bases, assets, prices)
+            start = time.perf_counter()
+            response = api.post(
+                "/db/add-prices/",
+                json=payload,
+                auth=(API_USERNAME, API_PASSWORD),
+            )
+            assert response.status_code == 200, response.get_data(as_text=True)
+            ingest_durations.append(time.perf_counter() - start)
+
+            rpc.reset_calls()
+            start = time.perf_counter()
+            feeder.read_prices_from_db(args.pipelined)
+            feed_durations.append(time.perf_counter() - start)
+            rpc_calls.update(rpc.calls)
+            with feeder.cursor_ctx() as cursor:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM prices WHERE added_to_blockchain = 0"
+                )
+                pending = cursor.fetchone()[0]
+            print(
+                f"cycle {cycle + 1}/{args.cycles}: ingest "
+                f"{ingest_durations[-1] * 1000:.1f} ms, feed "
+                f"{feed_durations[-1]:.2f} s, {pending} prices pending"
+            )
+        elapsed = time.perf_counter() - started_at
+        fed = count_fed_prices(feeder)
+    finally:
+        rpc.stop()
+        shutil.rmtree(work_dir)
+
+    print()
+    print(
+        f"{fed} prices fed in {elapsed:.2f} s: {fed / elapsed:.1f} prices/s "
+        f"({'pipelined' if args.pipelined else 'sequential'}, {len(bases)} bases, "
+        f"{args.assets} assets, batches of {args.batch_size}, ledger close time "
+        f"{args.ledger_close_time} s, RPC latency {args.latency * 1000:.0f} ms)"
+    )
+    for name, durations, unit, scale in (
+        ("ingest", ingest_durations, "ms", 1000),
+        ("feed cycle", feed_durations, "s", 1),
+    ):
+        print(
+            f"{name:<11}"
+            + "".join(
+                f" {label}={percentile(durations, q) * scale:.2f}{unit}"
+                for label, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+            )
+            + f" mean={statistics.mean(durations) * scale:.2f}{unit}"
+        )
+    print("RPC calls   " + " ".join(f"{m}={n}" for m, n in sorted(rpc_calls.items())))
+    print(
+        "RPC calls per cycle "
+        + " ".join(f"{m}={n / args.cycles:.1f}" for m, n in sorted(rpc_calls.items()))
+    )
+
+
+if __name__ == "__main__":
+    main()
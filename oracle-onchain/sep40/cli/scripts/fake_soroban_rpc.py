@@ -0,0 +1,396 @@
+"""
+Local stand-in for a Soroban RPC server, to exercise the SDK and the feeder
+offline (see benchmark_pipeline.py).
+
+It implements simulateTransaction, sendTransaction, getTransaction,
+getLatestLedger, getEvents, getLedgerEntries (accounts only) and getFeeStats.
+Ledgers close every `ledger_close_time` seconds, and every request is delayed
+by `latency` seconds. Contracts are not executed and signatures are not
+verified: read-only functions return the canned values of `results`, and
+every other call succeeds and returns void. Like stellar-core, it accepts one
+transaction per source account per ledger, answering TRY_AGAIN_LATER to the
+others, and rejects unexpected sequence numbers with txBAD_SEQ.
+
+Transactions bidding an inclusion fee (per operation) below
+`min_inclusion_fee` are rejected with txINSUFFICIENT_FEE, the minimum being
+reported in feeCharged. The ones bidding less than `queue_inclusion_fee` are
+accepted but stay in the queue, never included, until a fee bump bidding at
+least that much replaces them.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from stellar_sdk import Keypair, MuxedAccount, Network, scval, xdr as stellar_xdr
+from stellar_sdk.helpers import parse_transaction_envelope_from_xdr
+
+PROTOCOL_VERSION = 20
+FIRST_LEDGER = 1000
+INITIAL_SEQUENCE = FIRST_LEDGER << 32
+RESOURCE_FEE = 50000
+
+
+def build_asset(asset: str) -> stellar_xdr.SCVal:
+    return scval.to_vec([scval.to_symbol("Other"), scval.to_symbol(asset)])
+
+
+def build_results(assets, sources, resolution: int = 600) -> Dict[str, Any]:
+    """
+    Returns the values of the read-only functions of an oracle contract with
+    the given assets ("other" assets only) and sources.
+    """
+    return {
+        "base": build_asset("XLM"),
+        "decimals": scval.to_uint32(18),
+        "resolution": scval.to_uint32(resolution),
+        "assets": scval.to_vec([build_asset(asset) for asset in assets]),
+        "sources": scval.to_vec([scval.to_uint32(source) for source in sources]),
+    }
+
+
+class FakeSorobanRpc:
+    def __init__(
+        self,
+        results: Dict[str, stellar_xdr.SCVal],
+        network_passphrase: str = Network.TESTNET_NETWORK_PASSPHRASE,
+        ledger_close_time: float = 5.0,
+        latency: float = 0.0,
+        port: int = 0,
+        min_inclusion_fee: int = 0,
+        queue_inclusion_fee: int = 0,
+    ):
+        self.results = results
+        self.network_passphrase = network_passphrase
+        self.ledger_close_time = ledger_close_time
+        self.latency = latency
+        self.min_inclusion_fee = min_inclusion_fee
+        self.queue_inclusion_fee = queue_inclusion_fee
+        self.started_at = time.time()
+        self.calls: Counter = Counter()
+        self.lock = threading.Lock()
+        # account id -> sequence number
+        self.accounts: Dict[str, int] = {}
+        # account id -> ledger in which its last transaction was accepted
+        self.account_ledgers: Dict[str, int] = {}
+        # hash -> (ledger, envelope, function name); the ledger is None while
+        # the transaction waits in the queue
+        self.transactions: Dict[str, tuple] = {}
+        self.http_server = ThreadingHTTPServer(
+            ("127.0.0.1", port), self.build_handler()
+        )
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.http_server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.http_server.serve_forever, daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+
+    def reset_calls(self):
+        with self.lock:
+            self.calls.clear()
+
+    def latest_ledger(self) -> int:
+        return FIRST_LEDGER + int(
+            (time.time() - self.started_at) / self.ledger_close_time
+        )
+
+    def ledger_close_time_of(self, ledger: int) -> int:
+        return int(
+            self.started_at + (ledger - FIRST_LEDGER) * self.ledger_close_time
+        )
+
+    def build_handler(self):
+        rpc = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if rpc.latency:
+                    time.sleep(rpc.latency)
+                response = {"jsonrpc": "2.0", "id": body.get("id")}
+                try:
+                    response["result"] = rpc.handle(
+                        body["method"], body.get("params") or {}
+                    )
+                except KeyError as e:
+                    response["error"] = {"code": -32601, "message": str(e)}
+                output = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(output)))
+                self.end_headers()
+                self.wfile.write(output)
+
+        return Handler
+
+    def handle(self, method: str, params: dict) -> dict:
+        with self.lock:
+            self.calls[method] += 1
+            handler = {
+                "simulateTransaction": self.simulate_transaction,
+                "sendTransaction": self.send_transaction,
+                "getTransaction": self.get_transaction,
+                "getLatestLedger": self.get_latest_ledger,
+                "getEvents": self.get_events,
+                "getLedgerEntries": self.get_ledger_entries,
+                "getFeeStats": self.get_fee_stats,
+            }[method]
+            return handler(params)
+
+    def simulate_transaction(self, params: dict) -> dict:
+        tx = parse_transaction(params["transaction"])
+        function_name = get_function_name(tx)
+        result = self.results.get(function_name, scval.to_void())
+        transaction_data = stellar_xdr.SorobanTransactionData(
+            ext=stellar_xdr.ExtensionPoint(0),
+            resources=stellar_xdr.SorobanResources(
+                footprint=stellar_xdr.LedgerFootprint([], []),
+                instructions=stellar_xdr.Uint32(1000000),
+                read_bytes=stellar_xdr.Uint32(10000),
+                write_bytes=stellar_xdr.Uint32(1000),
+            ),
+            resource_fee=stellar_xdr.Int64(RESOURCE_FEE),
+        )
+        return {
+            "transactionData": transaction_data.to_xdr(),
+            "minResourceFee": str(RESOURCE_FEE),
+            "events": [],
+            "results": [{"auth": [], "xdr": result.to_xdr()}],
+            "cost": {"cpuInsns": "1000000", "memBytes": "100000"},
+            "latestLedger": self.latest_ledger(),
+        }
+
+    def send_transaction(self, params: dict) -> dict:
+        envelope = stellar_xdr.TransactionEnvelope.from_xdr(params["transaction"])
+        tx = parse_transaction(params["transaction"])
+        parsed_envelope = parse_transaction_envelope_from_xdr(
+            params["transaction"], self.network_passphrase
+        )
+        tx_hash = parsed_envelope.hash_hex()
+        latest_ledger = self.latest_ledger()
+        response = {
+            "hash": tx_hash,
+            "latestLedger": latest_ledger,
+            "latestLedgerCloseTime": str(self.ledger_close_time_of(latest_ledger)),
+        }
+        if tx_hash in self.transactions:
+            return dict(response, status="DUPLICATE")
+        inclusion_fee = get_inclusion_fee(envelope)
+        if inclusion_fee < self.min_inclusion_fee:
+            error_result = build_transaction_result(
+                self.min_inclusion_fee * len(tx.operations),
+                stellar_xdr.TransactionResultCode.txINSUFFICIENT_FEE,
+            )
+            return dict(response, status="ERROR", errorResultXdr=error_result.to_xdr())
+        if envelope.fee_bump is not None:
+            inner_hash = parsed_envelope.transaction.inner_transaction_envelope.hash_hex()
+            queued = self.transactions.get(inner_hash)
+            if queued is not None and queued[0] is None:
+                if inclusion_fee < self.queue_inclusion_fee:
+                    error_result = build_transaction_result(
+                        self.queue_inclusion_fee * (len(tx.operations) + 1),
+                        stellar_xdr.TransactionResultCode.txINSUFFICIENT_FEE,
+                    )
+                    return dict(
+                        response, status="ERROR", errorResultXdr=error_result.to_xdr()
+                    )
+                del self.transactions[inner_hash]
+                self.transactions[tx_hash] = (latest_ledger, envelope, queued[2])
+                return dict(response, status="PENDING")
+        account_id = get_account_id(tx.source_account)
+        sequence = self.accounts.get(account_id, INITIAL_SEQUENCE)
+        if self.account_ledgers.get(account_id) == latest_ledger:
+            return dict(response, status="TRY_AGAIN_LATER")
+        if tx.seq_num.sequence_number.int64 != sequence + 1:
+            error_result = build_transaction_result(
+                0, stellar_xdr.TransactionResultCode.txBAD_SEQ
+            )
+            return dict(response, status="ERROR", errorResultXdr=error_result.to_xdr())
+        self.accounts[account_id] = sequence + 1
+        self.account_ledgers[account_id] = latest_ledger
+        ledger = latest_ledger if inclusion_fee >= self.queue_inclusion_fee else None
+        self.transactions[tx_hash] = (ledger, envelope, get_function_name(tx))
+        return dict(response, status="PENDING")
+
+    def get_transaction(self, params: dict) -> dict:
+        latest_ledger = self.latest_ledger()
+        response = {
+            "latestLedger": latest_ledger,
+            "latestLedgerCloseTime": str(self.ledger_close_time_of(latest_ledger)),
+            "oldestLedger": FIRST_LEDGER,
+            "oldestLedgerCloseTime": str(self.ledger_close_time_of(FIRST_LEDGER)),
+        }
+        transaction = self.transactions.get(params["hash"])
+        # included when the ledger following its submission closes
+        if (
+            transaction is None
+            or transaction[0] is None
+            or transaction[0] >= latest_ledger
+        ):
+            return dict(response, status="NOT_FOUND")
+        ledger, envelope, function_name = transaction
+        result = self.results.get(function_name, scval.to_void())
+        fee = envelope.v1.tx.fee.uint32 if envelope.v1 else envelope.fee_bump.tx.fee.int64
+        return dict(
+            response,
+            status="SUCCESS",
+            applicationOrder=1,
+            feeBump=envelope.fee_bump is not None,
+            envelopeXdr=envelope.to_xdr(),
+            resultXdr=build_transaction_result(
+                fee, stellar_xdr.TransactionResultCode.txSUCCESS
+            ).to_xdr(),
+            resultMetaXdr=build_transaction_meta(result).to_xdr(),
+            ledger=ledger + 1,
+            createdAt=str(self.ledger_close_time_of(ledger + 1)),
+        )
+
+    def get_latest_ledger(self, params: dict) -> dict:
+        latest_ledger = self.latest_ledger()
+        return {
+            "id": hashlib.sha256(str(latest_ledger).encode()).hexdigest(),
+            "protocolVersion": PROTOCOL_VERSION,
+            "sequence": latest_ledger,
+        }
+
+    def get_events(self, params: dict) -> dict:
+        return {"events": [], "latestLedger": self.latest_ledger()}
+
+    def get_ledger_entries(self, params: dict) -> dict:
+        entries = []
+        for key_xdr in params["keys"]:
+            key = stellar_xdr.LedgerKey.from_xdr(key_xdr)
+            if key.account is None:
+                continue
+            account_id = Keypair.from_raw_ed25519_public_key(
+                key.account.account_id.account_id.ed25519.uint256
+            ).public_key
+            entries.append(
+                {
+                    "key": key_xdr,
+                    "xdr": build_account_entry(
+                        key.account.account_id,
+                        self.accounts.get(account_id, INITIAL_SEQUENCE),
+                    ).to_xdr(),
+                    "lastModifiedLedgerSeq": FIRST_LEDGER,
+                }
+            )
+        return {"entries": entries, "latestLedger": self.latest_ledger()}
+
+    def get_fee_stats(self, params: dict) -> dict:
+        percentiles = {"max": "100", "min": "100", "mode": "100", "p90": "100"}
+        return {
+            "sorobanInclusionFee": percentiles,
+            "inclusionFee": percentiles,
+            "latestLedger": self.latest_ledger(),
+        }
+
+
+def parse_transaction(envelope_xdr: str) -> stellar_xdr.Transaction:
+    envelope = stellar_xdr.TransactionEnvelope.from_xdr(envelope_xdr)
+    if envelope.fee_bump is not None:
+        return envelope.fee_bump.tx.inner_tx.v1.tx
+    return envelope.v1.tx
+
+
+def get_inclusion_fee(envelope: stellar_xdr.TransactionEnvelope) -> int:
+    """
+    Returns the inclusion fee bid per operation by a transaction or fee bump,
+    i.e. its fee minus the resource fee.
+    """
+    if envelope.fee_bump is not None:
+        tx = envelope.fee_bump.tx.inner_tx.v1.tx
+        operations = len(tx.operations) + 1
+        fee = envelope.fee_bump.tx.fee.int64
+    else:
+        tx = envelope.v1.tx
+        operations = len(tx.operations)
+        fee = tx.fee.uint32
+    resource_fee = tx.ext.soroban_data.resource_fee.int64 if tx.ext.soroban_data else 0
+    return (fee - resource_fee) // operations
+
+
+def get_function_name(tx: stellar_xdr.Transaction) -> Optional[str]:
+    host_function = tx.operations[0].body.invoke_host_function_op.host_function
+    if host_function.invoke_contract is None:
+        return None
+    return host_function.invoke_contract.function_name.sc_symbol.decode()
+
+
+def get_account_id(account: stellar_xdr.MuxedAccount) -> str:
+    return MuxedAccount.from_xdr_object(account).account_id
+
+
+def build_transaction_result(fee_charged: int, code) -> stellar_xdr.TransactionResult:
+    results = None
+    if code == stellar_xdr.TransactionResultCode.txSUCCESS:
+        results = [
+            stellar_xdr.OperationResult(
+                stellar_xdr.OperationResultCode.opINNER,
+                tr=stellar_xdr.OperationResultTr(
+                    stellar_xdr.OperationType.INVOKE_HOST_FUNCTION,
+                    invoke_host_function_result=stellar_xdr.InvokeHostFunctionResult(
+                        stellar_xdr.InvokeHostFunctionResultCode.INVOKE_HOST_FUNCTION_SUCCESS,
+                        success=stellar_xdr.Hash(bytes(32)),
+                    ),
+                ),
+            )
+        ]
+    return stellar_xdr.TransactionResult(
+        fee_charged=stellar_xdr.Int64(fee_charged),
+        result=stellar_xdr.TransactionResultResult(code, results=results),
+        ext=stellar_xdr.TransactionResultExt(0),
+    )
+
+
+def build_transaction_meta(result: stellar_xdr.SCVal) -> stellar_xdr.TransactionMeta:
+    return stellar_xdr.TransactionMeta(
+        3,
+        v3=stellar_xdr.TransactionMetaV3(
+            ext=stellar_xdr.ExtensionPoint(0),
+            tx_changes_before=stellar_xdr.LedgerEntryChanges([]),
+            operations=[stellar_xdr.OperationMeta(stellar_xdr.LedgerEntryChanges([]))],
+            tx_changes_after=stellar_xdr.LedgerEntryChanges([]),
+            soroban_meta=stellar_xdr.SorobanTransactionMeta(
+                ext=stellar_xdr.ExtensionPoint(0),
+                events=[],
+                return_value=result,
+                diagnostic_events=[],
+            ),
+        ),
+    )
+
+
+def build_account_entry(account_id, sequence: int) -> stellar_xdr.LedgerEntryData:
+    return stellar_xdr.LedgerEntryData(
+        stellar_xdr.LedgerEntryType.ACCOUNT,
+        account=stellar_xdr.AccountEntry(
+            account_id=account_id,
+            balance=stellar_xdr.Int64(10**15),
+            seq_num=stellar_xdr.SequenceNumber(stellar_xdr.Int64(sequence)),
+            num_sub_entries=stellar_xdr.Uint32(0),
+            inflation_dest=None,
+            flags=stellar_xdr.Uint32(0),
+            home_domain=stellar_xdr.String32(b""),
+            thresholds=stellar_xdr.Thresholds(bytes([1, 0, 0, 0])),
+            signers=[],
+            ext=stellar_xdr.AccountEntryExt(0),
+        ),
+    )
@@ -1,18 +1,36 @@
+import argparse
 import sqlite3
 import logging
 import importlib.util
-import base64
 import json
 from datetime import datetime
+from decimal import Decimal
 import sys
-import subprocess
 import math
-from contextlib import contextmanager
-from typing import List, Dict, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Tuple
 from pathlib import Path
 
+from lightecho_stellar_oracle import (
+    DEFAULT_MAX_INCLUSION_FEE,
+    InsufficientBalance,
+    OracleClient,
+    SequenceManager,
+    get_fee_charged,
+)
+from stellar_sdk import Keypair, TransactionEnvelope
+from stellar_sdk.soroban_rpc import GetTransactionStatus
+
 RESOLUTION = 600
 EXIT_CODE_INSUFFICIENT_BALANCE = 2
+# how often the daemon checks for new prices when a resolution window has
+# nothing to feed yet
+IDLE_CHECK_INTERVAL = 60
+BATCH_SIZE = 10
+# leeway for clock skew and for the RPC to ingest the last ledger a
+# transaction could be in, once its time bounds have passed
+TX_EXPIRY_MARGIN = 10
 
 mod_spec = importlib.util.spec_from_file_location(
     "local_settings", Path(__file__).resolve().parent.parent / "local_settings.py"
@@ -23,12 +41,23 @@ sys.modules["local_settings"] = local_settings
 assert mod_spec.loader
 mod_spec.loader.exec_module(local_settings)
 
+api_dir = Path(__file__).parent.parent.parent.parent.resolve() / "api"
+# the SQLite access layer of the API server
+db_mod_spec = importlib.util.spec_from_file_location("db", api_dir / "db.py")
+assert db_mod_spec
+db = importlib.util.module_from_spec(db_mod_spec)
+sys.modules["db"] = db
+assert db_mod_spec.loader
+db_mod_spec.loader.exec_module(db)
+
 db_path = getattr(local_settings, "API_DB_PATH", None)
 if db_path is None:
-    db_path = (
-        Path(__file__).parent.parent.parent.parent.resolve() / "api" / "db.sqlite3"
-    )
-cli_dir = Path(__file__).parent.parent.resolve()
+    db_path = api_dir / "db.sqlite3"
+database = db.Database(
+    db_path,
+    getattr(local_settings, "DB_PRAGMAS", None),
+    detect_types=sqlite3.PARSE_DECLTYPES,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -37,29 +66,77 @@ logging.basicConfig(
 logger = logging.getLogger("feed_bulk_from_db.py")
 
 
-def run_cli(cmd: str) -> Tuple[int, str]:
-    try:
-        return 0, subprocess.check_output(
-            f"./cli {cmd}", shell=True, text=True, cwd=cli_dir, stderr=subprocess.STDOUT
+# kept for the whole process, so the daemon reuses the same RPC sessions on
+# every cycle (and the same database connections, see db.Database)
+state = {
+    "oracle_clients": {},
+    "admin_sequence_manager": None,
+}
+
+
+def get_oracle_contracts() -> Dict[str, str]:
+    """
+    Returns the oracle contract ID of each base asset (the sell_asset of the
+    prices it receives).
+    """
+    oracle_contracts = getattr(local_settings, "ORACLE_CONTRACTS", None)
+    if oracle_contracts is None:
+        oracle_contracts = {"XLM": local_settings.ORACLE_CONTRACT_ID}
+    return oracle_contracts
+
+
+def get_oracle_client(base: str = "XLM") -> OracleClient:
+    """
+    Returns the client of the oracle contract of a base asset. Contracts with
+    their own source account in ORACLE_CONTRACT_SOURCE_SECRETS send from it,
+    with the admin only authorizing the calls, so they can land in the same
+    ledger. The others send from the admin account and share its sequence
+    numbers.
+    """
+    if base not in state["oracle_clients"]:
+        admin_kp = Keypair.from_secret(local_settings.ADMIN_SECRET)
+        source_secret = getattr(
+            local_settings, "ORACLE_CONTRACT_SOURCE_SECRETS", {}
+        ).get(base)
+        if source_secret is not None:
+            signer = Keypair.from_secret(source_secret)
+            auth_signer = admin_kp
+            sequence_manager = None
+        else:
+            if state["admin_sequence_manager"] is None:
+                state["admin_sequence_manager"] = SequenceManager(admin_kp.public_key)
+            signer = admin_kp
+            auth_signer = None
+            sequence_manager = state["admin_sequence_manager"]
+        state["oracle_clients"][base] = OracleClient(
+            contract_id=get_oracle_contracts()[base],
+            signer=signer,
+            network="custom",
+            custom_rpc_url=local_settings.RPC_URL,
+            custom_network_passphrase=local_settings.NETWORK_PASSPHRASE,
+            max_inclusion_fee=getattr(
+                local_settings, "MAX_INCLUSION_FEE", DEFAULT_MAX_INCLUSION_FEE
+            ),
+            auth_signer=auth_signer,
+            sequence_manager=sequence_manager,
         )
-    except subprocess.CalledProcessError as e:
-        return e.returncode, e.output
+    return state["oracle_clients"][base]
 
 
-@contextmanager
 def cursor_ctx():
-    conn = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    try:
-        yield cursor
-    except Exception as e:
-        conn.rollback()
-        raise e
-    else:
-        conn.commit()
-    finally:
-        conn.close()
+    return database.cursor()
+
+
+def get_data_version() -> int:
+    """
+    Returns SQLite's data version, which changes whenever another connection
+    (e.g. the API) commits to the database. Reading it doesn't touch any table.
+    It is only comparable between calls from the same thread, which use the
+    same connection.
+    """
+    with cursor_ctx() as cursor:
+        cursor.execute("PRAGMA data_version")
+        return cursor.fetchone()[0]
 
 
 def get_closest_past_timestamp(external_timestamp, resolution):
@@ -68,12 +145,6 @@ def get_closest_past_timestamp(external_timestamp, resolution):
     return adjusted_timestamp
 
 
-def list_to_base64(data_list):
-    json_str = json.dumps(data_list)
-    json_bytes = json_str.encode("utf-8")
-    return base64.b64encode(json_bytes).decode("utf-8")
-
-
 def log_result_to_db(cmd, success, output):
     query = """
         INSERT INTO feed_bulk_from_db_logs
@@ -100,69 +171,594 @@ def log_result_to_db(cmd, success, output):
         )
 
 
-def add_prices_to_blockchain(prices: List[Dict], timestamp: int):
+def parse_price(price: Dict, timestamp: int) -> Dict:
+    return {
+        "source": price["source"],
+        "asset_type": "other",
+        "asset": price["buy_asset"],
+        "price": price["price"],
+        "timestamp": timestamp,
+    }
+
+
+def route_prices(prices: List[Dict]) -> Tuple[Dict[str, List[Dict]], List[Dict]]:
+    """
+    Groups price rows by the contract of their sell_asset.
+
+    Returns:
+        Tuple[Dict[str, List[Dict]], List[Dict]]: The rows of each base asset,
+        and the rows whose sell_asset has no contract.
+    """
+    oracle_contracts = get_oracle_contracts()
+    routed_prices = {}
+    unrouted_prices = []
+    for price in prices:
+        if price["sell_asset"] in oracle_contracts:
+            routed_prices.setdefault(price["sell_asset"], []).append(price)
+        else:
+            unrouted_prices.append(price)
+    return routed_prices, unrouted_prices
+
+
+def get_deviation_threshold(asset: str) -> Decimal:
+    thresholds = getattr(local_settings, "PRICE_DEVIATION_THRESHOLDS", {})
+    threshold = thresholds.get(
+        asset, getattr(local_settings, "PRICE_DEVIATION_THRESHOLD", 0)
+    )
+    return Decimal(str(threshold))
+
+
+def get_onchain_prices(base: str) -> Dict[Tuple[int, str], Tuple[str, int]]:
+    """
+    Returns the last price and timestamp fed to the contract of a base asset,
+    by (source, asset).
+    """
+    query = """
+        SELECT source, asset, price, timestamp
+        FROM feed_bulk_from_db_onchain_prices
+        WHERE base = ?
+    """
+    with cursor_ctx() as cursor:
+        cursor.execute(query, (base,))
+        return {
+            (row["source"], row["asset"]): (row["price"], row["timestamp"])
+            for row in cursor.fetchall()
+        }
+
+
+def set_onchain_prices(base: str, prices: List[Dict]):
+    query = """
+        INSERT INTO feed_bulk_from_db_onchain_prices (base, source, asset, price, timestamp)
+        VALUES (:base, :source, :asset, :price, :timestamp)
+        ON CONFLICT (base, source, asset) DO UPDATE SET
+            price = excluded.price,
+            timestamp = excluded.timestamp
+    """
+    with cursor_ctx() as cursor:
+        cursor.executemany(query, [dict(price, base=base) for price in prices])
+
+
+def should_feed_price(
+    price: Dict, onchain_prices: Dict[Tuple[int, str], Tuple[str, int]], timestamp: int
+) -> bool:
+    """
+    Returns whether a price moved by at least the deviation threshold of its
+    asset since it was last fed, or would exceed PRICE_HEARTBEAT by the next
+    resolution window if it is not fed now.
+    """
+    onchain_price = onchain_prices.get((price["source"], price["buy_asset"]))
+    if onchain_price is None:
+        return True
+    last_price, last_timestamp = onchain_price
+    heartbeat = getattr(local_settings, "PRICE_HEARTBEAT", None)
+    if heartbeat is not None and timestamp + RESOLUTION - last_timestamp > heartbeat:
+        return True
+    last_price = Decimal(last_price)
+    if last_price == 0:
+        return Decimal(price["price"]) != 0
+    deviation = abs(Decimal(price["price"]) - last_price) / abs(last_price)
+    return deviation >= get_deviation_threshold(price["buy_asset"])
+
+
+def get_add_prices_function_name(oracle_client: OracleClient, prices: List[Dict]):
+    # add_prices_light skips rewriting the contract's assets and sources
+    # lists, but it doesn't publish the (lightecho, newprices) event, so it is
+    # only used when ADD_PRICES_LIGHT opts in, and then only for batches whose
+    # assets and sources are all registered already
+    if getattr(
+        local_settings, "ADD_PRICES_LIGHT", False
+    ) and oracle_client.can_add_prices_light(prices):
+        return "add_prices_light"
+    return "add_prices"
+
+
+def journal_batch(
+    base: str,
+    cmd: str,
+    batch: List[Dict],
+    timestamp: int,
+    last_price_id: int,
+    max_price_id: int,
+) -> int:
+    """
+    Records a batch in the journal before it is submitted, so that a restart
+    can confirm its transaction instead of sending the prices again.
+    """
+    query = """
+        INSERT INTO feed_bulk_from_db_journal (
+            base,
+            command,
+            prices,
+            timestamp,
+            last_price_id,
+            max_price_id,
+            status
+        ) VALUES (
+            :base,
+            :command,
+            :prices,
+            :timestamp,
+            :last_price_id,
+            :max_price_id,
+            'pending'
+        )
+    """
+    with cursor_ctx() as cursor:
+        cursor.execute(
+            query,
+            {
+                "base": base,
+                "command": cmd,
+                "prices": json.dumps(batch, default=str),
+                "timestamp": timestamp,
+                "last_price_id": last_price_id,
+                "max_price_id": max_price_id,
+            },
+        )
+        return cursor.lastrowid
+
+
+def journal_tx(journal_id: int) -> Callable[[TransactionEnvelope], None]:
+    """
+    Returns the on_signed callback recording the transaction of a batch in the
+    journal right before it is sent.
+    """
+
+    def on_signed(tx: TransactionEnvelope):
+        time_bounds = tx.transaction.preconditions.time_bounds
+        query = """
+            UPDATE feed_bulk_from_db_journal
+            SET tx_hash = :tx_hash,
+                tx_expires_at = :tx_expires_at,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = :id
+        """
+        with cursor_ctx() as cursor:
+            cursor.execute(
+                query,
+                {
+                    "tx_hash": tx.hash_hex(),
+                    "tx_expires_at": time_bounds.max_time if time_bounds else None,
+                    "id": journal_id,
+                },
+            )
+
+    return on_signed
+
+
+def submit_batch(
+    base: str, batch: List[Dict], timestamp: int, last_price_id: int, max_price_id: int
+) -> Tuple[int, str, Optional[str], Optional[str]]:
+    """
+    Journals and submits a batch without waiting for confirmation.
+
+    Returns:
+        Tuple[int, str, Optional[str], Optional[str]]: The journal ID, the
+        command, and either the transaction hash or the error.
+    """
+    oracle_client = get_oracle_client(base)
+    prices = [parse_price(price, timestamp) for price in batch]
+    function_name = get_add_prices_function_name(oracle_client, prices)
+    cmd = f"{function_name} {json.dumps(prices)}"
+    logger.info(f"{base}: {cmd}")
+    journal_id = journal_batch(
+        base, cmd, batch, timestamp, last_price_id, max_price_id
+    )
+    try:
+        tx_hash = getattr(oracle_client, f"submit_{function_name}")(
+            prices, journal_tx(journal_id)
+        )
+    except InsufficientBalance:
+        raise
+    except Exception as e:
+        logger.exception(f"{base}: failed to submit prices")
+        return journal_id, cmd, None, str(e)
+    return journal_id, cmd, tx_hash, None
+
+
+def get_batch_result(tx_hash: str, tx_data) -> Tuple[str, bool]:
+    output = (
+        f"tx_hash={tx_hash} status={tx_data.status.value} "
+        f"fee_charged={get_fee_charged(tx_data)}"
+    )
+    return output, tx_data.status == GetTransactionStatus.SUCCESS
+
+
+def confirm_batch(base: str, tx_hash: str) -> Tuple[str, bool]:
+    """
+    Waits for the transaction of a batch.
+
+    Returns:
+        Tuple[str, bool]: The output and success of the batch.
+    """
+    try:
+        tx_data = get_oracle_client(base).wait_tx(tx_hash)
+    except Exception as e:
+        logger.exception(f"{base}: failed to confirm transaction {tx_hash}")
+        return f"tx_hash={tx_hash} {e}", False
+    return get_batch_result(tx_hash, tx_data)
+
+
+def look_up_expired_batch(base: str, tx_hash: str) -> Tuple[str, bool]:
+    """
+    Looks up the transaction of a batch once, without waiting: its time bounds
+    have passed, so it is either in a ledger already or never will be.
+
+    Returns:
+        Tuple[str, bool]: The output and success of the batch.
+    """
+    try:
+        tx_data = get_oracle_client(base).server.get_transaction(tx_hash)
+    except Exception as e:
+        logger.exception(f"{base}: failed to look up transaction {tx_hash}")
+        return f"tx_hash={tx_hash} {e}", False
+    if tx_data.status == GetTransactionStatus.NOT_FOUND:
+        return f"tx_hash={tx_hash} expired", False
+    return get_batch_result(tx_hash, tx_data)
+
+
+def add_prices_to_blockchain(
+    base: str,
+    batches: List[List[Dict]],
+    timestamp: int,
+    last_price_id: int,
+    max_price_id: int,
+) -> List[Tuple[int, str, str, bool]]:
+    """
+    Adds the batches of a base asset to its contract one after the other,
+    waiting for each transaction to be confirmed.
+
+    Returns:
+        List[Tuple[int, str, str, bool]]: The journal ID, command, output and
+        success of each batch.
+    """
+    results = []
+    for batch in batches:
+        journal_id, cmd, tx_hash, error = submit_batch(
+            base, batch, timestamp, last_price_id, max_price_id
+        )
+        if tx_hash is None:
+            results.append((journal_id, cmd, error, False))
+        else:
+            results.append((journal_id, cmd, *confirm_batch(base, tx_hash)))
+    return results
+
+
+def add_prices_to_blockchain_pipelined(
+    base: str,
+    batches: List[List[Dict]],
+    timestamp: int,
+    last_price_id: int,
+    max_price_id: int,
+) -> List[Tuple[int, str, str, bool]]:
+    """
+    Submits every batch of a base asset without waiting for the previous ones
+    to be confirmed, so batch N+1 is simulated and signed while batch N awaits
+    confirmation, then confirms them in order. A batch that fails to submit or
+    to confirm doesn't stop the others.
+
+    Returns:
+        List[Tuple[int, str, str, bool]]: The journal ID, command, output and
+        success of each batch.
+    """
+    submitted = [
+        submit_batch(base, batch, timestamp, last_price_id, max_price_id)
+        for batch in batches
+    ]
+    # the transactions were all submitted already, so waiting for them in
+    # order takes as long as waiting for the last one
+    results = []
+    for journal_id, cmd, tx_hash, error in submitted:
+        if tx_hash is None:
+            results.append((journal_id, cmd, error, False))
+        else:
+            results.append((journal_id, cmd, *confirm_batch(base, tx_hash)))
+    return results
+
+
+def finish_batch(
+    journal_id: int,
+    base: str,
+    cmd: str,
+    batch: List[Dict],
+    timestamp: int,
+    last_price_id: int,
+    max_price_id: int,
+    output: str,
+    is_success: bool,
+):
+    """
+    Logs the result of a batch and closes its journal entry. The rows of a
+    failed batch are left pending, to be fed again.
+    """
+    logger.info(f"{base}: {output}")
+    log_result_to_db(cmd, is_success, output)
+    if is_success:
+        set_onchain_prices(base, [parse_price(price, timestamp) for price in batch])
+        mark_prices_as_added_to_blockchain(batch, last_price_id, max_price_id)
+    query = """
+        UPDATE feed_bulk_from_db_journal
+        SET status = :status,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = :id
+    """
+    with cursor_ctx() as cursor:
+        cursor.execute(
+            query, {"status": "success" if is_success else "failed", "id": journal_id}
+        )
+
+
+def resume_journal() -> Optional[int]:
+    """
+    Confirms the batches left pending in the journal by a previous run, e.g.
+    one killed before its transactions were confirmed, instead of sending them
+    again. A batch whose transaction was never sent or never made it into a
+    ledger is closed as failed. Transactions past their time bounds are looked
+    up once instead of waited for.
+
+    Returns:
+        Optional[int]: The lowest price id of the failed batches, if any.
+    """
+    query = """
+        SELECT *
+        FROM feed_bulk_from_db_journal
+        WHERE status = 'pending'
+        ORDER BY id
+    """
+    with cursor_ctx() as cursor:
+        cursor.execute(query)
+        entries = [dict(entry) for entry in cursor.fetchall()]
+    min_failed_price_id = None
+    for entry in entries:
+        batch = json.loads(entry["prices"])
+        if entry["tx_hash"] is None:
+            output, is_success = "transaction was never sent", False
+        elif entry["base"] not in get_oracle_contracts():
+            output, is_success = f"tx_hash={entry['tx_hash']} unknown contract", False
+        elif (
+            entry["tx_expires_at"] is not None
+            and time.time() > entry["tx_expires_at"] + TX_EXPIRY_MARGIN
+        ):
+            output, is_success = look_up_expired_batch(entry["base"], entry["tx_hash"])
+        else:
+            logger.info(
+                f"{entry['base']}: resuming the confirmation of {entry['tx_hash']}"
+            )
+            output, is_success = confirm_batch(entry["base"], entry["tx_hash"])
+        finish_batch(
+            entry["id"],
+            entry["base"],
+            entry["command"],
+            batch,
+            entry["timestamp"],
+            entry["last_price_id"],
+            entry["max_price_id"],
+            output,
+            is_success,
+        )
+        if not is_success:
+            min_failed_price_id = min(
+                [price["id"] for price in batch]
+                + ([min_failed_price_id] if min_failed_price_id else [])
+            )
+    return min_failed_price_id
+
+
+def feed_prices(
+    prices: List[Dict],
+    timestamp: int,
+    last_price_id: int,
+    max_price_id: int,
+    pipelined: bool = False,
+) -> Optional[int]:
+    """
+    Routes the prices to the contract of their sell_asset, drops the ones that
+    didn't move enough since they were last fed (see should_feed_price) and
+    feeds all the contracts concurrently. The results are logged afterwards,
+    from this thread, in batch order.
+
+    Returns:
+        Optional[int]: The lowest price id of the failed batches, if any.
+    """
+    routed_prices, unrouted_prices = route_prices(prices)
+    if unrouted_prices:
+        sell_assets = sorted({price["sell_asset"] for price in unrouted_prices})
+        logger.warning(
+            f"Skipping {len(unrouted_prices)} prices with no contract for their sell_asset: {sell_assets}"
+        )
+    skipped_prices = []
+    for base in list(routed_prices):
+        onchain_prices = get_onchain_prices(base)
+        moved_prices = []
+        for price in routed_prices[base]:
+            if should_feed_price(price, onchain_prices, timestamp):
+                moved_prices.append(price)
+            else:
+                skipped_prices.append(price)
+        if moved_prices:
+            routed_prices[base] = moved_prices
+        else:
+            del routed_prices[base]
+    if skipped_prices:
+        logger.info(
+            f"Skipping {len(skipped_prices)} prices below their deviation threshold"
+        )
+    batches = {
+        base: [
+            base_prices[i : i + BATCH_SIZE]
+            for i in range(0, len(base_prices), BATCH_SIZE)
+        ]
+        for base, base_prices in routed_prices.items()
+    }
     logger.info(
-        f"Adding {len(prices)} prices to the blockchain with timestamp {timestamp}"
+        f"Adding {len(prices) - len(unrouted_prices) - len(skipped_prices)} prices to "
+        f"{len(batches)} contracts with timestamp {timestamp}"
+    )
+    add_prices = (
+        add_prices_to_blockchain_pipelined if pipelined else add_prices_to_blockchain
     )
-    xlm_based_prices = []
-    usd_based_prices = []
+    for base in batches:
+        get_oracle_client(base)
+    with ThreadPoolExecutor(max_workers=max(len(batches), 1)) as executor:
+        futures = {
+            base: executor.submit(
+                add_prices,
+                base,
+                base_batches,
+                timestamp,
+                last_price_id,
+                max_price_id,
+            )
+            for base, base_batches in batches.items()
+        }
+    results = {}
+    for base, future in futures.items():
+        try:
+            results[base] = future.result()
+        except InsufficientBalance:
+            logger.error(f"{base}: insufficient XLM balance")
+            sys.exit(EXIT_CODE_INSUFFICIENT_BALANCE)
+
+    min_failed_price_id = None
+    for base, base_batches in batches.items():
+        for batch, (journal_id, cmd, output, is_success) in zip(
+            base_batches, results[base]
+        ):
+            finish_batch(
+                journal_id,
+                base,
+                cmd,
+                batch,
+                timestamp,
+                last_price_id,
+                max_price_id,
+                output,
+                is_success,
+            )
+            if not is_success:
+                min_failed_price_id = min(
+                    [price["id"] for price in batch]
+                    + ([min_failed_price_id] if min_failed_price_id else [])
+                )
+    mark_prices_as_added_to_blockchain(
+        unrouted_prices + skipped_prices, last_price_id, max_price_id
+    )
+    return min_failed_price_id
+
+
+def mark_prices_as_added_to_blockchain(
+    prices: List[Dict], last_price_id: int, max_price_id: int
+):
     source_symbols = {}
     for price in prices:
-        parsed_price = {
-            "source": price["source"],
-            "asset_type": "other",
-            "asset": price["buy_asset"],
-            "price": price["price"],
-            "timestamp": timestamp,
-        }
         source_symbols.setdefault(price["source"], []).append(price["symbol"])
-        if price["sell_asset"] == "XLM":
-            xlm_based_prices.append(parsed_price)
-        elif price["sell_asset"] == "USD":
-            usd_based_prices.append(parsed_price)
-        else:
-            raise ValueError(f"Unexpected price sell_asset: {price['sell_asset']}")
-    if xlm_based_prices:
-        cmd = f"--oracle-contract-id {local_settings.ORACLE_CONTRACT_ID} oracle add_prices_base64 {list_to_base64(xlm_based_prices)}"
-        logger.info(f"cli.py {cmd}")
-        returncode, output = run_cli(cmd)
-        logger.info(output)
-        if returncode == EXIT_CODE_INSUFFICIENT_BALANCE:
-            sys.exit(EXIT_CODE_INSUFFICIENT_BALANCE)
-        is_success = returncode == 0
-        log_result_to_db(cmd, is_success, output)
-    if usd_based_prices:
-        logger.warning("Skipping adding USD-based prices, as they're not supported in the blockchain contract yet")
     for source, symbols in source_symbols.items():
-        mark_symbols_as_added_to_blockchain(source, symbols)
+        mark_symbols_as_added_to_blockchain(
+            source, symbols, last_price_id, max_price_id
+        )
 
 
-def mark_symbols_as_added_to_blockchain(source, symbols):
+def mark_symbols_as_added_to_blockchain(source, symbols, last_price_id, max_price_id):
+    """
+    Marks the pending rows of the given symbols with
+    last_price_id < id <= max_price_id as added to the blockchain.
+    """
     placeholders = ", ".join(["?"] * len(symbols))
-    query = f"UPDATE prices SET added_to_blockchain = 1 WHERE source = ? AND symbol IN ({placeholders})"
+    query = f"""
+        UPDATE prices
+        SET added_to_blockchain = 1
+        WHERE id > ?
+          AND id <= ?
+          AND source = ?
+          AND symbol IN ({placeholders})
+    """
     with cursor_ctx() as cursor:
-        cursor.execute(query, [source] + symbols)
+        cursor.execute(query, [last_price_id, max_price_id, source] + symbols)
+
+
+def get_last_price_id() -> int:
+    """
+    Returns the high-water mark of the prices table: every row with a lower or
+    equal id was already considered by a previous feed cycle.
+    """
+    query = "SELECT last_price_id FROM feed_bulk_from_db_state WHERE id = 1"
+    with cursor_ctx() as cursor:
+        cursor.execute(query)
+        row = cursor.fetchone()
+        return row["last_price_id"] if row else 0
 
 
-def get_latest_time_prices_were_added_to_blockchain():
+def set_last_price_id(last_price_id: int):
     query = """
-        SELECT
-            id,
-            created_at
-        FROM feed_bulk_from_db_logs
-        WHERE success = TRUE
-        ORDER BY created_at DESC LIMIT 1
+        INSERT INTO feed_bulk_from_db_state (id, last_price_id)
+        VALUES (1, :last_price_id)
+        ON CONFLICT (id) DO UPDATE SET last_price_id = excluded.last_price_id
+    """
+    with cursor_ctx() as cursor:
+        cursor.execute(query, {"last_price_id": last_price_id})
+
+
+def set_high_water_mark(max_price_id: int, min_failed_price_id: Optional[int]):
+    """
+    Moves the high-water mark up to max_price_id, but not past the rows of a
+    failed batch, which are still pending and must be read again.
+    """
+    if min_failed_price_id is not None:
+        max_price_id = min(max_price_id, min_failed_price_id - 1)
+    set_last_price_id(max_price_id)
+
+
+def get_latest_fed_window() -> Optional[int]:
+    """
+    Returns the resolution window of the latest batch that landed. Batches
+    resumed from the journal keep the window they were fed for, so confirming
+    them late doesn't count as feeding the current window.
+    """
+    query = """
+        SELECT timestamp
+        FROM feed_bulk_from_db_journal
+        WHERE status = 'success'
+        ORDER BY id DESC LIMIT 1
     """
     with cursor_ctx() as cursor:
         cursor.execute(query)
         row = cursor.fetchone()
-        if not row:
-            return None
-        row_dict = dict(row)
-        return row_dict["created_at"]
+        return row["timestamp"] if row else None
 
 
-def read_prices_from_db():
+def read_prices_from_db(pipelined: bool = False) -> Optional[bool]:
+    """
+    Feeds the pending prices for the current resolution window.
+
+    Args:
+        pipelined (bool): Submit all batches before waiting for confirmations.
+
+    Returns:
+        Optional[bool]: None if prices were already fed for the current window,
+        False if there were no new prices to feed, True if prices were fed.
+    """
+    # newest pending row per (source, symbol) since the last cycle. The id
+    # range is a rowid range scan, so the cost only depends on the new rows
     query = """
         SELECT
             id,
@@ -173,61 +769,106 @@ def read_prices_from_db():
             sell_asset,
             buy_asset
         FROM prices
-        WHERE status = 'active'
-          AND asset_type = 'other'
-          AND added_to_blockchain = 0
-        ORDER BY updated_at DESC
+        WHERE id IN (
+            SELECT MAX(id)
+            FROM prices
+            WHERE id > :last_price_id
+              AND id <= :max_price_id
+              AND status = 'active'
+              AND asset_type = 'other'
+              AND added_to_blockchain = 0
+            GROUP BY source, symbol
+        )
+        ORDER BY id DESC
     """
+    min_failed_price_id = resume_journal()
+    current_unix_time = int(datetime.now().timestamp())
+    closest_past_normalized_timestamp = get_closest_past_timestamp(
+        current_unix_time, RESOLUTION
+    )
+    latest_fed_window = get_latest_fed_window()
+    if (
+        latest_fed_window is not None
+        and latest_fed_window >= closest_past_normalized_timestamp
+    ):
+        logger.info(
+            "prices were already added to the blockchain for the current resolution"
+        )
+        set_high_water_mark(get_last_price_id(), min_failed_price_id)
+        return None
+
+    last_price_id = get_last_price_id()
     with cursor_ctx() as cursor:
-        cursor.execute(query)
-        prices_from_db = []
-        symbols = {}
+        cursor.execute("SELECT MAX(id) AS max_price_id FROM prices")
+        max_price_id = cursor.fetchone()["max_price_id"] or 0
+        cursor.execute(
+            query, {"last_price_id": last_price_id, "max_price_id": max_price_id}
+        )
+        prices_from_db = [dict(price) for price in cursor.fetchall()]
 
-        for price in cursor.fetchall():
-            prices_from_db.append(dict(price))
+    if len(prices_from_db) == 0:
+        logger.info("no new prices to feed into the blockchain contract")
+        set_high_water_mark(max_price_id, min_failed_price_id)
+        return False
+    failed_price_id = feed_prices(
+        prices_from_db,
+        closest_past_normalized_timestamp,
+        last_price_id,
+        max_price_id,
+        pipelined,
+    )
+    if failed_price_id is not None:
+        min_failed_price_id = min(failed_price_id, min_failed_price_id or failed_price_id)
+    set_high_water_mark(max_price_id, min_failed_price_id)
+    return True
 
-        latest_time_prices_were_added_to_blockchain = (
-            get_latest_time_prices_were_added_to_blockchain()
-        )
-        if latest_time_prices_were_added_to_blockchain is None:
-            latest_time_prices_were_added_to_blockchain = datetime(1970, 1, 1)
-        last_time_prices_were_added_to_blockchain_timestamp = (
-            latest_time_prices_were_added_to_blockchain.timestamp()
-        )
-        current_unix_time = int(datetime.now().timestamp())
-        closest_past_normalized_timestamp = get_closest_past_timestamp(
-            current_unix_time, RESOLUTION
-        )
-        if (
-            last_time_prices_were_added_to_blockchain_timestamp
-            >= closest_past_normalized_timestamp
-        ):
-            logger.info(
-                "prices were already added to the blockchain for the current resolution"
-            )
-            return
-
-        batches_of_prices_to_feed = []
-        prices_to_feed = []
-        for price in prices_from_db:
-            if len(prices_to_feed) >= 10:
-                batches_of_prices_to_feed.append(prices_to_feed)
-                prices_to_feed = []
-                continue
-            if price["source"] not in symbols:
-                symbols[price["source"]] = []
-            if price["symbol"] in symbols[price["source"]]:
-                continue
-            prices_to_feed.append(price)
-            symbols[price["source"]].append(price["symbol"])
-        if prices_to_feed:
-            batches_of_prices_to_feed.append(prices_to_feed)
-        if len(batches_of_prices_to_feed) == 0:
-            logger.info("no new prices to feed into the blockchain contract")
+
+def seconds_until_next_resolution(now: float) -> float:
+    return get_closest_past_timestamp(now, RESOLUTION) + RESOLUTION - now
+
+
+def run_forever(pipelined: bool = False):
+    """
+    Feeds prices once per resolution window, waking up at each window
+    boundary. While a window has nothing to feed yet, it only checks every
+    IDLE_CHECK_INTERVAL seconds whether the database changed before scanning
+    the prices table again.
+    """
+    fed_window = None
+    idle_data_version = None
+    while True:
+        now = time.time()
+        window = get_closest_past_timestamp(now, RESOLUTION)
+        if fed_window != window:
+            data_version = get_data_version()
+            if data_version != idle_data_version:
+                if read_prices_from_db(pipelined) is False:
+                    idle_data_version = data_version
+                else:
+                    fed_window = window
+                    idle_data_version = None
+        now = time.time()
+        if fed_window == get_closest_past_timestamp(now, RESOLUTION):
+            delay = seconds_until_next_resolution(now)
         else:
-            for batch in batches_of_prices_to_feed:
-                add_prices_to_blockchain(batch, closest_past_normalized_timestamp)
+            delay = min(IDLE_CHECK_INTERVAL, seconds_until_next_resolution(now))
+        time.sleep(delay)
 
 
 if __name__ == "__main__":
-    read_prices_from_db()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep running and feed prices at every resolution boundary",
+    )
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="submit every batch of a cycle before waiting for confirmations",
+    )
+    args = parser.parse_args()
+    if args.daemon:
+        run_forever(args.pipelined)
+    else:
+        read_prices_from_db(args.pipelined)
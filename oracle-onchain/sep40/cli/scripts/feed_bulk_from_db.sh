@@ -14,7 +14,8 @@ else
     fi
 fi
 
-timeout 120s $POETRY run python feed_bulk_from_db.py
+# runs until it fails, systemd restarts it (see init/systemd/feed_bulk_from_db.service)
+$POETRY run python feed_bulk_from_db.py --daemon --pipelined
 EXIT_CODE=$?
 if [[ $EXIT_CODE != 0 ]]; then
     echo "Failed to feed bulk prices from db"
@@ -0,0 +1,445 @@
+"""
+Offline tests of feed_bulk_from_db.py. As in benchmark_pipeline.py, the API
+and the feeder are copied into a temporary directory with their own
+local_settings.py and database, and the contracts are served by a local fake
+Soroban RPC (see fake_soroban_rpc.py).
+
+Usage: poetry run python3 -m unittest tests (from this directory)
+
+Besides the CLI dependencies, the interpreter needs the ones of the API
+(flask, flask-cors, flask-httpauth, pytz).
+"""
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from lightecho_stellar_oracle import LedgerCadence
+
+from benchmark_pipeline import API_PASSWORD, API_USERNAME, setup
+from fake_soroban_rpc import FakeSorobanRpc, build_results
+
+ASSETS = ["EUR", "USD", "BRL", "BTC"]
+BASES = ["XLM", "USDC"]
+
+
+class FeederTestCase(unittest.TestCase):
+    """
+    Runs every test against a fresh copy of the API and the feeder, feeding
+    the contracts of BASES in batches of 2 prices, against a fake RPC closing
+    a ledger every 0.2s.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.rpc = FakeSorobanRpc(build_results(ASSETS, [0]), ledger_close_time=0.2)
+        cls.rpc.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.rpc.stop()
+
+    def setUp(self):
+        self.work_dir = Path(tempfile.mkdtemp(prefix="feeder_tests_"))
+        self.server, self.feeder = setup(self.work_dir, self.rpc, BASES, 2)
+        self.api = self.server.app.test_client()
+        for base in BASES:
+            self.feeder.get_oracle_client(base).ledger_cadence = LedgerCadence(
+                max_interval=0.5, min_interval=0.1, margin=0.05, close_interval=0.2
+            )
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def post_prices(self, prices, source: int = 0):
+        """
+        Posts (sell_asset, buy_asset, price) tuples to the API.
+        """
+        payload = [
+            {
+                "timeframe": "1m",
+                "status": "active",
+                "source": source,
+                "asset_type": "other",
+                "symbol": f"{buy_asset}{sell_asset}",
+                "price": price,
+                "bid": price,
+                "offer": price,
+                "sell_asset": sell_asset,
+                "buy_asset": buy_asset,
+            }
+            for sell_asset, buy_asset, price in prices
+        ]
+        response = self.api.post(
+            "/db/add-prices/", json=payload, auth=(API_USERNAME, API_PASSWORD)
+        )
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+
+    def get_pending_price_ids(self):
+        with self.feeder.cursor_ctx() as cursor:
+            cursor.execute(
+                "SELECT id FROM prices WHERE added_to_blockchain = 0 ORDER BY id"
+            )
+            return [row["id"] for row in cursor.fetchall()]
+
+    def get_journal_statuses(self):
+        with self.feeder.cursor_ctx() as cursor:
+            cursor.execute("SELECT status FROM feed_bulk_from_db_journal ORDER BY id")
+            return [row["status"] for row in cursor.fetchall()]
+
+    def fail_submissions(self, base: str, asset: str):
+        """
+        Makes the client of a base asset fail to submit any batch with a price
+        of the given asset.
+        """
+        oracle_client = self.feeder.get_oracle_client(base)
+        for function_name in ("submit_add_prices", "submit_add_prices_light"):
+            submit = getattr(oracle_client, function_name)
+
+            def failing_submit(prices, *args, submit=submit, **kwargs):
+                if any(price["asset"] == asset for price in prices):
+                    raise RuntimeError(f"rejected {asset}")
+                return submit(prices, *args, **kwargs)
+
+            setattr(oracle_client, function_name, failing_submit)
+
+    def allow_submissions(self, base: str):
+        oracle_client = self.feeder.get_oracle_client(base)
+        for function_name in ("submit_add_prices", "submit_add_prices_light"):
+            delattr(oracle_client, function_name)
+
+    def allow_another_cycle(self):
+        """
+        Disables the once-per-resolution gate, so that the next cycle feeds
+        within the same window.
+        """
+        self.feeder.get_latest_fed_window = lambda: None
+
+
+class HighWaterMarkTests(FeederTestCase):
+    def test_set_high_water_mark(self):
+        self.assertEqual(self.feeder.get_last_price_id(), 0)
+        self.feeder.set_high_water_mark(10, None)
+        self.assertEqual(self.feeder.get_last_price_id(), 10)
+        # never past the rows of a failed batch
+        self.feeder.set_high_water_mark(20, 15)
+        self.assertEqual(self.feeder.get_last_price_id(), 14)
+        self.feeder.set_high_water_mark(20, None)
+        self.assertEqual(self.feeder.get_last_price_id(), 20)
+
+    def test_cycle_moves_the_mark_to_the_last_row(self):
+        self.post_prices([("XLM", asset, "1.5") for asset in ASSETS])
+        self.assertTrue(self.feeder.read_prices_from_db())
+        self.assertEqual(self.feeder.get_last_price_id(), len(ASSETS))
+        self.assertEqual(self.get_pending_price_ids(), [])
+        # nothing new: the mark stays
+        self.allow_another_cycle()
+        self.assertFalse(self.feeder.read_prices_from_db())
+        self.assertEqual(self.feeder.get_last_price_id(), len(ASSETS))
+
+    def test_feeds_the_newest_row_of_each_symbol(self):
+        self.post_prices([("XLM", "EUR", "1.5"), ("XLM", "USD", "2.5")])
+        self.post_prices([("XLM", "EUR", "1.6")])
+        self.assertTrue(self.feeder.read_prices_from_db())
+        onchain_prices = self.feeder.get_onchain_prices("XLM")
+        self.assertEqual(
+            {key: price for key, (price, _) in onchain_prices.items()},
+            {(0, "EUR"): "1.6", (0, "USD"): "2.5"},
+        )
+        # the older EUR row is marked as well, so it is never read again
+        self.assertEqual(self.get_pending_price_ids(), [])
+        self.assertEqual(self.feeder.get_last_price_id(), 3)
+
+    def test_failed_batch_holds_the_mark_below_its_rows(self):
+        # ids 1 to 4; newest first, so the batches are [4, 3] and [2, 1]
+        self.post_prices([("XLM", asset, "1.5") for asset in ASSETS])
+        self.fail_submissions("XLM", "BRL")
+        self.assertTrue(self.feeder.read_prices_from_db())
+        self.assertEqual(self.get_journal_statuses(), ["failed", "success"])
+        self.assertEqual(self.get_pending_price_ids(), [3, 4])
+        self.assertEqual(self.feeder.get_last_price_id(), 2)
+
+        # a new row doesn't let the mark pass the failed rows either, which
+        # fail again
+        self.post_prices([("USDC", "EUR", "0.9")])
+        self.allow_another_cycle()
+        self.assertTrue(self.feeder.read_prices_from_db())
+        self.assertEqual(self.get_pending_price_ids(), [3, 4])
+        self.assertEqual(self.feeder.get_last_price_id(), 2)
+
+        # once they land, the mark catches up
+        self.allow_submissions("XLM")
+        self.assertTrue(self.feeder.read_prices_from_db())
+        self.assertEqual(
+            sorted(self.get_journal_statuses()),
+            ["failed", "failed", "success", "success", "success"],
+        )
+        self.assertEqual(self.get_pending_price_ids(), [])
+        self.assertEqual(self.feeder.get_last_price_id(), 5)
+
+
+class AddPricesFunctionTests(FeederTestCase):
+    def test_add_prices_by_default(self):
+        oracle_client = self.feeder.get_oracle_client("XLM")
+        prices = [{"source": 0, "asset_type": "other", "asset": "EUR"}]
+        self.assertTrue(oracle_client.can_add_prices_light(prices))
+        self.assertEqual(
+            self.feeder.get_add_prices_function_name(oracle_client, prices),
+            "add_prices",
+        )
+
+    def test_add_prices_light_opt_in(self):
+        self.feeder.local_settings.ADD_PRICES_LIGHT = True
+        oracle_client = self.feeder.get_oracle_client("XLM")
+        registered = [{"source": 0, "asset_type": "other", "asset": "EUR"}]
+        unregistered = registered + [{"source": 0, "asset_type": "other", "asset": "JPY"}]
+        self.assertEqual(
+            self.feeder.get_add_prices_function_name(oracle_client, registered),
+            "add_prices_light",
+        )
+        self.assertEqual(
+            self.feeder.get_add_prices_function_name(oracle_client, unregistered),
+            "add_prices",
+        )
+
+
+class PipelinedFeedTests(FeederTestCase):
+    def record_submissions_before_confirmation(self):
+        """
+        Records how many transactions were accepted by the RPC before each
+        confirmation (sendTransaction calls include the resends).
+        """
+        sent_before_confirmation = []
+        confirm_batch = self.feeder.confirm_batch
+        already_sent = len(self.rpc.transactions)
+
+        def recording_confirm_batch(base, tx_hash):
+            sent_before_confirmation.append(len(self.rpc.transactions) - already_sent)
+            return confirm_batch(base, tx_hash)
+
+        self.feeder.confirm_batch = recording_confirm_batch
+        return sent_before_confirmation
+
+    def test_submits_every_batch_before_confirming(self):
+        self.post_prices([("XLM", asset, "1.5") for asset in ASSETS])
+        sent_before_confirmation = self.record_submissions_before_confirmation()
+        self.assertTrue(self.feeder.read_prices_from_db(pipelined=True))
+        self.assertEqual(sent_before_confirmation, [2, 2])
+        self.assertEqual(self.get_journal_statuses(), ["success", "success"])
+        self.assertEqual(self.get_pending_price_ids(), [])
+
+    def test_sequential_confirms_each_batch_first(self):
+        self.post_prices([("XLM", asset, "1.5") for asset in ASSETS])
+        sent_before_confirmation = self.record_submissions_before_confirmation()
+        self.assertTrue(self.feeder.read_prices_from_db())
+        self.assertEqual(sent_before_confirmation, [1, 2])
+
+    def test_failed_submission_doesnt_stop_the_others(self):
+        # ids 1 to 5, so the batches are [JPY, BTC], [BRL, USD] and [EUR]
+        self.post_prices([("XLM", asset, "1.5") for asset in ASSETS + ["JPY"]])
+        self.fail_submissions("XLM", "USD")
+        self.assertTrue(self.feeder.read_prices_from_db(pipelined=True))
+        self.assertEqual(self.get_journal_statuses(), ["success", "failed", "success"])
+        self.assertEqual(self.get_pending_price_ids(), [2, 3])
+        self.assertEqual(self.feeder.get_last_price_id(), 1)
+
+
+class RoutePricesTests(FeederTestCase):
+    def test_route_prices(self):
+        prices = [
+            {"id": 1, "sell_asset": "XLM", "buy_asset": "EUR"},
+            {"id": 2, "sell_asset": "USDC", "buy_asset": "EUR"},
+            {"id": 3, "sell_asset": "BTC", "buy_asset": "EUR"},
+            {"id": 4, "sell_asset": "XLM", "buy_asset": "USD"},
+        ]
+        routed_prices, unrouted_prices = self.feeder.route_prices(prices)
+        self.assertEqual(
+            routed_prices, {"XLM": [prices[0], prices[3]], "USDC": [prices[1]]}
+        )
+        self.assertEqual(unrouted_prices, [prices[2]])
+
+    def test_single_contract_setting(self):
+        del self.feeder.local_settings.ORACLE_CONTRACTS
+        self.feeder.local_settings.ORACLE_CONTRACT_ID = "C..."
+        self.assertEqual(self.feeder.get_oracle_contracts(), {"XLM": "C..."})
+
+    def test_feeds_each_base_to_its_contract(self):
+        self.post_prices(
+            [
+                ("XLM", "EUR", "1.5"),
+                ("USDC", "EUR", "0.9"),
+                ("BTC", "EUR", "0.00001"),
+                ("XLM", "USD", "1.4"),
+            ]
+        )
+        self.assertTrue(self.feeder.read_prices_from_db())
+        for base, expected in (
+            ("XLM", {(0, "EUR"): "1.5", (0, "USD"): "1.4"}),
+            ("USDC", {(0, "EUR"): "0.9"}),
+            ("BTC", {}),
+        ):
+            onchain_prices = self.feeder.get_onchain_prices(base)
+            self.assertEqual(
+                {key: price for key, (price, _) in onchain_prices.items()}, expected
+            )
+        with self.feeder.cursor_ctx() as cursor:
+            cursor.execute("SELECT base FROM feed_bulk_from_db_journal ORDER BY base")
+            self.assertEqual([row["base"] for row in cursor.fetchall()], ["USDC", "XLM"])
+        # the BTC price has no contract, it is marked so it isn't read again
+        self.assertEqual(self.get_pending_price_ids(), [])
+        self.assertEqual(self.feeder.get_last_price_id(), 4)
+
+
+class ShouldFeedPriceTests(FeederTestCase):
+    timestamp = 6000
+
+    def should_feed(self, price: str, onchain_price=None, asset: str = "EUR"):
+        onchain_prices = {}
+        if onchain_price is not None:
+            onchain_prices[(0, asset)] = onchain_price
+        return self.feeder.should_feed_price(
+            {"source": 0, "buy_asset": asset, "price": price},
+            onchain_prices,
+            self.timestamp,
+        )
+
+    def test_never_fed(self):
+        self.feeder.local_settings.PRICE_DEVIATION_THRESHOLD = 0.01
+        self.assertTrue(self.should_feed("1.5"))
+
+    def test_missing_threshold_feeds_every_price(self):
+        self.assertTrue(self.should_feed("1.5", ("1.5", self.timestamp)))
+
+    def test_deviation_threshold(self):
+        self.feeder.local_settings.PRICE_DEVIATION_THRESHOLD = 0.01
+        self.assertFalse(self.should_feed("1.5149", ("1.5", self.timestamp)))
+        self.assertTrue(self.should_feed("1.515", ("1.5", self.timestamp)))
+        self.assertTrue(self.should_feed("1.485", ("1.5", self.timestamp)))
+
+    def test_per_asset_threshold(self):
+        self.feeder.local_settings.PRICE_DEVIATION_THRESHOLD = 0.01
+        self.feeder.local_settings.PRICE_DEVIATION_THRESHOLDS = {"BRL": 0.1}
+        self.assertFalse(self.should_feed("1.6", ("1.5", self.timestamp), "BRL"))
+        self.assertTrue(self.should_feed("1.6", ("1.5", self.timestamp), "EUR"))
+
+    def test_zero_last_price(self):
+        self.feeder.local_settings.PRICE_DEVIATION_THRESHOLD = 0.01
+        self.assertFalse(self.should_feed("0", ("0", self.timestamp)))
+        self.assertTrue(self.should_feed("0.0001", ("0", self.timestamp)))
+
+    def test_heartbeat(self):
+        self.feeder.local_settings.PRICE_DEVIATION_THRESHOLD = 0.01
+        self.feeder.local_settings.PRICE_HEARTBEAT = 3600
+        # still fresh at the next window
+        self.assertFalse(self.should_feed("1.5", ("1.5", self.timestamp - 3000)))
+        # would be older than the heartbeat by the next window
+        self.assertTrue(self.should_feed("1.5", ("1.5", self.timestamp - 3600)))
+        self.assertTrue(self.should_feed("0", ("0", self.timestamp - 3600)))
+
+    def test_skipped_prices_are_not_read_again(self):
+        self.feeder.local_settings.PRICE_DEVIATION_THRESHOLD = 0.01
+        self.post_prices([("XLM", "EUR", "1.5"), ("XLM", "USD", "2.5")])
+        self.assertTrue(self.feeder.read_prices_from_db())
+        self.post_prices([("XLM", "EUR", "1.501"), ("XLM", "USD", "2.6")])
+        self.allow_another_cycle()
+        self.assertTrue(self.feeder.read_prices_from_db())
+        onchain_prices = self.feeder.get_onchain_prices("XLM")
+        self.assertEqual(
+            {key: price for key, (price, _) in onchain_prices.items()},
+            {(0, "EUR"): "1.5", (0, "USD"): "2.6"},
+        )
+        self.assertEqual(self.get_pending_price_ids(), [])
+        self.assertEqual(self.feeder.get_last_price_id(), 4)
+
+
+class ResumeJournalTests(FeederTestCase):
+    def journal_pending_batch(self, send: bool = True, window_offset: int = 0):
+        """
+        Journals a batch of the prices in the database and leaves it pending,
+        as if the feeder had been killed before confirming it.
+        """
+        with self.feeder.cursor_ctx() as cursor:
+            cursor.execute("SELECT * FROM prices ORDER BY id DESC")
+            batch = [dict(row) for row in cursor.fetchall()]
+        timestamp = (
+            self.feeder.get_closest_past_timestamp(time.time(), self.feeder.RESOLUTION)
+            + window_offset
+        )
+        prices = [self.feeder.parse_price(price, timestamp) for price in batch]
+        journal_id = self.feeder.journal_batch(
+            "XLM", f"add_prices {prices}", batch, timestamp, 0, batch[0]["id"]
+        )
+        if send:
+            self.feeder.get_oracle_client("XLM").submit_add_prices(
+                prices, self.feeder.journal_tx(journal_id)
+            )
+        return journal_id
+
+    def expire(self, journal_id: int, tx_hash: str = None):
+        with self.feeder.cursor_ctx() as cursor:
+            cursor.execute(
+                """
+                UPDATE feed_bulk_from_db_journal
+                SET tx_expires_at = :tx_expires_at,
+                    tx_hash = COALESCE(:tx_hash, tx_hash)
+                WHERE id = :id
+                """,
+                {"tx_expires_at": int(time.time()) - 60, "tx_hash": tx_hash, "id": journal_id},
+            )
+
+    def test_never_sent(self):
+        self.post_prices([("XLM", "EUR", "1.5"), ("XLM", "USD", "2.5")])
+        self.journal_pending_batch(send=False)
+        self.rpc.reset_calls()
+        self.assertEqual(self.feeder.resume_journal(), 1)
+        self.assertEqual(self.rpc.calls["getTransaction"], 0)
+        self.assertEqual(self.get_journal_statuses(), ["failed"])
+        self.assertEqual(self.get_pending_price_ids(), [1, 2])
+
+    def test_expired(self):
+        self.post_prices([("XLM", "EUR", "1.5"), ("XLM", "USD", "2.5")])
+        journal_id = self.journal_pending_batch(send=False)
+        # signed, but the RPC never saw it
+        self.expire(journal_id, "00" * 32)
+        self.rpc.reset_calls()
+        start = time.perf_counter()
+        self.assertEqual(self.feeder.resume_journal(), 1)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(self.rpc.calls["getTransaction"], 1)
+        self.assertEqual(self.get_journal_statuses(), ["failed"])
+        self.assertEqual(self.get_pending_price_ids(), [1, 2])
+
+    def test_landed(self):
+        self.post_prices([("XLM", "EUR", "1.5"), ("XLM", "USD", "2.5")])
+        self.journal_pending_batch()
+        self.assertIsNone(self.feeder.resume_journal())
+        self.assertEqual(self.get_journal_statuses(), ["success"])
+        self.assertEqual(self.get_pending_price_ids(), [])
+        self.assertEqual(set(self.feeder.get_onchain_prices("XLM")), {(0, "EUR"), (0, "USD")})
+
+    def test_landed_and_expired(self):
+        self.post_prices([("XLM", "EUR", "1.5"), ("XLM", "USD", "2.5")])
+        journal_id = self.journal_pending_batch()
+        self.expire(journal_id)
+        # included when the next ledger closes
+        time.sleep(0.5)
+        self.rpc.reset_calls()
+        self.assertIsNone(self.feeder.resume_journal())
+        self.assertEqual(self.rpc.calls["getTransaction"], 1)
+        self.assertEqual(self.get_journal_statuses(), ["success"])
+        self.assertEqual(self.get_pending_price_ids(), [])
+
+    def test_resumed_batch_doesnt_close_the_current_window(self):
+        # left in flight in the previous window
+        self.post_prices([("XLM", "EUR", "1.5")])
+        self.journal_pending_batch(window_offset=-self.feeder.RESOLUTION)
+        self.post_prices([("XLM", "USD", "2.5")])
+        self.assertTrue(self.feeder.read_prices_from_db())
+        self.assertEqual(self.get_journal_statuses(), ["success", "success"])
+        self.assertEqual(self.get_pending_price_ids(), [])
+        self.assertEqual(self.feeder.get_last_price_id(), 2)
+        # the current window is closed now
+        self.post_prices([("XLM", "BRL", "0.3")])
+        self.assertIsNone(self.feeder.read_prices_from_db())
+        self.assertEqual(self.get_pending_price_ids(), [3])
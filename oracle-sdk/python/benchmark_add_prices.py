@@ -0,0 +1,112 @@
+"""
+Compares the resource usage of add_prices and add_prices_light for a set of
+batch sizes by simulating both calls against a deployed contract. Nothing is
+submitted. The batches are built from the assets and sources already
+registered in the contract, which is the case where add_prices_light applies.
+
+Usage: poetry run python3 benchmark_add_prices.py --secret S... \
+    [--contract-id C...] [--network testnet] [--batch-sizes 1,5,10,20]
+
+The secret must belong to the contract admin, whose account must exist on the
+network; simulation records the admin authorization without checking it.
+"""
+import argparse
+import time
+
+from stellar_sdk import Keypair, xdr as stellar_xdr
+
+from lightecho_stellar_oracle import (
+    ASSETS_TO_ASSET_U32,
+    TESTNET_CONTRACT_XLM,
+    OracleClient,
+)
+
+
+def build_prices(client: OracleClient, batch_size: int):
+    _, assets = client.assets()
+    _, sources = client.sources()
+    _, resolution = client.resolution()
+    pairs = [
+        (source, asset)
+        for source in sources
+        for asset in assets
+        if (asset["asset_type"], asset["asset"]) in ASSETS_TO_ASSET_U32
+    ]
+    if not pairs:
+        raise SystemExit("the contract has no registered asset with a known asset_u32")
+    timestamp = int(time.time()) // resolution * resolution
+    prices = []
+    for i in range(batch_size):
+        source, asset = pairs[i % len(pairs)]
+        prices.append(
+            {
+                "source": source,
+                "asset_type": asset["asset_type"],
+                "asset": asset["asset"],
+                "price": "1.2345",
+                # older timestamps once every pair is used, so each key is unique
+                "timestamp": timestamp - resolution * (i // len(pairs)),
+            }
+        )
+    return prices
+
+
+def measure(client: OracleClient, function_name: str, prices):
+    sim = client.simulate_contract_function(
+        function_name, client.build_add_prices_args(prices)
+    )
+    tx_data = stellar_xdr.SorobanTransactionData.from_xdr(sim.transaction_data)
+    footprint = tx_data.resources.footprint
+    return {
+        "cpu_insns": sim.cost.cpu_insns if sim.cost else None,
+        "mem_bytes": sim.cost.mem_bytes if sim.cost else None,
+        "read_bytes": tx_data.resources.read_bytes.uint32,
+        "write_bytes": tx_data.resources.write_bytes.uint32,
+        "footprint": f"{len(footprint.read_only)}r/{len(footprint.read_write)}w",
+        "resource_fee": sim.min_resource_fee,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--secret", required=True)
+    parser.add_argument("--contract-id", default=TESTNET_CONTRACT_XLM)
+    parser.add_argument("--network", default="testnet")
+    parser.add_argument("--batch-sizes", default="1,5,10,20")
+    args = parser.parse_args()
+
+    client = OracleClient(
+        contract_id=args.contract_id,
+        signer=Keypair.from_secret(args.secret),
+        network=args.network,
+    )
+    columns = (
+        "cpu_insns",
+        "mem_bytes",
+        "read_bytes",
+        "write_bytes",
+        "footprint",
+        "resource_fee",
+    )
+    print(f"{'batch':>5} {'function':<17}" + "".join(f"{c:>14}" for c in columns))
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        prices = build_prices(client, batch_size)
+        results = {}
+        for function_name in ("add_prices", "add_prices_light"):
+            results[function_name] = measure(client, function_name, prices)
+            print(
+                f"{batch_size:>5} {function_name:<17}"
+                + "".join(f"{str(results[function_name][c]):>14}" for c in columns)
+            )
+        full, light = results["add_prices"], results["add_prices_light"]
+        if full["cpu_insns"] and full["resource_fee"]:
+            print(
+                f"{'':>5} {'light / full':<17}"
+                f"{light['cpu_insns'] / full['cpu_insns']:>14.2f}"
+                f"{'':>56}"
+                f"{light['resource_fee'] / full['resource_fee']:>14.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Measures SCVal decode throughput on large prices() and
+lastprices_by_source_and_assets results, comparing the table-driven decoder
+with the previous if-chain.
+
+Every repetition decodes a freshly built result with new Stellar addresses,
+so the address cache of the decoder starts cold, as for a consumer that sees
+an asset for the first time. The warm-cache line shows the steady state of a
+consumer reading the same assets over and over.
+
+Usage: poetry run python3 benchmark_decode.py [--records N] [--repeat N]
+"""
+import argparse
+import time
+
+from stellar_sdk import Address, Keypair, scval, xdr as stellar_xdr
+from stellar_sdk.xdr.sc_val_type import SCValType
+
+from lightecho_stellar_oracle import (
+    OracleClient,
+    TESTNET_CONTRACT_XLM,
+    encode_address,
+)
+
+
+def build_price_data(price: int, timestamp: int):
+    return scval.to_map(
+        {
+            scval.to_symbol("price"): scval.to_int128(price),
+            scval.to_symbol("timestamp"): scval.to_uint64(timestamp),
+        }
+    )
+
+
+def build_prices_result(records: int, seed: int = 0):
+    return scval.to_vec(
+        [
+            build_price_data(10**18 + seed + i, 1700000000 - 600 * i)
+            for i in range(records)
+        ]
+    )
+
+
+def build_asset_map_result(records: int, seed: int = 0):
+    entries = []
+    for i in range(records):
+        if i % 2:
+            asset = scval.to_enum("Other", scval.to_symbol(f"A{i}"))
+        else:
+            address = Address(Keypair.random().public_key)
+            asset = scval.to_enum("Stellar", scval.to_address(address))
+        entries.append(
+            stellar_xdr.SCMapEntry(
+                asset, build_price_data(10**18 + seed + i, 1700000000)
+            )
+        )
+    return stellar_xdr.SCVal(SCValType.SCV_MAP, map=stellar_xdr.SCMap(entries))
+
+
+class IfChainDecoder:
+    """
+    The previous decoder, kept as the baseline.
+    """
+
+    def parse_sc_val(self, sc_val):
+        if sc_val.type == SCValType.SCV_BOOL:
+            return sc_val.b
+        if sc_val.u32 is not None:
+            return sc_val.u32.uint32
+        if sc_val.i32 is not None:
+            return sc_val.i32.int32
+        if sc_val.u64 is not None:
+            return sc_val.u64.uint64
+        if sc_val.i64 is not None:
+            return sc_val.i64.int64
+        if sc_val.u128 is not None:
+            return (sc_val.u128.hi.uint64 << 64) | sc_val.u128.lo.uint64
+        if sc_val.i128 is not None:
+            return (sc_val.i128.hi.int64 << 64) | sc_val.i128.lo.uint64
+        if sc_val.map is not None:
+            return self.parse_sc_map(sc_val.map.sc_map)
+        if sc_val.vec is not None:
+            return [self.parse_sc_val(val) for val in sc_val.vec.sc_vec]
+        if sc_val.sym is not None:
+            return sc_val.sym.sc_symbol.decode()
+        if sc_val.address is not None:
+            return Address.from_xdr_sc_address(sc_val.address).address
+        raise ValueError("Could not parse sc_val")
+
+    def parse_sc_map(self, sc_map):
+        return {
+            self.parse_sc_val(entry.key): self.parse_sc_val(entry.val)
+            for entry in sc_map
+        }
+
+    def parse_asset_enum(self, sc_val):
+        rust_asset_type = sc_val.vec.sc_vec[0].sym.sc_symbol.decode()
+        if rust_asset_type == "Other":
+            return ("other", sc_val.vec.sc_vec[1].sym.sc_symbol.decode())
+        if rust_asset_type == "Stellar":
+            return (
+                "stellar",
+                Address.from_xdr_sc_address(sc_val.vec.sc_vec[1].address).address,
+            )
+        raise ValueError(f"Unexpected asset enum type: {rust_asset_type}")
+
+    def parse_result(self, result, expect_asset_map=False):
+        if result.type == SCValType.SCV_BOOL:
+            return result.b
+        elif result.type == SCValType.SCV_VOID:
+            return
+        elif result.type == SCValType.SCV_MAP:
+            if expect_asset_map:
+                return {
+                    self.parse_asset_enum(entry.key): self.parse_sc_val(entry.val)
+                    for entry in result.map.sc_map
+                }
+            return self.parse_sc_map(result.map.sc_map)
+        elif result.type in [
+            SCValType.SCV_U32,
+            SCValType.SCV_I32,
+            SCValType.SCV_U64,
+            SCValType.SCV_I64,
+            SCValType.SCV_U128,
+            SCValType.SCV_I128,
+            SCValType.SCV_SYMBOL,
+            SCValType.SCV_VEC,
+        ]:
+            return self.parse_sc_val(result)
+        elif result.type == SCValType.SCV_ADDRESS:
+            return str(result.address)
+        else:
+            raise ValueError(f"Unexpected result type: {result.type}")
+
+
+def measure(name, parse, results, records):
+    encode_address.cache_clear()
+    start = time.perf_counter()
+    for result in results:
+        parse(result)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<60} {records * len(results) / elapsed:>12,.0f} records/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    client = OracleClient(
+        contract_id=TESTNET_CONTRACT_XLM,
+        signer=Keypair.random(),
+        network="testnet",
+    )
+    baseline = IfChainDecoder()
+    cases = [
+        ("prices", build_prices_result, False),
+        ("lastprices_by_source_and_assets", build_asset_map_result, True),
+    ]
+    for name, build_result, expect_asset_map in cases:
+        results = [build_result(args.records, seed) for seed in range(args.repeat)]
+        for result in results:
+            assert client.parse_result(
+                result, expect_asset_map=expect_asset_map
+            ) == baseline.parse_result(result, expect_asset_map=expect_asset_map)
+        measure(
+            f"{name} (if-chain)",
+            lambda sc_val: baseline.parse_result(sc_val, expect_asset_map),
+            results,
+            args.records,
+        )
+        measure(
+            f"{name} (table)",
+            lambda sc_val: client.parse_result(
+                sc_val, expect_asset_map=expect_asset_map
+            ),
+            results,
+            args.records,
+        )
+        if expect_asset_map:
+            # the same result over and over: every address is cached after
+            # the first repetition
+            measure(
+                f"{name} (table, warm address cache)",
+                lambda sc_val: client.parse_result(sc_val, expect_asset_map=True),
+                [results[0]] * args.repeat,
+                args.records,
+            )
+        # the XDR unpacking done by stellar_sdk for each RPC response, for scale
+        measure(
+            f"{name} (table + XDR unpacking)",
+            lambda xdr: client.parse_result(
+                stellar_xdr.SCVal.from_xdr(xdr), expect_asset_map=expect_asset_map
+            ),
+            [result.to_xdr() for result in results],
+            args.records,
+        )
+
+
+if __name__ == "__main__":
+    main()
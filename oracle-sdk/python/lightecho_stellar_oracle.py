@@ -1,11 +1,33 @@
+from abc import ABC, abstractmethod
+import asyncio
 import binascii
+import copy
 from decimal import Decimal
 import logging
+import re
+import threading
 import time
-from typing import List, Literal, Optional, Tuple, TypedDict, Union, Dict
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import queue
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    TypedDict,
+    Union,
+)
 import sys
 
 from stellar_sdk import (
+    Account,
+    FeeBumpTransactionEnvelope,
     Keypair,
     Network as StellarSdkNetwork,
     StrKey,
@@ -14,14 +36,25 @@ from stellar_sdk import (
     Address,
 )
 from stellar_sdk import scval, xdr as stellar_xdr
+from stellar_sdk.auth import authorize_entry
+from stellar_sdk.client.aiohttp_client import AiohttpClient
 from stellar_sdk.exceptions import PrepareTransactionException
-from stellar_sdk.soroban_rpc import GetTransactionStatus, SendTransactionStatus
+from stellar_sdk.soroban_rpc import (
+    GetLedgerEntriesResponse,
+    Request,
+    GetTransactionResponse,
+    GetTransactionStatus,
+    SendTransactionStatus,
+    SimulateTransactionResponse,
+)
 from stellar_sdk.soroban_server import SorobanServer
+from stellar_sdk.soroban_server_async import SorobanServerAsync
 from stellar_sdk.xdr.sc_val_type import SCValType
 
 
 AssetType = Literal["stellar", "other"]
 Network = Literal["standalone", "futurenet", "testnet", "public", "custom"]
+ReadMode = Literal["transaction", "simulation", "ledger"]
 
 TESTNET_CONTRACT_XLM = "CA335SIV2XT6OC3SOUTZBHTX5IXMFO3WYBD3NNVBP37JXX4FXFNF5CI6"
 TESTNET_CONTRACT_USD = ""  # not deployed yet
@@ -29,6 +62,79 @@ TESTNET_CONTRACT_USD = ""  # not deployed yet
 PUBLIC_CONTRACT_XLM = "CDOR3QD27WAAF4TK4MO33TGQXR6RPNANNVLOY277W2XVV6ZVJ6X6X42T"
 PUBLIC_CONTRACT_USD = ""  # not deployed yet
 
+# number of ledgers an admin authorization signed for a channel account stays valid
+AUTH_VALID_LEDGERS = 100
+
+# simulation errors raised when an invocation exceeds the network resource limits
+RESOURCE_LIMIT_ERRORS = ("Budget, ExceededLimit",)
+
+# a price written as [sign]digits[.digits], the form prices are usually given in
+PLAIN_DECIMAL_RE = re.compile(r"([+-]?)(\d*)(?:\.(\d*))?\Z", re.ASCII)
+
+# InternalPrice struct field names, in the sorted order of the contract struct
+INTERNAL_PRICE_FIELDS = [
+    scval.to_symbol(field)
+    for field in ("asset", "asset_u32", "price", "source", "timestamp")
+]
+
+# contract functions answered from contract storage in the "ledger" read mode
+LEDGER_READ_FUNCTIONS = (
+    "read_admin",
+    "base",
+    "decimals",
+    "resolution",
+    "assets",
+    "sources",
+    "price_by_source",
+    "lastprice_by_source",
+    "prices_by_source",
+    "price",
+    "lastprice",
+    "prices",
+)
+# the contract instance storage the "ledger" read mode knows how to read: the
+# keys of constants.rs and the types contract_light.rs stores under them
+# (last_timestamp is an i32 until the first prices are added). Any other
+# instance key maps an asset symbol or address to its u32 id. The contract
+# stores no version, so a storage that doesn't match this layout is taken for
+# another version of the contract.
+LEDGER_LAYOUT: Dict[str, Tuple[SCValType, ...]] = {
+    "admin": (SCValType.SCV_ADDRESS,),
+    "base_asset": (SCValType.SCV_VEC,),
+    "decimals": (SCValType.SCV_U32,),
+    "resolution": (SCValType.SCV_U32,),
+    "last_timestamp": (SCValType.SCV_U64, SCValType.SCV_I32),
+    "assets": (SCValType.SCV_VEC,),
+    "sources": (SCValType.SCV_VEC,),
+}
+# the network minimum inclusion fee per operation (in stroops)
+MIN_INCLUSION_FEE = 100
+# the inclusion fee every transaction used to bid, now the default ceiling
+DEFAULT_MAX_INCLUSION_FEE = 300000
+# how long the getFeeStats response is reused (in seconds), about two ledgers
+FEE_STATS_TTL = 10
+# stellar-core only replaces a queued transaction with a fee bump whose
+# inclusion fee is at least 10 times higher
+FEE_BUMP_MULTIPLIER = 10
+# ledgers after which an accepted but unconfirmed transaction is fee-bumped
+STUCK_TX_LEDGERS = 2
+
+# maximum number of records returned by prices_by_source (see contract_light.rs)
+MAX_PRICE_RECORDS = 20
+# maximum number of keys accepted by a getLedgerEntries request
+MAX_LEDGER_ENTRIES_KEYS = 200
+
+# contract functions whose results rarely change and are cached by the clients
+METADATA_FUNCTIONS = ("base", "decimals", "resolution", "assets", "sources")
+
+# metadata invalidated by each write function (None invalidates everything)
+METADATA_INVALIDATED_BY: Dict[str, Optional[Tuple[str, ...]]] = {
+    "initialize": None,
+    "write_resolution": None,
+    "update_contract": None,
+    "add_prices": ("assets", "sources"),
+}
+
 ASSETS_TO_ASSET_U32: Dict[Tuple, int] = {
  #   ("other", "ARST"): 0,
  #   ("other", "AUDD"): 1,
@@ -77,6 +183,28 @@ class InsufficientBalance(Exception):
         self.tx_data = tx_data
 
 
+class BadSequence(RuntimeError):
+    def __init__(self, message, tx_data):
+        super().__init__(message)
+        self.tx_data = tx_data
+
+
+class ResourceLimitExceeded(RuntimeError):
+    def __init__(self, message, tx_data):
+        super().__init__(message)
+        self.tx_data = tx_data
+
+
+class LedgerLayoutMismatch(Exception):
+    pass
+
+
+class TransactionTimeout(Exception):
+    def __init__(self, message, tx_hashes):
+        super().__init__(message)
+        self.tx_hashes = tx_hashes
+
+
 class Price(TypedDict):
     price: str
     timestamp: int
@@ -95,7 +223,561 @@ class Asset(TypedDict):
     asset: str
 
 
-class OracleClient:
+class BatchResult(TypedDict):
+    tx_hash: Optional[str]
+    tx_data: Optional[GetTransactionResponse]
+    error: Optional[Exception]
+    fee_charged: Optional[int]
+
+
+class LedgerCadence:
+    """
+    Schedules transaction status polls from the observed ledger close cadence.
+
+    Every getTransaction/sendTransaction response carries the latest ledger
+    sequence and its close time. The next poll is planned for just after the
+    next ledger is expected to close; if that ledger is late, polls back off
+    exponentially from `min_interval` up to `max_interval`.
+    """
+
+    def __init__(
+        self,
+        max_interval: float = 3,
+        min_interval: float = 0.5,
+        margin: float = 0.5,
+        close_interval: float = 5,
+    ):
+        self.max_interval = max_interval
+        self.min_interval = min_interval
+        self.margin = margin
+        self.close_interval = close_interval
+        self.latest_ledger: Optional[int] = None
+        self.latest_ledger_close_time: Optional[int] = None
+        self.clock_offset: Optional[float] = None
+        self.overdue_polls = 0
+
+    def observe(self, latest_ledger: int, latest_ledger_close_time: int) -> bool:
+        """
+        Records the latest ledger seen in an RPC response.
+
+        Returns:
+            bool: True if the ledger is newer than any ledger seen before.
+        """
+        now = time.time()
+        offset = now - latest_ledger_close_time
+        if self.clock_offset is None or offset < self.clock_offset:
+            self.clock_offset = offset
+        if self.latest_ledger is not None and latest_ledger <= self.latest_ledger:
+            return False
+        if (
+            self.latest_ledger is not None
+            and self.latest_ledger_close_time is not None
+            and latest_ledger_close_time > self.latest_ledger_close_time
+        ):
+            sample = (latest_ledger_close_time - self.latest_ledger_close_time) / (
+                latest_ledger - self.latest_ledger
+            )
+            sample = min(max(sample, 1), 30)
+            self.close_interval = 0.8 * self.close_interval + 0.2 * sample
+        self.latest_ledger = latest_ledger
+        self.latest_ledger_close_time = latest_ledger_close_time
+        self.overdue_polls = 0
+        return True
+
+    def next_delay(self) -> float:
+        """
+        Returns how long to sleep (in seconds) before polling again.
+        """
+        if self.latest_ledger_close_time is None or self.clock_offset is None:
+            return self.min_interval
+        expected_close = (
+            self.latest_ledger_close_time + self.clock_offset + self.close_interval
+        )
+        delay = expected_close + self.margin - time.time()
+        if delay <= 0:
+            delay = self.min_interval * 2**self.overdue_polls
+            self.overdue_polls += 1
+        return min(max(delay, self.min_interval), self.max_interval)
+
+
+# A step of the routines shared by OracleClient and AsyncOracleClient: the
+# name of a SorobanServer (or SorobanServerAsync) method and its arguments, or
+# ("sleep", (seconds,)). The routines are generators that yield their steps
+# and receive the results, so that they don't depend on the transport; see
+# run_steps() and run_steps_async().
+Step = Tuple[str, tuple]
+Steps = Generator[Step, Any, Any]
+
+
+def run_steps(steps: Steps, server: SorobanServer):
+    """
+    Runs a routine, performing each of its steps with a blocking call. The
+    result of a step is sent back into the routine, and the exception it
+    raised is thrown into it.
+
+    Args:
+        steps (Steps): The routine.
+        server (SorobanServer): The Soroban RPC server.
+
+    Returns:
+        The value returned by the routine.
+    """
+    value: Any = None
+    error: Optional[Exception] = None
+    while True:
+        try:
+            if error is None:
+                name, args = steps.send(value)
+            else:
+                name, args = steps.throw(error)
+        except StopIteration as e:
+            return e.value
+        try:
+            if name == "sleep":
+                value = time.sleep(*args)
+            else:
+                value = getattr(server, name)(*args)
+            error = None
+        except Exception as e:
+            value, error = None, e
+
+
+async def run_steps_async(steps: Steps, server: SorobanServerAsync):
+    """
+    Same as run_steps(), awaiting each step.
+    """
+    value: Any = None
+    error: Optional[Exception] = None
+    while True:
+        try:
+            if error is None:
+                name, args = steps.send(value)
+            else:
+                name, args = steps.throw(error)
+        except StopIteration as e:
+            return e.value
+        try:
+            if name == "sleep":
+                value = await asyncio.sleep(*args)
+            else:
+                value = await getattr(server, name)(*args)
+            error = None
+        except Exception as e:
+            value, error = None, e
+
+
+def wait_for_transactions_steps(
+    tx_hashes: List[str],
+    timeout: float,
+    cadence: LedgerCadence,
+    replace_stuck_tx: Optional[Callable[[str], Steps]] = None,
+) -> Steps:
+    """
+    The polling loop of wait_for_transactions(), as a routine (see Step).
+
+    Args:
+        tx_hashes (List[str]): The transaction hashes.
+        timeout (float): Hard deadline (in seconds).
+        cadence (LedgerCadence): Ledger cadence to reuse between calls.
+        replace_stuck_tx (Callable, optional): Returns the routine replacing a transaction still pending after
+            STUCK_TX_LEDGERS ledgers, which returns the hash of its replacement (e.g. a fee bump), or None.
+
+    Returns:
+        Dict[str, GetTransactionResponse]: The final transaction data, keyed by hash.
+
+    Raises:
+        TransactionTimeout: If some transactions are still not found after `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    pending = list(tx_hashes)
+    # the hash polled for each transaction, which changes when it is replaced
+    polled_hashes = {tx_hash: tx_hash for tx_hash in tx_hashes}
+    pending_since: Dict[str, int] = {}
+    results = {}
+    is_first_round = True
+    while True:
+        is_new_ledger = is_first_round
+        for tx_hash in list(pending):
+            get_transaction_data = yield ("get_transaction", (polled_hashes[tx_hash],))
+            if cadence.observe(
+                get_transaction_data.latest_ledger,
+                get_transaction_data.latest_ledger_close_time,
+            ):
+                is_new_ledger = True
+            if (
+                get_transaction_data.status == GetTransactionStatus.FAILED
+                and polled_hashes[tx_hash] != tx_hash
+            ):
+                # the replacement fails if the original made it in first
+                original_data = yield ("get_transaction", (tx_hash,))
+                if original_data.status != GetTransactionStatus.NOT_FOUND:
+                    get_transaction_data = original_data
+            if get_transaction_data.status != GetTransactionStatus.NOT_FOUND:
+                results[tx_hash] = get_transaction_data
+                pending.remove(tx_hash)
+            elif not is_new_ledger:
+                # no ledger closed since the last round, so the status of the
+                # other pending transactions can't have changed either
+                break
+        if not pending:
+            return results
+        if replace_stuck_tx is not None and cadence.latest_ledger is not None:
+            for tx_hash in pending:
+                since = pending_since.setdefault(tx_hash, cadence.latest_ledger)
+                if cadence.latest_ledger - since >= STUCK_TX_LEDGERS:
+                    pending_since[tx_hash] = cadence.latest_ledger
+                    replacement_hash = yield from replace_stuck_tx(
+                        polled_hashes[tx_hash]
+                    )
+                    if replacement_hash is not None:
+                        polled_hashes[tx_hash] = replacement_hash
+        is_first_round = False
+        delay = cadence.next_delay()
+        if time.monotonic() + delay > deadline:
+            raise TransactionTimeout(
+                f"Transactions not confirmed after {timeout} seconds: {pending}",
+                pending,
+            )
+        yield ("sleep", (delay,))
+
+
+def wait_for_transactions(
+    server: SorobanServer,
+    tx_hashes: List[str],
+    timeout: float,
+    cadence: Optional[LedgerCadence] = None,
+) -> Dict[str, GetTransactionResponse]:
+    """
+    Waits for many transactions in a single polling loop.
+
+    Pending hashes are only polled again once a new ledger has been observed,
+    so an idle network costs one getTransaction call per poll, whatever the
+    number of in-flight transactions.
+
+    Args:
+        server (SorobanServer): The Soroban RPC server.
+        tx_hashes (List[str]): The transaction hashes.
+        timeout (float): Hard deadline (in seconds).
+        cadence (LedgerCadence, optional): Ledger cadence to reuse between calls.
+
+    Returns:
+        Dict[str, GetTransactionResponse]: The final transaction data, keyed by hash.
+
+    Raises:
+        TransactionTimeout: If some transactions are still not found after `timeout` seconds.
+    """
+    if cadence is None:
+        cadence = LedgerCadence()
+    return run_steps(wait_for_transactions_steps(tx_hashes, timeout, cadence), server)
+
+
+class SequenceManager:
+    """
+    Thread-safe local sequence number counter for a source account, so that
+    consecutive transactions don't reload the account from the network and
+    don't have to wait for each other's confirmation.
+    """
+
+    def __init__(self, account_id: str):
+        self.account_id = account_id
+        self.sequence: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def next_account(self) -> Optional[Account]:
+        """
+        Reserves the next sequence number.
+
+        Returns:
+            Optional[Account]: The source account to build the transaction with, or None if the counter must be resynced first.
+        """
+        with self.lock:
+            if self.sequence is None:
+                return None
+            account = Account(self.account_id, self.sequence)
+            self.sequence += 1
+            return account
+
+    def resync(self, sequence: int):
+        """
+        Sets the counter from the sequence number loaded from the network.
+        Sequence numbers already reserved locally are never handed out again.
+        """
+        with self.lock:
+            if self.sequence is None or sequence > self.sequence:
+                self.sequence = sequence
+
+    def release(self, sequence: int):
+        """
+        Gives back a sequence number that was reserved but not consumed, e.g.
+        because the submission was rejected. If other numbers were reserved
+        after it, they can't be used anymore and a resync is forced instead.
+        """
+        with self.lock:
+            if self.sequence == sequence + 1:
+                self.sequence = sequence
+            else:
+                self.sequence = None
+
+    def invalidate(self):
+        """
+        Forces a resync before the next transaction.
+        """
+        with self.lock:
+            self.sequence = None
+
+
+class FeeManager:
+    """
+    Picks the inclusion fee of new transactions from the getFeeStats
+    percentiles of recent Soroban transactions, raises it for rejected or
+    stuck submissions, and keeps track of the fees charged. Inclusion fees
+    never exceed `max_inclusion_fee`; the resource fee always comes from the
+    simulation.
+    """
+
+    def __init__(
+        self,
+        max_inclusion_fee: int = DEFAULT_MAX_INCLUSION_FEE,
+        percentile: str = "p90",
+        stats_ttl: float = FEE_STATS_TTL,
+    ):
+        self.max_inclusion_fee = max_inclusion_fee
+        self.percentile = percentile
+        self.stats_ttl = stats_ttl
+        self.fee_stats: Optional[dict] = None
+        self.fee_stats_expires_at = 0.0
+        self.lock = threading.Lock()
+        self.transactions = 0
+        self.total_fee_charged = 0
+        self.last_fee_charged: Optional[int] = None
+
+    def needs_fee_stats(self) -> bool:
+        return time.monotonic() >= self.fee_stats_expires_at
+
+    def observe_fee_stats(self, fee_stats: Optional[dict]):
+        """
+        Records a getFeeStats response. None records a failed request, so the
+        previous statistics are kept until the next refresh.
+        """
+        with self.lock:
+            if fee_stats is not None:
+                self.fee_stats = fee_stats
+            self.fee_stats_expires_at = time.monotonic() + self.stats_ttl
+
+    def inclusion_fee(self) -> int:
+        """
+        Returns the inclusion fee to bid for a new transaction.
+        """
+        with self.lock:
+            distribution = (self.fee_stats or {}).get("sorobanInclusionFee") or {}
+        fee = int(distribution.get(self.percentile, MIN_INCLUSION_FEE))
+        return min(max(fee, MIN_INCLUSION_FEE), self.max_inclusion_fee)
+
+    def raised_inclusion_fee(
+        self, inclusion_fee: int, required_fee: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Returns the inclusion fee to resend a transaction rejected for its fee
+        with, or None if it would exceed `max_inclusion_fee`.
+
+        Args:
+            inclusion_fee (int): The inclusion fee of the rejected transaction.
+            required_fee (int, optional): The minimum fee reported by the rejection.
+        """
+        if inclusion_fee >= self.max_inclusion_fee:
+            return None
+        fee = max(inclusion_fee * 2, required_fee or 0, self.inclusion_fee())
+        return min(fee, self.max_inclusion_fee)
+
+    def replacement_inclusion_fee(self, inclusion_fee: int) -> Optional[int]:
+        """
+        Returns the inclusion fee of a fee bump replacing a queued transaction,
+        or None if it would exceed `max_inclusion_fee`.
+
+        Args:
+            inclusion_fee (int): The inclusion fee of the queued transaction.
+        """
+        fee = max(inclusion_fee * FEE_BUMP_MULTIPLIER, self.inclusion_fee())
+        if fee > self.max_inclusion_fee:
+            return None
+        return fee
+
+    def record_fee_charged(self, tx_data) -> Optional[int]:
+        """
+        Records the fee charged for a confirmed transaction.
+
+        Returns:
+            Optional[int]: The fee charged (in stroops), or None if unknown.
+        """
+        fee_charged = get_fee_charged(tx_data)
+        if fee_charged is not None:
+            with self.lock:
+                self.transactions += 1
+                self.total_fee_charged += fee_charged
+                self.last_fee_charged = fee_charged
+        return fee_charged
+
+    def report(self) -> dict:
+        """
+        Returns the number of confirmed transactions, the total fee charged and
+        the fee charged for the last one (in stroops).
+        """
+        with self.lock:
+            return {
+                "transactions": self.transactions,
+                "total_fee_charged": self.total_fee_charged,
+                "last_fee_charged": self.last_fee_charged,
+            }
+
+
+def get_fee_charged(tx_data) -> Optional[int]:
+    """
+    Returns the fee charged for a transaction from its result XDR, as found in
+    getTransaction and sendTransaction responses.
+    """
+    result_xdr = getattr(tx_data, "result_xdr", None) or getattr(
+        tx_data, "error_result_xdr", None
+    )
+    if result_xdr is None:
+        return None
+    try:
+        return stellar_xdr.TransactionResult.from_xdr(result_xdr).fee_charged.int64
+    except (TypeError, ValueError, binascii.Error):
+        return None
+
+
+def price_to_int(price: str, decimal_places: int) -> int:
+    """
+    Converts a decimal price to its fixed-point integer representation with
+    integer arithmetic only. Prices that are not plain decimals (e.g. with an
+    exponent) are normalized through Decimal first.
+
+    Args:
+        price (str): The price, e.g. "0.1234".
+        decimal_places (int): The number of decimal places of the fixed-point representation.
+
+    Returns:
+        int: The price multiplied by 10 ** decimal_places.
+
+    Raises:
+        ValueError: The price has more than `decimal_places` decimal places.
+    """
+    match = PLAIN_DECIMAL_RE.match(price)
+    if match is None or not (match.group(2) or match.group(3)):
+        match = PLAIN_DECIMAL_RE.match("{:f}".format(Decimal(price)))
+        if match is None:
+            raise ValueError(f"Invalid price: {price}")
+    sign, integer, fraction = match.groups()
+    fraction = fraction or ""
+    zeroes_to_add = decimal_places - len(fraction)
+    if zeroes_to_add < 0:
+        raise ValueError(
+            f"Invalid price: no more than {decimal_places} decimal places are allowed"
+        )
+    price_as_int = int(integer + fraction or "0") * 10**zeroes_to_add
+    return -price_as_int if sign == "-" else price_as_int
+
+
+@lru_cache(maxsize=4096)
+def encode_address(is_contract: bool, raw_address: bytes) -> str:
+    if is_contract:
+        return StrKey.encode_contract(raw_address)
+    return StrKey.encode_ed25519_public_key(raw_address)
+
+
+def decode_sc_address(sc_address: stellar_xdr.SCAddress) -> str:
+    # cached on the raw key, since the same assets come back in every result
+    if sc_address.type == stellar_xdr.SCAddressType.SC_ADDRESS_TYPE_CONTRACT:
+        return encode_address(True, sc_address.contract_id.hash)
+    return encode_address(False, sc_address.account_id.account_id.ed25519.uint256)
+
+
+def decode_u128(sc_val: stellar_xdr.SCVal) -> int:
+    return (sc_val.u128.hi.uint64 << 64) | sc_val.u128.lo.uint64
+
+
+def decode_i128(sc_val: stellar_xdr.SCVal) -> int:
+    return (sc_val.i128.hi.int64 << 64) | sc_val.i128.lo.uint64
+
+
+def decode_sc_vec(sc_val: stellar_xdr.SCVal) -> list:
+    return [decode_sc_val(val) for val in sc_val.vec.sc_vec]
+
+
+def decode_sc_map_entries(sc_map_entries: List[stellar_xdr.SCMapEntry]) -> dict:
+    # fast path for the PriceData struct, by far the most common map
+    if (
+        len(sc_map_entries) == 2
+        and sc_map_entries[0].key.sym is not None
+        and sc_map_entries[0].key.sym.sc_symbol == b"price"
+        and sc_map_entries[1].key.sym is not None
+        and sc_map_entries[1].key.sym.sc_symbol == b"timestamp"
+        and sc_map_entries[0].val.type == SCValType.SCV_I128
+        and sc_map_entries[1].val.type == SCValType.SCV_U64
+    ):
+        return {
+            "price": decode_i128(sc_map_entries[0].val),
+            "timestamp": sc_map_entries[1].val.u64.uint64,
+        }
+    return {
+        decode_sc_val(entry.key): decode_sc_val(entry.val) for entry in sc_map_entries
+    }
+
+
+def decode_sc_map(sc_val: stellar_xdr.SCVal) -> dict:
+    return decode_sc_map_entries(sc_val.map.sc_map)
+
+
+def decode_asset_enum(sc_val: stellar_xdr.SCVal) -> Tuple[AssetType, str]:
+    rust_asset_type, value = sc_val.vec.sc_vec
+    if rust_asset_type.sym.sc_symbol == b"Other":
+        return ("other", value.sym.sc_symbol.decode())
+    if rust_asset_type.sym.sc_symbol == b"Stellar":
+        return ("stellar", decode_sc_address(value.address))
+    raise ValueError(
+        f"Unexpected asset enum type: {rust_asset_type.sym.sc_symbol.decode()}"
+    )
+
+
+def decode_sc_asset_map_entries(
+    sc_map_entries: List[stellar_xdr.SCMapEntry],
+) -> Dict[Tuple[AssetType, str], Any]:
+    return {
+        decode_asset_enum(entry.key): decode_sc_val(entry.val)
+        for entry in sc_map_entries
+    }
+
+
+# SCVal decoders by type. Types missing from the table are not produced by the
+# contract and fail to decode.
+SC_VAL_DECODERS: Dict[SCValType, Callable[[stellar_xdr.SCVal], Any]] = {
+    SCValType.SCV_BOOL: lambda sc_val: sc_val.b,
+    SCValType.SCV_U32: lambda sc_val: sc_val.u32.uint32,
+    SCValType.SCV_I32: lambda sc_val: sc_val.i32.int32,
+    SCValType.SCV_U64: lambda sc_val: sc_val.u64.uint64,
+    SCValType.SCV_I64: lambda sc_val: sc_val.i64.int64,
+    SCValType.SCV_U128: decode_u128,
+    SCValType.SCV_I128: decode_i128,
+    SCValType.SCV_MAP: decode_sc_map,
+    SCValType.SCV_VEC: decode_sc_vec,
+    SCValType.SCV_SYMBOL: lambda sc_val: sc_val.sym.sc_symbol.decode(),
+    SCValType.SCV_ADDRESS: lambda sc_val: decode_sc_address(sc_val.address),
+}
+
+
+def decode_sc_val(sc_val: stellar_xdr.SCVal):
+    decoder = SC_VAL_DECODERS.get(sc_val.type)
+    if decoder is None:
+        raise ValueError("Could not parse sc_val")
+    return decoder(sc_val)
+
+
+class BaseOracleClient(ABC):
+    """
+    Network configuration, argument building and result parsing shared by
+    OracleClient and AsyncOracleClient. Subclasses provide the transport.
+    """
+
     def __init__(
         self,
         *,
@@ -107,6 +789,13 @@ class OracleClient:
         wait_tx_interval: int = 3,
         tx_timeout: int = 30,
         decimal_places: int = 18,
+        read_mode: ReadMode = "transaction",
+        wait_tx_timeout: Optional[int] = None,
+        auth_signer: Optional[Keypair] = None,
+        metadata_ttl: Optional[float] = 300,
+        max_inclusion_fee: int = DEFAULT_MAX_INCLUSION_FEE,
+        fee_percentile: str = "p90",
+        sequence_manager: Optional[SequenceManager] = None,
     ):
         """
         Initializes an Oracle Client instance.
@@ -117,13 +806,36 @@ class OracleClient:
             network (Network): The Stellar network to connect to (e.g., "standalone", "futurenet", "testnet", "public").
             custom_rpc_url (str, optional): The custom RPC server URL. Default is None.
             custom_network_passphrase (str, optional): The custom network passphrase. Default is None.
-            wait_tx_interval (int, optional): The interval to wait for a transaction (in seconds). Default is 3 seconds.
+            wait_tx_interval (int, optional): The maximum interval between transaction status polls (in seconds). Polls are scheduled from the observed ledger close times. Default is 3 seconds.
             tx_timeout (int, optional): The transaction timeout (in seconds). Default is 30 seconds.
             decimal_places (int, optional): The number of decimal places for prices. Default is 18.
+            read_mode (ReadMode, optional): How read-only contract functions are invoked. "transaction"
+                submits a real transaction and waits for it, "simulation" answers the call from
+                simulateTransaction alone (no fees, no signature, no confirmation wait, and the returned
+                transaction hash is None), "ledger" reads the contract storage directly with
+                getLedgerEntries and falls back to "simulation" for functions or storage layouts
+                it does not know. Default is "transaction".
+            wait_tx_timeout (int, optional): How long to wait for a transaction confirmation before raising TransactionTimeout (in seconds). Default is tx_timeout + 30 seconds.
+            auth_signer (Keypair, optional): The keypair that authorizes contract calls when it differs from
+                `signer`, e.g. the contract admin when `signer` is a channel account that only pays the fees.
+                Default is None.
+            metadata_ttl (float, optional): How long the results of base(), decimals(), resolution(), assets()
+                and sources() are cached (in seconds). The cache is invalidated by writes made through this
+                client. None disables the cache. Default is 300 seconds.
+            max_inclusion_fee (int, optional): The highest inclusion fee per operation (in stroops) bid for a
+                transaction, including resubmissions and fee bumps. The resource fee from the simulation comes
+                on top of it. Default is 300000 stroops.
+            fee_percentile (str, optional): The percentile of the recent Soroban inclusion fees (from
+                getFeeStats) bid for new transactions, e.g. "p50" or "p90". Default is "p90".
+            sequence_manager (SequenceManager, optional): The sequence number counter of `signer`. Pass the
+                same one to every client signing with the same account, e.g. clients of several contracts,
+                so that they don't hand out the same sequence numbers. Default is a new one.
 
         Returns:
             None
         """
+        if read_mode not in ("transaction", "simulation", "ledger"):
+            raise ValueError(f"unexpected read_mode: {read_mode}")
         self.network = network
         if network == "standalone":
             self.network_passphrase = StellarSdkNetwork.STANDALONE_NETWORK_PASSPHRASE
@@ -152,227 +864,1895 @@ class OracleClient:
             raise ValueError(
                 "custom_network_passphrase is only allowed for custom network"
             )
-        self.server = SorobanServer(self.rpc_server_url)
         self.contract_id = contract_id
         self.signer = signer
         self.wait_tx_interval = wait_tx_interval
         self.tx_timeout = tx_timeout
+        if wait_tx_timeout is None:
+            wait_tx_timeout = tx_timeout + 30
+        self.wait_tx_timeout = wait_tx_timeout
+        self.ledger_cadence = LedgerCadence(max_interval=wait_tx_interval)
+        if sequence_manager is None:
+            sequence_manager = SequenceManager(signer.public_key)
+        elif sequence_manager.account_id != signer.public_key:
+            raise ValueError("sequence_manager belongs to another account")
+        self.sequence_manager = sequence_manager
+        self.fee_manager = FeeManager(max_inclusion_fee, fee_percentile)
+        # transactions accepted by the network, kept until confirmed to fee-bump them if stuck
+        self.submitted_txs: Dict[
+            str, Tuple[Union[TransactionEnvelope, FeeBumpTransactionEnvelope], float]
+        ] = {}
+        self.submitted_txs_lock = threading.Lock()
+        self.auth_signer = auth_signer
+        self.metadata_ttl = metadata_ttl
+        self.metadata_cache: Dict[str, Tuple[float, Any]] = {}
+        self.metadata_lock = threading.Lock()
+        self.add_prices_batch_size: Optional[int] = None
+        self.asset_args_cache: Dict[
+            Tuple[AssetType, str], Tuple[stellar_xdr.SCVal, stellar_xdr.SCVal]
+        ] = {}
         self.decimal_places = decimal_places
         self.decimal_places_divider = 10**decimal_places
+        self.read_mode = read_mode
+        self.server = self.create_server()
 
-    def build_asset_enum(self, asset_type: AssetType, asset: str):
-        if asset_type == "stellar":
-            return scval.to_enum("Stellar", scval.to_address(asset))
-        elif asset_type == "other":
-            return scval.to_enum("Other", scval.to_symbol(asset))
-        else:
-            return ValueError(f"unexpected asset_type: {asset_type}")
-
-    def is_insufficient_balance_transaction_data(self, tx_data):
-        error_result_xdr = getattr(tx_data, "error_result_xdr", None)
-        if error_result_xdr is None:
-            return False
-
-        try:
-            xdr_tx_result = stellar_xdr.TransactionResult.from_xdr(error_result_xdr)
-        except (TypeError, ValueError, binascii.Error):
-            return False
-
-        if (
-            xdr_tx_result.result.code
-            != stellar_xdr.TransactionResultCode.txINSUFFICIENT_BALANCE
-        ):
-            return False
-        return True
-
-    def send_tx(self, tx: TransactionEnvelope):
+    @abstractmethod
+    def create_server(self):
         """
-        Sends a transaction and waits for confirmation.
-
-        Args:
-            tx (TransactionEnvelope): The transaction to send.
-
-        Returns:
-            Tuple[str, GetTransactionStatus]: A tuple containing the transaction hash and its status.
+        Returns the Soroban RPC server the client talks to.
         """
-        tx = self.server.prepare_transaction(tx)
-        tx.sign(self.signer)
-        send_transaction_data = self.server.send_transaction(tx)
-        if send_transaction_data.status != SendTransactionStatus.PENDING:
-            if self.is_insufficient_balance_transaction_data(send_transaction_data):
-                raise InsufficientBalance(
-                    "Insufficient balance",
-                    send_transaction_data,
-                )
-            raise RuntimeError(f"Failed to send transaction: {send_transaction_data}")
-        tx_hash = send_transaction_data.hash
-        return tx_hash, self.wait_tx(tx_hash)
 
-    def wait_tx(self, tx_hash: str):
+    def get_cached_metadata(self, function_name: str):
+        if self.metadata_ttl is None:
+            return None
+        with self.metadata_lock:
+            entry = self.metadata_cache.get(function_name)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            return None
+        # callers may mutate the lists and dicts they get back
+        return copy.deepcopy(value)
+
+    def cache_metadata(self, function_name: str, value):
+        if function_name == "decimals":
+            self.set_decimal_places(value)
+        if self.metadata_ttl is None:
+            return
+        with self.metadata_lock:
+            self.metadata_cache[function_name] = (
+                time.monotonic() + self.metadata_ttl,
+                copy.deepcopy(value),
+            )
+
+    def invalidate_metadata(self, function_names: Optional[Tuple[str, ...]] = None):
         """
-        Waits for a transaction to be confirmed.
+        Drops cached metadata.
 
         Args:
-            tx_hash (str): The transaction hash.
-
-        Returns:
-            GetTransactionStatus: The status of the transaction.
+            function_names (Tuple[str, ...], optional): The metadata functions to drop. Default is all of them.
         """
-        while True:
-            get_transaction_data = self.server.get_transaction(tx_hash)
-            if get_transaction_data.status != GetTransactionStatus.NOT_FOUND:
-                break
-            time.sleep(self.wait_tx_interval)
-        return get_transaction_data
+        with self.metadata_lock:
+            if function_names is None:
+                self.metadata_cache.clear()
+            else:
+                for function_name in function_names:
+                    self.metadata_cache.pop(function_name, None)
 
-    def invoke_contract_function(self, function_name, parameters=[]):
-        """
-        Invokes a function on the contract.
+    def invalidate_metadata_for_call(self, function_name: str):
+        if function_name in METADATA_INVALIDATED_BY:
+            self.invalidate_metadata(METADATA_INVALIDATED_BY[function_name])
 
-        Args:
-            function_name (str): The name of the contract function.
-            parameters (list, optional): The function parameters.
+    def set_decimal_places(self, decimal_places: int):
+        if decimal_places != self.decimal_places:
+            logging.warning(
+                f"decimal_places {self.decimal_places} differs from the contract decimals {decimal_places}, using {decimal_places}"
+            )
+        self.decimal_places = decimal_places
+        self.decimal_places_divider = 10**decimal_places
 
-        Returns:
-            Tuple[str, Any]: A tuple containing the transaction hash and the result of the function.
-        """
-        source_account = self.server.load_account(self.signer.public_key)
-        tx = (
+    def parse_assets(self, results) -> List[Asset]:
+        return [self.parse_asset(result) for result in results]
+
+    def build_invoke_contract_function_tx(
+        self, source_account: Account, function_name, parameters=[], auth=None
+    ) -> TransactionEnvelope:
+        return (
             TransactionBuilder(
                 source_account,
                 self.network_passphrase,
-                base_fee=300000,
+                base_fee=self.fee_manager.inclusion_fee(),
             )
             .set_timeout(self.tx_timeout)
             .append_invoke_contract_function_op(
                 self.contract_id,
                 function_name,
                 parameters,
+                auth=auth,
             )
             .build()
         )
 
+    def get_resource_fee(self, tx: TransactionEnvelope) -> int:
+        soroban_data = tx.transaction.soroban_data
+        if soroban_data is None:
+            return 0
+        return soroban_data.resource_fee.int64
+
+    def get_inclusion_fee(
+        self, tx: Union[TransactionEnvelope, FeeBumpTransactionEnvelope]
+    ) -> int:
+        """
+        Returns the inclusion fee bid per operation by a prepared transaction or
+        fee bump, i.e. its fee minus the resource fee.
+        """
+        if isinstance(tx, FeeBumpTransactionEnvelope):
+            inner_tx = tx.transaction.inner_transaction_envelope
+            operations = len(inner_tx.transaction.operations) + 1
+            fee = tx.transaction.base_fee * operations
+        else:
+            inner_tx = tx
+            operations = len(tx.transaction.operations)
+            fee = tx.transaction.fee
+        return (fee - self.get_resource_fee(inner_tx)) // operations
+
+    def with_inclusion_fee(
+        self, tx: TransactionEnvelope, inclusion_fee: int
+    ) -> TransactionEnvelope:
+        """
+        Re-signs a prepared transaction that was not accepted with another
+        inclusion fee. The sequence number and resources are kept.
+        """
+        tx.transaction.fee = (
+            self.get_resource_fee(tx)
+            + inclusion_fee * len(tx.transaction.operations)
+        )
+        tx.signatures = []
+        tx.sign(self.signer)
+        return tx
+
+    def build_fee_bump_tx(
+        self, tx: TransactionEnvelope, inclusion_fee: int
+    ) -> FeeBumpTransactionEnvelope:
+        """
+        Wraps a transaction in a fee bump bidding `inclusion_fee` per operation,
+        paid and signed by the signer.
+        """
+        operations = len(tx.transaction.operations)
+        base_fee = -(
+            -(self.get_resource_fee(tx) + inclusion_fee * (operations + 1))
+            // (operations + 1)
+        )
+        # stellar_sdk requires the bump base fee to cover the inner fee rate,
+        # resource fee included
+        base_fee = max(base_fee, -(-tx.transaction.fee // operations))
+        fee_bump_tx = TransactionBuilder.build_fee_bump_transaction(
+            self.signer, base_fee, tx, self.network_passphrase
+        )
+        fee_bump_tx.sign(self.signer)
+        return fee_bump_tx
+
+    def track_submitted_tx(
+        self,
+        tx_hash: str,
+        tx: Union[TransactionEnvelope, FeeBumpTransactionEnvelope],
+    ):
+        if isinstance(tx, FeeBumpTransactionEnvelope):
+            inner_tx = tx.transaction.inner_transaction_envelope
+        else:
+            inner_tx = tx
+        time_bounds = inner_tx.transaction.preconditions.time_bounds
+        expires_at = time_bounds.max_time if time_bounds else time.time() + self.tx_timeout
+        now = time.time()
+        with self.submitted_txs_lock:
+            for submitted_hash, (_, submitted_expires_at) in list(
+                self.submitted_txs.items()
+            ):
+                if now >= submitted_expires_at:
+                    del self.submitted_txs[submitted_hash]
+            self.submitted_txs[tx_hash] = (tx, expires_at)
+
+    def pop_submitted_tx(
+        self, tx_hash: str
+    ) -> Optional[Union[TransactionEnvelope, FeeBumpTransactionEnvelope]]:
+        with self.submitted_txs_lock:
+            entry = self.submitted_txs.pop(tx_hash, None)
+        if entry is None or time.time() >= entry[1]:
+            return None
+        return entry[0]
+
+    def build_replacement_tx(self, tx_hash: str) -> Tuple[
+        Optional[Union[TransactionEnvelope, FeeBumpTransactionEnvelope]],
+        Optional[FeeBumpTransactionEnvelope],
+    ]:
+        """
+        Builds the fee bump replacing a submitted transaction that is stuck in
+        the queue, within `max_inclusion_fee`.
+
+        Returns:
+            Tuple: The stuck transaction and its fee bump, or None for the fee
+            bump if it can't be replaced.
+        """
+        tx = self.pop_submitted_tx(tx_hash)
+        if tx is None:
+            return None, None
+        if isinstance(tx, FeeBumpTransactionEnvelope):
+            inner_tx = tx.transaction.inner_transaction_envelope
+        else:
+            inner_tx = tx
+        inclusion_fee = self.fee_manager.replacement_inclusion_fee(
+            self.get_inclusion_fee(tx)
+        )
+        if inclusion_fee is None:
+            return tx, None
+        fee_bump_tx = self.build_fee_bump_tx(inner_tx, inclusion_fee)
+        if self.get_inclusion_fee(fee_bump_tx) > self.fee_manager.max_inclusion_fee:
+            return tx, None
+        return tx, fee_bump_tx
+
+    def build_fee_stats_request(self) -> Request:
+        # stellar_sdk 9.3 has no wrapper for getFeeStats
+        return Request(id=uuid.uuid4().hex, method="getFeeStats", params=None)
+
+    def refresh_fee_stats_steps(self) -> Steps:
+        """
+        The routine of refresh_fee_stats() (see Step).
+        """
+        if not self.fee_manager.needs_fee_stats():
+            return
         try:
-            tx_hash, tx_data = self.send_tx(tx)
-        except PrepareTransactionException as e:
-            raise RuntimeError(
-                f"Failed to prepare transaction: {e.simulate_transaction_response}"
+            fee_stats = yield ("_post", (self.build_fee_stats_request(), dict))
+        except Exception as e:
+            logging.warning(f"Failed to get fee stats: {e}")
+            fee_stats = None
+        self.fee_manager.observe_fee_stats(fee_stats)
+
+    def submit_tx_steps(
+        self,
+        tx: TransactionEnvelope,
+        on_signed: Optional[Callable[[TransactionEnvelope], None]] = None,
+    ) -> Steps:
+        """
+        The routine of submit_tx() (see Step).
+        """
+        try:
+            tx = yield ("prepare_transaction", (tx,))
+            tx.sign(self.signer)
+            deadline = time.monotonic() + self.tx_timeout
+            while True:
+                if on_signed is not None:
+                    on_signed(tx)
+                send_transaction_data = yield ("send_transaction", (tx,))
+                self.ledger_cadence.observe(
+                    send_transaction_data.latest_ledger,
+                    send_transaction_data.latest_ledger_close_time,
+                )
+                if time.monotonic() >= deadline:
+                    break
+                if self.is_insufficient_fee_transaction_data(send_transaction_data):
+                    yield from self.refresh_fee_stats_steps()
+                    inclusion_fee = self.fee_manager.raised_inclusion_fee(
+                        self.get_inclusion_fee(tx),
+                        get_fee_charged(send_transaction_data),
+                    )
+                    if inclusion_fee is None:
+                        break
+                    logging.info(f"Resending transaction with inclusion fee {inclusion_fee}")
+                    tx = self.with_inclusion_fee(tx, inclusion_fee)
+                    continue
+                if send_transaction_data.status != SendTransactionStatus.TRY_AGAIN_LATER:
+                    break
+                yield ("sleep", (self.ledger_cadence.next_delay(),))
+            self.raise_for_send_transaction_data(send_transaction_data)
+        except BadSequence:
+            self.sequence_manager.invalidate()
+            raise
+        except Exception:
+            # the sequence number of a rejected transaction is not consumed
+            self.sequence_manager.release(tx.transaction.sequence - 1)
+            raise
+        self.track_submitted_tx(send_transaction_data.hash, tx)
+        return send_transaction_data.hash
+
+    def replace_stuck_tx_steps(self, tx_hash: str) -> Steps:
+        """
+        The routine of replace_stuck_tx() (see Step).
+        """
+        yield from self.refresh_fee_stats_steps()
+        tx, fee_bump_tx = self.build_replacement_tx(tx_hash)
+        if fee_bump_tx is None:
+            if tx is not None:
+                self.track_submitted_tx(tx_hash, tx)
+            return None
+        send_transaction_data = yield ("send_transaction", (fee_bump_tx,))
+        if send_transaction_data.status != SendTransactionStatus.PENDING:
+            logging.warning(
+                f"Failed to replace stuck transaction {tx_hash}: {send_transaction_data}"
             )
-        if tx_data.status != GetTransactionStatus.SUCCESS:
-            raise RuntimeError(f"Failed to send transaction: {tx_data}")
+            self.track_submitted_tx(tx_hash, tx)  # type: ignore
+            return None
+        logging.info(
+            f"Replaced stuck transaction {tx_hash} with fee bump {send_transaction_data.hash}"
+        )
+        self.track_submitted_tx(send_transaction_data.hash, fee_bump_tx)
+        return send_transaction_data.hash
 
-        return tx_hash, tx_data
+    def wait_txs_steps(self, tx_hashes: List[str]) -> Steps:
+        """
+        The routine of wait_txs() (see Step).
+        """
+        results = yield from wait_for_transactions_steps(
+            tx_hashes,
+            self.wait_tx_timeout,
+            self.ledger_cadence,
+            self.replace_stuck_tx_steps,
+        )
+        for tx_hash, tx_data in results.items():
+            self.pop_submitted_tx(tx_hash)
+            self.fee_manager.record_fee_charged(tx_data)
+        return results
+
+    def authorize_simulation(
+        self, simulate_transaction_data: SimulateTransactionResponse
+    ) -> List[stellar_xdr.SorobanAuthorizationEntry]:
+        """
+        Signs the authorization entries requested by a simulation with `auth_signer`.
 
-    def is_tx_success(self, tx_data):
-        return tx_data.status == GetTransactionStatus.SUCCESS
+        Args:
+            simulate_transaction_data (SimulateTransactionResponse): The simulation of the contract call.
 
-    def parse_tx_result(self, tx_data):
-        assert tx_data.result_meta_xdr is not None
-        transaction_meta = stellar_xdr.TransactionMeta.from_xdr(tx_data.result_meta_xdr)  # type: ignore
-        # TODO handle multiple results[]
-        assert transaction_meta.v3.soroban_meta
-        result = transaction_meta.v3.soroban_meta.return_value
-        return result
+        Returns:
+            List[SorobanAuthorizationEntry]: The signed entries to attach to the invocation.
+        """
+        assert self.auth_signer is not None
+        valid_until_ledger = simulate_transaction_data.latest_ledger + AUTH_VALID_LEDGERS
+        return [
+            authorize_entry(
+                entry, self.auth_signer, valid_until_ledger, self.network_passphrase
+            )
+            for entry in simulate_transaction_data.results[0].auth or []
+        ]
 
-    def parse_sc_val(self, sc_val):
-        if sc_val.type == SCValType.SCV_BOOL:
-            return sc_val.b
-        if sc_val.u32 is not None:
-            return sc_val.u32.uint32
-        if sc_val.i32 is not None:
-            return sc_val.i32.int32
-        if sc_val.u64 is not None:
-            return sc_val.u64.uint64
-        if sc_val.i64 is not None:
-            return sc_val.i64.int64
-        if sc_val.u128 is not None:
-            high = sc_val.u128.hi.uint64
-            low = sc_val.u128.lo.uint64
-            uint128 = (high << 64) | low
-            return uint128
-        if sc_val.i128 is not None:
-            high = sc_val.i128.hi.int64
-            low = sc_val.i128.lo.uint64
-            uint128 = (high << 64) | low
-            return uint128
-        if sc_val.map is not None:
-            return self.parse_sc_map(sc_val.map.sc_map)
-        if sc_val.vec is not None:
-            return self.parse_sc_vec(sc_val.vec)
-        if sc_val.sym is not None:
-            return sc_val.sym.sc_symbol.decode()
-        if sc_val.address is not None:
-            return Address.from_xdr_sc_address(sc_val.address).address
-        raise ValueError("Could not parse sc_val")
+    def build_asset_enum(self, asset_type: AssetType, asset: str):
+        if asset_type == "stellar":
+            return scval.to_enum("Stellar", scval.to_address(asset))
+        elif asset_type == "other":
+            return scval.to_enum("Other", scval.to_symbol(asset))
+        else:
+            return ValueError(f"unexpected asset_type: {asset_type}")
+
+    def transaction_result_code(self, tx_data):
+        error_result_xdr = getattr(tx_data, "error_result_xdr", None)
+        if error_result_xdr is None:
+            return None
+
+        try:
+            xdr_tx_result = stellar_xdr.TransactionResult.from_xdr(error_result_xdr)
+        except (TypeError, ValueError, binascii.Error):
+            return None
+        return xdr_tx_result.result.code
+
+    def is_insufficient_balance_transaction_data(self, tx_data):
+        return (
+            self.transaction_result_code(tx_data)
+            == stellar_xdr.TransactionResultCode.txINSUFFICIENT_BALANCE
+        )
+
+    def is_insufficient_fee_transaction_data(self, tx_data):
+        return (
+            self.transaction_result_code(tx_data)
+            == stellar_xdr.TransactionResultCode.txINSUFFICIENT_FEE
+        )
+
+    def is_bad_seq_transaction_data(self, tx_data):
+        return (
+            self.transaction_result_code(tx_data)
+            == stellar_xdr.TransactionResultCode.txBAD_SEQ
+        )
+
+    def raise_for_prepare_exception(self, e: PrepareTransactionException):
+        simulate_transaction_data = e.simulate_transaction_response
+        if any(
+            error in (simulate_transaction_data.error or "")
+            for error in RESOURCE_LIMIT_ERRORS
+        ):
+            raise ResourceLimitExceeded(
+                f"Transaction exceeds the network resource limits: {simulate_transaction_data}",
+                simulate_transaction_data,
+            )
+        raise RuntimeError(
+            f"Failed to prepare transaction: {simulate_transaction_data}"
+        )
+
+    def split_add_prices_batch(self, prices: List[AssetPrice]):
+        """
+        Splits a batch of prices that exceeded the resource limits in halves,
+        and lowers `add_prices_batch_size` to the size of the larger half. It
+        grows back as larger batches are seen to fit.
+        """
+        if len(prices) <= 1:
+            return None
+        middle = (len(prices) + 1) // 2
+        if self.add_prices_batch_size is None or middle < self.add_prices_batch_size:
+            self.add_prices_batch_size = middle
+        return prices[:middle], prices[middle:]
+
+    def record_add_prices_batch_fit(self, prices: List[AssetPrice]):
+        if (
+            self.add_prices_batch_size is not None
+            and len(prices) > self.add_prices_batch_size
+        ):
+            self.add_prices_batch_size = len(prices)
+
+    def chunk_add_prices_batch(self, prices: List[AssetPrice]) -> List[List[AssetPrice]]:
+        batch_size = self.add_prices_batch_size or len(prices) or 1
+        return [prices[i : i + batch_size] for i in range(0, len(prices), batch_size)]
+
+    def raise_for_send_transaction_data(self, send_transaction_data):
+        if send_transaction_data.status in (
+            SendTransactionStatus.PENDING,
+            SendTransactionStatus.DUPLICATE,
+        ):
+            return
+        if self.is_insufficient_balance_transaction_data(send_transaction_data):
+            raise InsufficientBalance(
+                "Insufficient balance",
+                send_transaction_data,
+            )
+        if self.is_bad_seq_transaction_data(send_transaction_data):
+            raise BadSequence("Bad sequence number", send_transaction_data)
+        if (
+            self.transaction_result_code(send_transaction_data)
+            == stellar_xdr.TransactionResultCode.txSOROBAN_INVALID
+        ):
+            raise ResourceLimitExceeded(
+                f"Transaction exceeds the network resource limits: {send_transaction_data}",
+                send_transaction_data,
+            )
+        raise RuntimeError(f"Failed to send transaction: {send_transaction_data}")
+
+    def is_tx_success(self, tx_data):
+        return tx_data.status == GetTransactionStatus.SUCCESS
+
+    def parse_tx_result(self, tx_data):
+        assert tx_data.result_meta_xdr is not None
+        transaction_meta = stellar_xdr.TransactionMeta.from_xdr(tx_data.result_meta_xdr)  # type: ignore
+        # TODO handle multiple results[]
+        assert transaction_meta.v3.soroban_meta
+        result = transaction_meta.v3.soroban_meta.return_value
+        return result
+
+    def parse_simulation_result(self, simulate_transaction_data):
+        results = simulate_transaction_data.results
+        if not results or len(results) != 1:
+            raise RuntimeError(
+                f"Unexpected simulation results: {simulate_transaction_data}"
+            )
+        return stellar_xdr.SCVal.from_xdr(results[0].xdr)
+
+    def build_contract_data_key(
+        self, key: stellar_xdr.SCVal, durability: stellar_xdr.ContractDataDurability
+    ) -> stellar_xdr.LedgerKey:
+        return stellar_xdr.LedgerKey(
+            stellar_xdr.LedgerEntryType.CONTRACT_DATA,
+            contract_data=stellar_xdr.LedgerKeyContractData(
+                contract=Address(self.contract_id).to_xdr_sc_address(),
+                key=key,
+                durability=durability,
+            ),
+        )
+
+    def build_instance_key(self) -> stellar_xdr.LedgerKey:
+        return self.build_contract_data_key(
+            stellar_xdr.SCVal(SCValType.SCV_LEDGER_KEY_CONTRACT_INSTANCE),
+            stellar_xdr.ContractDataDurability.PERSISTENT,
+        )
+
+    def build_price_data_key(
+        self, source: int, asset_u32: int, timestamp: int
+    ) -> stellar_xdr.LedgerKey:
+        """
+        Builds the ledger key of a price in temporary storage, same as
+        to_price_data_key() in the contract.
+        """
+        price_data_key = (source << 96) | (asset_u32 << 64) | timestamp
+        return self.build_contract_data_key(
+            scval.to_uint128(price_data_key),
+            stellar_xdr.ContractDataDurability.TEMPORARY,
+        )
+
+    def parse_instance_entry(
+        self, response: GetLedgerEntriesResponse
+    ) -> Dict[str, stellar_xdr.SCVal]:
+        """
+        Returns the contract instance storage, keyed by the XDR of each storage key.
+        """
+        if not response.entries:
+            raise LedgerLayoutMismatch("contract instance not found")
+        data = stellar_xdr.LedgerEntryData.from_xdr(response.entries[0].xdr)
+        assert data.contract_data is not None
+        instance = data.contract_data.val.instance
+        if instance is None or instance.storage is None:
+            raise LedgerLayoutMismatch("contract instance has no storage")
+        self.check_ledger_layout(instance.storage.sc_map)
+        return {entry.key.to_xdr(): entry.val for entry in instance.storage.sc_map}
+
+    def check_ledger_layout(self, sc_map_entries: List[stellar_xdr.SCMapEntry]):
+        """
+        Checks the contract instance storage against LEDGER_LAYOUT.
+
+        Raises:
+            LedgerLayoutMismatch: A key is missing, unknown or holds another type.
+        """
+        missing_keys = set(LEDGER_LAYOUT)
+        for entry in sc_map_entries:
+            if entry.key.type not in (SCValType.SCV_SYMBOL, SCValType.SCV_ADDRESS):
+                raise LedgerLayoutMismatch(f"unexpected instance key: {entry.key}")
+            name = decode_sc_val(entry.key)
+            if entry.key.type == SCValType.SCV_SYMBOL and name in LEDGER_LAYOUT:
+                expected_types = LEDGER_LAYOUT[name]
+                missing_keys.discard(name)
+            else:
+                # an asset and its u32 id
+                expected_types = (SCValType.SCV_U32,)
+            if entry.val.type not in expected_types:
+                raise LedgerLayoutMismatch(
+                    f"unexpected type of instance key {name}: {entry.val.type.name}"
+                )
+        if missing_keys:
+            raise LedgerLayoutMismatch(
+                f"instance keys not found: {', '.join(sorted(missing_keys))}"
+            )
+
+    def parse_price_data_entries(
+        self, response: GetLedgerEntriesResponse
+    ) -> Dict[str, stellar_xdr.SCVal]:
+        """
+        Returns the live price entries, keyed by the XDR of their ledger key.
+        """
+        entries = {}
+        for entry in response.entries or []:
+            if (
+                entry.live_until_ledger is not None
+                and entry.live_until_ledger < response.latest_ledger
+            ):
+                continue
+            data = stellar_xdr.LedgerEntryData.from_xdr(entry.xdr)
+            assert data.contract_data is not None
+            if data.contract_data.val.type != SCValType.SCV_MAP:
+                raise LedgerLayoutMismatch(f"unexpected price entry: {data}")
+            entries[entry.key] = data.contract_data.val
+        return entries
+
+    def get_instance_value(
+        self, storage: Dict[str, stellar_xdr.SCVal], key: stellar_xdr.SCVal
+    ) -> stellar_xdr.SCVal:
+        value = storage.get(key.to_xdr())
+        if value is None:
+            raise LedgerLayoutMismatch(f"instance key not found: {key}")
+        return value
+
+    def plan_ledger_read(
+        self, storage: Dict[str, stellar_xdr.SCVal], function_name, parameters=[]
+    ) -> Tuple[
+        List[stellar_xdr.LedgerKey],
+        Callable[[Dict[str, stellar_xdr.SCVal]], stellar_xdr.SCVal],
+    ]:
+        """
+        Emulates a read-only contract function on top of the contract storage.
+
+        Args:
+            storage (Dict[str, SCVal]): The contract instance storage.
+            function_name (str): The name of the contract function.
+            parameters (list, optional): The function parameters.
+
+        Returns:
+            Tuple[List[LedgerKey], Callable]: The price ledger keys to fetch, and a function that takes the fetched price entries and returns the function result as the contract would.
+        """
+        void = stellar_xdr.SCVal(SCValType.SCV_VOID)
+        if function_name in ("read_admin", "base"):
+            key = "admin" if function_name == "read_admin" else "base_asset"
+            value = self.get_instance_value(storage, scval.to_symbol(key))
+            return [], lambda entries: value
+        if function_name in ("decimals", "resolution", "assets", "sources"):
+            value = self.get_instance_value(storage, scval.to_symbol(function_name))
+            return [], lambda entries: value
+        if function_name not in LEDGER_READ_FUNCTIONS:
+            raise LedgerLayoutMismatch(f"unsupported function: {function_name}")
+
+        # price functions without a source argument read source 0
+        if function_name in ("price", "lastprice", "prices"):
+            source = 0
+        else:
+            source = scval.from_uint32(parameters[0])
+            parameters = parameters[1:]
+        asset = parameters[0]
+        assert asset.vec is not None
+        asset_u32 = scval.from_uint32(
+            self.get_instance_value(storage, asset.vec.sc_vec[1])
+        )
+        last_timestamp_val = self.get_instance_value(
+            storage, scval.to_symbol("last_timestamp")
+        )
+        if last_timestamp_val.type == SCValType.SCV_I32:
+            # set by initialize(), before any price was added
+            last_timestamp = scval.from_int32(last_timestamp_val)
+        else:
+            last_timestamp = scval.from_uint64(last_timestamp_val)
+
+        if function_name in ("price_by_source", "lastprice_by_source", "price", "lastprice"):
+            if function_name in ("price_by_source", "price"):
+                timestamp = scval.from_uint64(parameters[1])
+            else:
+                timestamp = last_timestamp
+            key = self.build_price_data_key(source, asset_u32, timestamp).to_xdr()
+            return [key], lambda entries: entries.get(key, void)
+
+        if last_timestamp == 0:
+            return [], lambda entries: void
+        resolution = scval.from_uint32(
+            self.get_instance_value(storage, scval.to_symbol("resolution"))
+        )
+        records = min(scval.from_uint32(parameters[1]), MAX_PRICE_RECORDS)
+        keys = []
+        timestamp = last_timestamp
+        for _ in range(records):
+            keys.append(self.build_price_data_key(source, asset_u32, timestamp).to_xdr())
+            if timestamp < resolution:
+                break
+            timestamp -= resolution
+
+        def finish(entries):
+            prices = [entries[key] for key in keys if key in entries]
+            return scval.to_vec(prices) if prices else void
+
+        return keys, finish
+
+    def parse_sc_val(self, sc_val):
+        return decode_sc_val(sc_val)
+
+    def parse_sc_vec(self, sc_vec):
+        return [decode_sc_val(val) for val in sc_vec.sc_vec]
+
+    def parse_asset_enum(self, sc_val):
+        return decode_asset_enum(sc_val)
+
+    def parse_sc_asset_map(
+        self, sc_asset_map
+    ) -> Dict[Tuple[AssetType, str], List[Price]]:
+        return decode_sc_asset_map_entries(sc_asset_map)
+
+    def parse_sc_map(self, sc_map):
+        return decode_sc_map_entries(sc_map)
+
+    def parse_result(self, result, expect_asset_map=False):
+        if result.type == SCValType.SCV_VOID:
+            return
+        elif result.type == SCValType.SCV_MAP and expect_asset_map:
+            assert result.map is not None
+            return decode_sc_asset_map_entries(result.map.sc_map)
+        elif result.type == SCValType.SCV_ADDRESS:
+            return str(result.address)
+        elif result.type in SC_VAL_DECODERS:
+            return SC_VAL_DECODERS[result.type](result)
+        else:
+            raise ValueError(f"Unexpected result type: {result.type}")
+
+    def parse_tx_data(self, tx_data, expect_asset_map=False):
+        if self.is_tx_success(tx_data):
+            result = self.parse_tx_result(tx_data)
+            return self.parse_result(result, expect_asset_map=expect_asset_map)
+        else:
+            raise RuntimeError(f"Cannot parse unsuccessful transaction data: {tx_data}")
+
+    def asset_to_asset_u32(self, asset_type: AssetType, asset: str) -> int:
+        asset_u32 = ASSETS_TO_ASSET_U32.get((asset_type, asset))
+        if asset_u32 is None:
+            raise AssetU32NotFound(
+                f"Asset has no u32 value: {asset_type} {asset}. Make sure to "
+                "add a u32 value for this asset in ASSETS_TO_ASSET_U32."
+            )
+        return asset_u32
+
+    def build_add_price_args(
+        self,
+        source: int,
+        asset_type: AssetType,
+        asset: str,
+        price: str,
+        timestamp: Optional[int] = None,
+    ):
+        price_as_int = price_to_int(price, self.decimal_places)
+        if timestamp is None:
+            timestamp = int(time.time())
+        asset_enum, asset_u32 = self.build_asset_args(asset_type, asset)
+        return [
+            scval.to_uint32(source),
+            asset_enum,
+            asset_u32,
+            scval.to_int128(price_as_int),
+            scval.to_uint64(timestamp),
+        ]
+
+    def build_asset_args(
+        self, asset_type: AssetType, asset: str
+    ) -> Tuple[stellar_xdr.SCVal, stellar_xdr.SCVal]:
+        """
+        Returns the asset enum and asset_u32 SCVals of an asset, memoized per client.
+
+        Raises:
+            AssetU32NotFound: The asset is missing from ASSETS_TO_ASSET_U32.
+        """
+        asset_args = self.asset_args_cache.get((asset_type, asset))
+        if asset_args is None:
+            asset_args = (
+                self.build_asset_enum(asset_type, asset),
+                scval.to_uint32(self.asset_to_asset_u32(asset_type, asset)),
+            )
+            self.asset_args_cache[(asset_type, asset)] = asset_args
+        return asset_args
+
+    def encode_price_columns(
+        self,
+        sources: List[int],
+        asset_types: List[AssetType],
+        assets: List[str],
+        prices: List[str],
+        timestamps: List[Optional[int]],
+    ) -> List[stellar_xdr.SCVal]:
+        """
+        Encodes prices given as columns into InternalPrice structs in one pass.
+        Prices of assets missing from ASSETS_TO_ASSET_U32 are skipped.
+
+        Args:
+            sources (List[int]): The source of each price.
+            asset_types (List[AssetType]): The asset type of each price.
+            assets (List[str]): The asset of each price.
+            prices (List[str]): The prices.
+            timestamps (List[Optional[int]]): The timestamp of each price, None for the current time.
+
+        Returns:
+            List[SCVal]: The InternalPrice structs.
+
+        Raises:
+            ValueError: A price has more than `decimal_places` decimal places.
+        """
+        now = int(time.time())
+        decimal_places = self.decimal_places
+        field_asset, field_asset_u32, field_price, field_source, field_timestamp = (
+            INTERNAL_PRICE_FIELDS
+        )
+        structs = []
+        for source, asset_type, asset, price, timestamp in zip(
+            sources, asset_types, assets, prices, timestamps
+        ):
+            try:
+                asset_enum, asset_u32 = self.build_asset_args(asset_type, asset)
+            except AssetU32NotFound as e:
+                logging.warn(f"skipping price due to error: {e}")
+                continue
+            # see https://github.com/StellarCN/py-stellar-base/issues/815
+            structs.append(
+                stellar_xdr.SCVal(
+                    SCValType.SCV_MAP,
+                    map=stellar_xdr.SCMap(
+                        [
+                            stellar_xdr.SCMapEntry(field_asset, asset_enum),
+                            stellar_xdr.SCMapEntry(field_asset_u32, asset_u32),
+                            stellar_xdr.SCMapEntry(
+                                field_price,
+                                scval.to_int128(price_to_int(price, decimal_places)),
+                            ),
+                            stellar_xdr.SCMapEntry(field_source, scval.to_uint32(source)),
+                            stellar_xdr.SCMapEntry(
+                                field_timestamp,
+                                scval.to_uint64(now if timestamp is None else timestamp),
+                            ),
+                        ]
+                    ),
+                )
+            )
+        return structs
+
+    def encode_prices(self, prices: List[AssetPrice]) -> List[stellar_xdr.SCVal]:
+        """
+        Encodes prices into InternalPrice structs in one pass. Prices of assets
+        missing from ASSETS_TO_ASSET_U32 are skipped.
+
+        Args:
+            prices (List[AssetPrice]): List of prices
+
+        Returns:
+            List[SCVal]: The InternalPrice structs.
+        """
+        return self.encode_price_columns(
+            [price["source"] for price in prices],
+            [price["asset_type"] for price in prices],
+            [price["asset"] for price in prices],
+            [price["price"] for price in prices],
+            [price["timestamp"] for price in prices],
+        )
+
+    def build_add_prices_args(self, prices: List[AssetPrice]):
+        return [scval.to_vec(self.encode_prices(prices))]
+
+    def prices_are_registered(
+        self, prices: List[AssetPrice], assets: List[Asset], sources: List[int]
+    ) -> bool:
+        """
+        Returns whether every asset and source of the prices is already
+        registered in the contract, i.e. whether add_prices_light can be used.
+        """
+        registered_assets = {(asset["asset_type"], asset["asset"]) for asset in assets}
+        registered_sources = set(sources)
+        return all(
+            (price["asset_type"], price["asset"]) in registered_assets
+            and price["source"] in registered_sources
+            for price in prices
+        )
+
+    def build_lastprice_by_source_args(
+        self, source: int, asset_type: AssetType, asset: str
+    ):
+        return [
+            scval.to_uint32(source),
+            self.build_asset_enum(asset_type, asset),
+        ]
+
+    def build_lastprices_by_source_and_assets_args(
+        self, source: int, assets: List[Asset]
+    ):
+        asset_enums = []
+        if len(assets) > 15:
+            logging.warn(
+                "fetching too many assets might result in errors from Soroban due to return size limits. We recommend requesting no more than 15 assets at a time.",
+            )
+        for asset in assets:
+            asset_enums.append(
+                self.build_asset_enum(asset["asset_type"], asset["asset"])
+            )
+        return [
+            scval.to_uint32(source),
+            scval.to_vec(asset_enums),
+        ]
+
+    def parse_price(self, price) -> Optional[Price]:
+        if price is None:
+            return None
+        return {
+            "price": str(Decimal(price["price"]) / self.decimal_places_divider),
+            "timestamp": price["timestamp"],
+        }
+
+    def parse_prices(self, prices) -> List[Price]:
+        if prices is None:
+            return []
+        return [self.parse_price(price) for price in prices]  # type: ignore
+
+    def parse_asset(self, result) -> Asset:
+        if result[0] == "Other":
+            return Asset({"asset_type": "other", "asset": result[1]})
+        elif result[0] == "Stellar":
+            return Asset({"asset_type": "stellar", "asset": result[1]})
+        else:
+            raise ValueError(f"Unexpected asset type: {result[0]}")
+
+
+class OracleClient(BaseOracleClient):
+    def create_server(self):
+        return SorobanServer(self.rpc_server_url)
+
+    def next_source_account(self) -> Account:
+        """
+        Returns the signer account with the next local sequence number,
+        loading it from the network only when the counter is out of sync.
+        """
+        account = self.sequence_manager.next_account()
+        while account is None:
+            source_account = self.server.load_account(self.signer.public_key)
+            self.sequence_manager.resync(source_account.sequence)
+            account = self.sequence_manager.next_account()
+        return account
+
+    def submit_tx(
+        self,
+        tx: TransactionEnvelope,
+        on_signed: Optional[Callable[[TransactionEnvelope], None]] = None,
+    ) -> str:
+        """
+        Prepares, signs and sends a transaction without waiting for confirmation.
+        A transaction rejected with TRY_AGAIN_LATER is resent until it is
+        accepted or `tx_timeout` expires, and one rejected for its fee is
+        resent with a higher inclusion fee, up to `max_inclusion_fee`.
+
+        Args:
+            tx (TransactionEnvelope): The transaction to send.
+            on_signed (Callable, optional): Called with the signed transaction right before it is
+                sent, and again whenever it is re-signed, e.g. to journal its hash.
+
+        Returns:
+            str: The transaction hash.
+        """
+        return run_steps(self.submit_tx_steps(tx, on_signed), self.server)
+
+    def replace_stuck_tx(self, tx_hash: str) -> Optional[str]:
+        """
+        Replaces a submitted transaction that is stuck in the queue with a fee
+        bump of it, within `max_inclusion_fee`.
+
+        Args:
+            tx_hash (str): The hash of the stuck transaction.
+
+        Returns:
+            Optional[str]: The hash of the fee bump, or None if it was not replaced.
+        """
+        return run_steps(self.replace_stuck_tx_steps(tx_hash), self.server)
+
+    def refresh_fee_stats(self):
+        """
+        Fetches the network fee statistics when the cached ones are stale. On
+        failure the previous statistics keep being used.
+        """
+        return run_steps(self.refresh_fee_stats_steps(), self.server)
+
+    def send_tx(self, tx: TransactionEnvelope):
+        """
+        Sends a transaction and waits for confirmation.
+
+        Args:
+            tx (TransactionEnvelope): The transaction to send.
+
+        Returns:
+            Tuple[str, GetTransactionStatus]: A tuple containing the transaction hash and its status.
+        """
+        tx_hash = self.submit_tx(tx)
+        return tx_hash, self.wait_tx(tx_hash)
+
+    def wait_tx(self, tx_hash: str):
+        """
+        Waits for a transaction to be confirmed.
+
+        Args:
+            tx_hash (str): The transaction hash.
+
+        Returns:
+            GetTransactionStatus: The status of the transaction.
+        """
+        return self.wait_txs([tx_hash])[tx_hash]
+
+    def wait_txs(self, tx_hashes: List[str]) -> Dict[str, GetTransactionResponse]:
+        """
+        Waits for many transactions to be confirmed, in a single polling loop.
+        Transactions still pending after STUCK_TX_LEDGERS ledgers are replaced
+        by fee bumps (see replace_stuck_tx), and the fees charged are recorded
+        in `fee_manager`.
+
+        Args:
+            tx_hashes (List[str]): The transaction hashes.
+
+        Returns:
+            Dict[str, GetTransactionResponse]: The transaction data, keyed by hash.
+
+        Raises:
+            TransactionTimeout: If some transactions are not confirmed within `wait_tx_timeout` seconds.
+        """
+        return run_steps(self.wait_txs_steps(tx_hashes), self.server)
+
+    def invoke_contract_function(self, function_name, parameters=[]):
+        """
+        Invokes a function on the contract.
+
+        Args:
+            function_name (str): The name of the contract function.
+            parameters (list, optional): The function parameters.
+
+        Returns:
+            Tuple[str, Any]: A tuple containing the transaction hash and the result of the function.
+        """
+        tx_hash = self.submit_contract_function(function_name, parameters)
+        try:
+            tx_data = self.wait_tx(tx_hash)
+        finally:
+            self.invalidate_metadata_for_call(function_name)
+        if tx_data.status != GetTransactionStatus.SUCCESS:
+            raise RuntimeError(f"Failed to send transaction: {tx_data}")
+
+        return tx_hash, tx_data
+
+    def submit_contract_function(
+        self, function_name, parameters=[], on_signed=None
+    ) -> str:
+        """
+        Invokes a function on the contract without waiting for confirmation.
+        Several calls can be submitted in a row and confirmed together with
+        wait_txs(). On txBAD_SEQ the sequence number is resynced and the
+        transaction is rebuilt once. With `auth_signer` set, the call is
+        simulated first and its authorization entries are signed by it.
+
+        Args:
+            function_name (str): The name of the contract function.
+            parameters (list, optional): The function parameters.
+            on_signed (Callable, optional): See submit_tx().
+
+        Returns:
+            str: The transaction hash.
+        """
+        auth = None
+        if self.auth_signer is not None:
+            auth = self.authorize_simulation(
+                self.simulate_contract_function(function_name, parameters)
+            )
+        self.refresh_fee_stats()
+        for attempt in range(2):
+            source_account = self.next_source_account()
+            tx = self.build_invoke_contract_function_tx(
+                source_account, function_name, parameters, auth
+            )
+            try:
+                tx_hash = self.submit_tx(tx, on_signed)
+                self.invalidate_metadata_for_call(function_name)
+                return tx_hash
+            except BadSequence:
+                if attempt == 1:
+                    raise
+            except PrepareTransactionException as e:
+                self.raise_for_prepare_exception(e)
+        raise AssertionError("unreachable")
+
+    def simulate_contract_function(
+        self, function_name, parameters=[]
+    ) -> SimulateTransactionResponse:
+        """
+        Simulates a function call on the contract without submitting a transaction.
+
+        The transaction is never signed nor sent, so the source account sequence
+        number is irrelevant and no account needs to be loaded.
+
+        Args:
+            function_name (str): The name of the contract function.
+            parameters (list, optional): The function parameters.
+
+        Returns:
+            SimulateTransactionResponse: The simulation response.
+        """
+        source_account = Account(self.signer.public_key, 0)
+        tx = self.build_invoke_contract_function_tx(
+            source_account, function_name, parameters
+        )
+        simulate_transaction_data = self.server.simulate_transaction(tx)
+        if simulate_transaction_data.error:
+            raise RuntimeError(
+                f"Failed to simulate transaction: {simulate_transaction_data}"
+            )
+        return simulate_transaction_data
+
+    def invoke_and_parse(self, function_name, parameters=[], expect_asset_map=False):
+        """
+        Invokes a contract function and parses the result.
+
+        Args:
+            function_name (str): The name of the contract function.
+            parameters (list, optional): The function parameters.
+
+        Returns:
+            Tuple[str, Any]: A tuple containing the transaction hash and the parsed result of the function.
+        """
+        tx_hash, tx_data = self.invoke_contract_function(
+            function_name,
+            parameters,
+        )
+        return tx_hash, self.parse_tx_data(tx_data, expect_asset_map=expect_asset_map)
+
+    def simulate_and_parse(
+        self, function_name, parameters=[], expect_asset_map=False
+    ):
+        """
+        Simulates a contract function and parses the result.
+
+        Args:
+            function_name (str): The name of the contract function.
+            parameters (list, optional): The function parameters.
+
+        Returns:
+            Tuple[None, Any]: A tuple containing None (no transaction is sent) and the parsed result of the function.
+        """
+        simulate_transaction_data = self.simulate_contract_function(
+            function_name,
+            parameters,
+        )
+        result = self.parse_simulation_result(simulate_transaction_data)
+        return None, self.parse_result(result, expect_asset_map=expect_asset_map)
+
+    def get_price_data_entries(
+        self, keys: List[str]
+    ) -> Dict[str, stellar_xdr.SCVal]:
+        entries = {}
+        for i in range(0, len(keys), MAX_LEDGER_ENTRIES_KEYS):
+            response = self.server.get_ledger_entries(
+                [
+                    stellar_xdr.LedgerKey.from_xdr(key)
+                    for key in keys[i : i + MAX_LEDGER_ENTRIES_KEYS]
+                ]
+            )
+            entries.update(self.parse_price_data_entries(response))
+        return entries
+
+    def ledger_read_many(self, calls: List[Tuple[str, list]]) -> List[stellar_xdr.SCVal]:
+        """
+        Answers several read-only contract calls from the contract storage:
+        one getLedgerEntries request for the contract instance, then batched
+        requests for all the price entries involved.
+
+        Args:
+            calls (List[Tuple[str, list]]): The function names and parameters.
+
+        Returns:
+            List[SCVal]: The unparsed result of each call, as the contract would return it.
+
+        Raises:
+            LedgerLayoutMismatch: The contract storage does not have the expected layout.
+        """
+        storage = self.parse_instance_entry(
+            self.server.get_ledger_entries([self.build_instance_key()])
+        )
+        plans = [
+            self.plan_ledger_read(storage, function_name, parameters)
+            for function_name, parameters in calls
+        ]
+        entries = self.get_price_data_entries(
+            [key for keys, _ in plans for key in keys]
+        )
+        return [finish(entries) for _, finish in plans]
+
+    def read_and_parse(self, function_name, parameters=[], expect_asset_map=False):
+        """
+        Invokes a read-only contract function according to `read_mode` and
+        parses the result.
+
+        Args:
+            function_name (str): The name of the contract function.
+            parameters (list, optional): The function parameters.
+
+        Returns:
+            Tuple[Optional[str], Any]: A tuple containing the transaction hash (None in the "simulation" and "ledger" read modes) and the parsed result of the function.
+        """
+        if self.read_mode == "ledger" and function_name in LEDGER_READ_FUNCTIONS:
+            try:
+                (result,) = self.ledger_read_many([(function_name, parameters)])
+                return None, self.parse_result(result, expect_asset_map=expect_asset_map)
+            except LedgerLayoutMismatch as e:
+                logging.warning(
+                    f"Ledger read of {function_name} failed, falling back to simulation: {e}"
+                )
+        if self.read_mode in ("simulation", "ledger"):
+            return self.simulate_and_parse(
+                function_name, parameters, expect_asset_map=expect_asset_map
+            )
+        return self.invoke_and_parse(
+            function_name, parameters, expect_asset_map=expect_asset_map
+        )
+
+    def read_metadata(self, function_name, parse=None):
+        """
+        Reads one of METADATA_FUNCTIONS through the metadata cache.
+
+        Args:
+            function_name (str): The name of the contract function.
+            parse (Callable, optional): Converts the parsed result before it is cached.
+
+        Returns:
+            Tuple[Optional[str], Any]: A tuple containing the transaction hash (None when cached) and the value.
+        """
+        value = self.get_cached_metadata(function_name)
+        if value is not None:
+            return None, value
+        tx_hash, value = self.read_and_parse(function_name)
+        if parse is not None:
+            value = parse(value)
+        self.cache_metadata(function_name, value)
+        return tx_hash, value
+
+    def load_metadata(self) -> Dict[str, Any]:
+        """
+        Loads base, decimals, resolution, assets and sources concurrently into
+        the metadata cache, e.g. at startup.
+
+        Returns:
+            Dict[str, Any]: The metadata values keyed by function name.
+        """
+        self.invalidate_metadata()
+        with ThreadPoolExecutor(max_workers=len(METADATA_FUNCTIONS)) as executor:
+            values = executor.map(
+                lambda function_name: getattr(self, function_name)()[1],
+                METADATA_FUNCTIONS,
+            )
+            return dict(zip(METADATA_FUNCTIONS, values))
+
+    def initialize(
+        self,
+        admin: str,
+        base_type: AssetType,
+        base: str,
+        decimals: int,
+        resolution: int,
+    ) -> Tuple[str, None]:
+        """
+        Initializes the contract with parameters.
+
+        Args:
+            admin (str): The admin's public key.
+            base_type (AssetType): The base asset type ("stellar" or "other").
+            base (str): The base asset identifier.
+            decimals (int): The number of decimals for the contract.
+            resolution (int): The resolution value for the contract.
+
+        Returns:
+            Tuple[str, None]: A tuple containing the transaction hash and None.
+        """
+        return self.invoke_and_parse(  # type: ignore
+            "initialize",
+            [
+                scval.to_address(admin),
+                self.build_asset_enum(base_type, base),
+                scval.to_uint32(decimals),
+                scval.to_uint32(resolution),
+            ],
+        )
+
+    def write_admin(self) -> Tuple[str, None]:
+        """
+        Writes admin information to the contract.
+
+        Raises:
+            RuntimeError: Indicates that this feature is not yet available.
+        """
+        raise RuntimeError("This function is not yet available")
+
+    def read_admin(self) -> Tuple[Optional[str], str]:
+        """
+        Reads the admin's public key from the contract.
+
+        Returns:
+            Tuple[Optional[str], str]: A tuple containing the transaction hash and the admin's public key.
+        """
+        return self.read_and_parse("read_admin")  # type: ignore
+
+    def write_resolution(self, resolution: int) -> Tuple[str, None]:
+        """
+        Writes the resolution value to the contract.
+
+        Returns:
+            Tuple[str, None]: A tuple containing the transaction hash and None.
+        """
+        return self.invoke_and_parse("write_resolution", [scval.to_uint32(resolution)])  # type: ignore
+
+    def sources(self) -> Tuple[Optional[str], List[int]]:
+        """
+        Retrieves the list of prices sources supported by the contract.
+
+        Returns:
+            Tuple[Optional[str], List[int]]: A tuple containing the transaction hash and a list of source IDs.
+        """
+        return self.read_metadata("sources")  # type: ignore
+
+    def prices_by_source(
+        self, source: int, asset_type: AssetType, asset: str, records: int
+    ) -> Tuple[Optional[str], List[Price]]:
+        """
+        Retrieves price records for a specific source, asset, and number of records.
+
+        Args:
+            source (int): The source ID.
+            asset_type (AssetType): The asset type ("stellar" or "other").
+            asset (str): The asset identifier. For off-chain assets, this is an empty string. For on-chain asset, this is the Soroban asset address (Token Interface).
+            records (int): The number of records to retrieve.
+
+        Returns:
+            Tuple[Optional[str], List[Price]]: A tuple containing the transaction hash and a list of price records.
+        """
+        tx_hash, prices = self.read_and_parse(
+            "prices_by_source",
+            [
+                scval.to_uint32(source),
+                self.build_asset_enum(asset_type, asset),
+                scval.to_uint32(records),
+            ],
+        )
+        return tx_hash, self.parse_prices(prices)
+
+    def price_by_source(
+        self, source: int, asset_type: AssetType, asset: str, timestamp: int
+    ) -> Tuple[Optional[str], Optional[Price]]:
+        """
+        Retrieves a price record for a specific source, asset, and timestamp.
+
+        Args:
+            source (int): The source ID.
+            asset_type (AssetType): The asset type ("stellar" or "other").
+            asset (str): The asset identifier. For off-chain assets, this is an empty string. For on-chain asset, this is the Soroban asset address (Token Interface).
+            timestamp (int): The timestamp of the price record.
+
+        Returns:
+            Tuple[Optional[str], Optional[Price]]: A tuple containing the transaction hash and the price record (or None if not found).
+        """
+        tx_hash, price = self.read_and_parse(  # type: ignore
+            "price_by_source",
+            [
+                scval.to_uint32(source),
+                self.build_asset_enum(asset_type, asset),
+                scval.to_uint64(timestamp),
+            ],
+        )
+        return tx_hash, self.parse_price(price)
+
+    def lastprice_by_source(
+        self, source: int, asset_type: AssetType, asset: str
+    ) -> Tuple[Optional[str], Optional[Price]]:
+        """
+        Retrieves the latest price record for a specific source and asset.
+
+        Args:
+            source (int): The source ID.
+            asset_type (AssetType): The asset type ("stellar" or "other").
+            asset (str): The asset identifier. For off-chain assets, this is an empty string. For on-chain asset, this is the Soroban asset address (Token Interface).
+
+        Returns:
+            Tuple[Optional[str], Optional[Price]]: A tuple containing the transaction hash and the latest price record (or None if not found).
+        """
+        tx_hash, price = self.read_and_parse(  # type: ignore
+            "lastprice_by_source",
+            self.build_lastprice_by_source_args(source, asset_type, asset),
+        )
+        return tx_hash, self.parse_price(price)
+
+    def lastprices_by_sources(
+        self, sources: List[int], assets: List[Asset]
+    ) -> Dict[Tuple[int, AssetType, str], Optional[Price]]:
+        """
+        Retrieves the latest price record of every asset for every source. In
+        the "ledger" read mode all records are fetched in batched
+        getLedgerEntries requests.
+
+        Args:
+            sources (List[int]): The source IDs.
+            assets (List[Asset]): The assets.
+
+        Returns:
+            Dict[Tuple[int, AssetType, str], Optional[Price]]: The latest price record (or None if not found), keyed by (source, asset_type, asset).
+        """
+        keys = [
+            (source, asset["asset_type"], asset["asset"])
+            for source in sources
+            for asset in assets
+        ]
+        if self.read_mode == "ledger":
+            try:
+                results = self.ledger_read_many(
+                    [
+                        (
+                            "lastprice_by_source",
+                            self.build_lastprice_by_source_args(*key),
+                        )
+                        for key in keys
+                    ]
+                )
+                return {
+                    key: self.parse_price(self.parse_result(result))
+                    for key, result in zip(keys, results)
+                }
+            except LedgerLayoutMismatch as e:
+                logging.warning(
+                    f"Ledger read of lastprices failed, falling back to simulation: {e}"
+                )
+        return {key: self.lastprice_by_source(*key)[1] for key in keys}
+
+    def add_prices(self, prices: List[AssetPrice]) -> Tuple[str, None]:
+        """
+        Add prices to the contract.
+
+        Args:
+            prices (List[AssetPrice]): List of prices
+
+        Returns:
+            Tuple[str, None]: A tuple containing the transaction hash and None.
+        """
+        return self.invoke_and_parse("add_prices", self.build_add_prices_args(prices))  # type: ignore
+
+    def add_prices_light(self, prices: List[AssetPrice]) -> Tuple[str, None]:
+        """
+        Add prices to the contract through add_prices_light, which skips the
+        update of the assets and sources lists and the new_prices event. Every
+        asset and source must already be registered (see can_add_prices_light),
+        otherwise they are not listed by assets() and sources() and the prices
+        of new assets cannot be read back.
+
+        Args:
+            prices (List[AssetPrice]): List of prices
+
+        Returns:
+            Tuple[str, None]: A tuple containing the transaction hash and None.
+        """
+        return self.invoke_and_parse("add_prices_light", self.build_add_prices_args(prices))  # type: ignore
+
+    def submit_add_prices_light(
+        self, prices: List[AssetPrice], on_signed=None
+    ) -> str:
+        """
+        Add prices to the contract through add_prices_light without waiting for
+        confirmation.
+
+        Args:
+            prices (List[AssetPrice]): List of prices
+            on_signed (Callable, optional): See submit_tx().
+
+        Returns:
+            str: The transaction hash.
+        """
+        return self.submit_contract_function(
+            "add_prices_light", self.build_add_prices_args(prices), on_signed
+        )
+
+    def can_add_prices_light(self, prices: List[AssetPrice]) -> bool:
+        """
+        Checks against the (cached) assets and sources of the contract whether
+        the prices can be added through add_prices_light.
+
+        Args:
+            prices (List[AssetPrice]): List of prices
+
+        Returns:
+            bool: True if every asset and source is already registered.
+        """
+        _, assets = self.assets()
+        _, sources = self.sources()
+        return self.prices_are_registered(prices, assets, sources)
+
+    def submit_add_prices(
+        self, prices: List[AssetPrice], on_signed=None
+    ) -> str:
+        """
+        Add prices to the contract without waiting for confirmation. Use
+        wait_txs() to confirm several submitted batches at once.
+
+        Args:
+            prices (List[AssetPrice]): List of prices
+            on_signed (Callable, optional): See submit_tx().
+
+        Returns:
+            str: The transaction hash.
+        """
+        return self.submit_contract_function(
+            "add_prices", self.build_add_prices_args(prices), on_signed
+        )
+
+    def add_prices_auto_split(self, prices: List[AssetPrice]) -> List[str]:
+        """
+        Add prices to the contract, splitting the batch in halves (recursively)
+        when it exceeds the Soroban resource limits. The largest batch size that
+        fit is remembered in `add_prices_batch_size` and later calls are split
+        to it upfront; set it to None to learn it again, e.g. after the network
+        limits change. All chunks are submitted before waiting for confirmation.
+
+        Args:
+            prices (List[AssetPrice]): List of prices
+
+        Returns:
+            List[str]: The transaction hash of each chunk, in order.
+        """
+        tx_hashes = []
+        for chunk in self.chunk_add_prices_batch(prices):
+            tx_hashes.extend(self.submit_add_prices_auto_split(chunk))
+        tx_datas = self.wait_txs(tx_hashes)
+        for tx_hash in tx_hashes:
+            if tx_datas[tx_hash].status != GetTransactionStatus.SUCCESS:
+                raise RuntimeError(f"Failed to send transaction: {tx_datas[tx_hash]}")
+        return tx_hashes
+
+    def submit_add_prices_auto_split(self, prices: List[AssetPrice]) -> List[str]:
+        try:
+            tx_hash = self.submit_add_prices(prices)
+            self.record_add_prices_batch_fit(prices)
+            return [tx_hash]
+        except ResourceLimitExceeded:
+            halves = self.split_add_prices_batch(prices)
+            if halves is None:
+                raise
+        return [
+            tx_hash
+            for half in halves
+            for tx_hash in self.submit_add_prices_auto_split(half)
+        ]
+
+    def update_contract(self, contract_wasm: Union[str, bytes]) -> Tuple[str, None]:
+        """
+        Updates the contract.
+
+        Args:
+            contract_wasm (Union[str, bytes]): The path to the contract, or binary data.
+
+        Returns:
+            Tuple[str, None]: A tuple containing the transaction hash and None.
+        """
+        deployer = OracleDeployer(
+            signer=self.signer,
+            network=self.network,  # type: ignore
+            custom_network_passphrase=self.network_passphrase,
+            custom_rpc_url=self.rpc_server_url,
+            wait_tx_interval=self.wait_tx_interval,
+            tx_timeout=self.tx_timeout,
+            wait_tx_timeout=self.wait_tx_timeout,
+        )
+        wasm_id = deployer.upload_contract_wasm(contract_wasm)
+        return self.invoke_and_parse("update_contract", [scval.to_bytes(bytes.fromhex(wasm_id))])  # type: ignore
+
+    def lastprices_by_source_and_assets(
+        self, source: int, assets: List[Asset]
+    ) -> Tuple[Optional[str], dict]:
+        """
+        Retrieves the latest price records for a specific source and list of assets.
+        Note: fetching too many assets might result in errors from Soroban due to return size limits.
+        We recommend requesting no more than 15 assets at a time.
+
+        Returns:
+            Tuple[Optional[str], dict]: A tuple containing the transaction hash and a dict of latest price records.
+        """
+        return self.read_and_parse(
+            "lastprices_by_source_and_assets",
+            self.build_lastprices_by_source_and_assets_args(source, assets),
+            expect_asset_map=True,
+        )  # type: ignore
+
+    def base(self) -> Tuple[Optional[str], Asset]:
+        """
+        Retrieves the base asset of the contract.
+
+        Returns:
+            Tuple[Optional[str], Asset]: A tuple containing the transaction hash and the base asset.
+        """
+        return self.read_metadata("base", self.parse_asset)  # type: ignore
+
+    def assets(self) -> Tuple[Optional[str], List[Asset]]:
+        """
+        Retrieves the list of supported assets by the contract.
+
+        Returns:
+            Tuple[Optional[str], List[Asset]]: A tuple containing the transaction hash and a list of supported assets.
+        """
+        return self.read_metadata("assets", self.parse_assets)  # type: ignore
+
+    def decimals(self):
+        """
+        Retrieves the number of decimals for the contract's assets.
+
+        Returns:
+            Tuple[Optional[str], Any]: A tuple containing the transaction hash and the number of decimals.
+        """
+        return self.read_metadata("decimals")
+
+    def resolution(self):
+        """
+        Retrieves the resolution value of the contract.
+
+        Returns:
+            Tuple[Optional[str], Any]: A tuple containing the transaction hash and the resolution value.
+        """
+        return self.read_metadata("resolution")
+
+    def price(
+        self,
+        asset_type: AssetType,
+        asset: str,
+        timestamp: int,
+    ) -> Tuple[Optional[str], Optional[Price]]:
+        """
+        Retrieves a price record for a specific asset and timestamp.
+
+        Args:
+            asset_type (AssetType): The asset type ("stellar" or "other").
+            asset (str): The asset identifier. For off-chain assets, this is an empty string. For on-chain asset, this is the Soroban asset address (Token Interface).
+            timestamp (int): The timestamp of the price record.
+
+        Returns:
+            Tuple[Optional[str], Optional[Price]]: A tuple containing the transaction hash and the price record (or None if not found).
+        """
+        tx_hash, price = self.read_and_parse(
+            "price",
+            [
+                self.build_asset_enum(asset_type, asset),
+                scval.to_uint64(timestamp),
+            ],
+        )
+        return tx_hash, self.parse_price(price)
+
+    def prices(
+        self, asset_type: AssetType, asset: str, records: int
+    ) -> Tuple[Optional[str], List[Price]]:
+        """
+        Retrieves price records for a specific asset and number of records.
+
+        Args:
+            asset_type (AssetType): The asset type ("stellar" or "other").
+            asset (str): The asset identifier. For off-chain assets, this is an empty string. For on-chain asset, this is the Soroban asset address (Token Interface).
+            records (int): The number of records to retrieve.
+
+        Returns:
+            Tuple[Optional[str], List[Price]]: A tuple containing the transaction hash and a list of price records.
+        """
+        tx_hash, prices = self.read_and_parse(
+            "prices",
+            [
+                self.build_asset_enum(asset_type, asset),
+                scval.to_uint32(records),
+            ],
+        )
+        return tx_hash, self.parse_prices(prices)
+
+    def lastprice(
+        self,
+        asset_type: AssetType,
+        asset: str,
+    ) -> Tuple[Optional[str], Optional[Price]]:
+        """
+        Retrieves the latest price record for a specific asset.
+
+        Args:
+            asset_type (AssetType): The asset type ("stellar" or "other").
+            asset (str): The asset identifier. For off-chain assets, this is an empty string. For on-chain asset, this is the Soroban asset address (Token Interface).
+
+        Returns:
+            Tuple[Optional[str], Optional[Price]]: A tuple containing the transaction hash and the latest price record (or None if not found).
+        """
+        tx_hash, price = self.read_and_parse(
+            "lastprice",
+            [
+                self.build_asset_enum(asset_type, asset),
+            ],
+        )
+        return tx_hash, self.parse_price(price)
+
+    def bump_instance(self, ledgers_to_live: int):
+        """
+        Bumps the contract instance.
+
+        Returns:
+            Tuple[str, None]: A tuple containing the transaction hash and None.
+        """
+        return self.invoke_and_parse("bump_instance", [scval.to_uint32(ledgers_to_live)])  # type: ignore
+
+
+class AsyncOracleClient(BaseOracleClient):
+    """
+    asyncio version of OracleClient. It exposes the same methods as coroutines,
+    backed by an async Soroban RPC transport that shares a single HTTP session.
+
+    Calls can be awaited concurrently (e.g. with asyncio.gather), at most
+    `max_concurrency` contract invocations are in flight at the same time.
+    Requires the aiohttp extra of stellar-sdk: pip install "stellar-sdk[aiohttp]"
+    """
+
+    def __init__(self, *, max_concurrency: int = 10, **kwargs):
+        """
+        Initializes an async Oracle Client instance.
+
+        Args:
+            max_concurrency (int, optional): Maximum number of contract invocations running at the same time. Default is 10.
+            **kwargs: Same arguments as OracleClient.
+
+        Returns:
+            None
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        super().__init__(**kwargs)
+
+    def create_server(self):
+        return SorobanServerAsync(
+            self.rpc_server_url, AiohttpClient(pool_size=self.max_concurrency)
+        )
+
+    async def close(self):
+        """
+        Closes the underlying HTTP session.
+        """
+        await self.server.close()
+
+    async def __aenter__(self) -> "AsyncOracleClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def next_source_account(self) -> Account:
+        """
+        Returns the signer account with the next local sequence number,
+        loading it from the network only when the counter is out of sync.
+        """
+        account = self.sequence_manager.next_account()
+        while account is None:
+            source_account = await self.server.load_account(self.signer.public_key)
+            self.sequence_manager.resync(source_account.sequence)
+            account = self.sequence_manager.next_account()
+        return account
+
+    async def submit_tx(
+        self,
+        tx: TransactionEnvelope,
+        on_signed: Optional[Callable[[TransactionEnvelope], None]] = None,
+    ) -> str:
+        """
+        Prepares, signs and sends a transaction without waiting for confirmation.
+        A transaction rejected with TRY_AGAIN_LATER is resent until it is
+        accepted or `tx_timeout` expires, and one rejected for its fee is
+        resent with a higher inclusion fee, up to `max_inclusion_fee`.
+
+        Args:
+            tx (TransactionEnvelope): The transaction to send.
+            on_signed (Callable, optional): Called with the signed transaction right before it is
+                sent, and again whenever it is re-signed, e.g. to journal its hash.
+
+        Returns:
+            str: The transaction hash.
+        """
+        return await run_steps_async(self.submit_tx_steps(tx, on_signed), self.server)
+
+    async def replace_stuck_tx(self, tx_hash: str) -> Optional[str]:
+        """
+        Replaces a submitted transaction that is stuck in the queue with a fee
+        bump of it, within `max_inclusion_fee`.
+
+        Args:
+            tx_hash (str): The hash of the stuck transaction.
+
+        Returns:
+            Optional[str]: The hash of the fee bump, or None if it was not replaced.
+        """
+        return await run_steps_async(self.replace_stuck_tx_steps(tx_hash), self.server)
+
+    async def refresh_fee_stats(self):
+        """
+        Fetches the network fee statistics when the cached ones are stale. On
+        failure the previous statistics keep being used.
+        """
+        return await run_steps_async(self.refresh_fee_stats_steps(), self.server)
+
+    async def send_tx(self, tx: TransactionEnvelope):
+        """
+        Sends a transaction and waits for confirmation.
+
+        Args:
+            tx (TransactionEnvelope): The transaction to send.
+
+        Returns:
+            Tuple[str, GetTransactionStatus]: A tuple containing the transaction hash and its status.
+        """
+        tx_hash = await self.submit_tx(tx)
+        return tx_hash, await self.wait_tx(tx_hash)
+
+    async def wait_tx(self, tx_hash: str):
+        """
+        Waits for a transaction to be confirmed.
+
+        Args:
+            tx_hash (str): The transaction hash.
+
+        Returns:
+            GetTransactionStatus: The status of the transaction.
+        """
+        return (await self.wait_txs([tx_hash]))[tx_hash]
+
+    async def wait_txs(
+        self, tx_hashes: List[str]
+    ) -> Dict[str, GetTransactionResponse]:
+        """
+        Waits for many transactions to be confirmed, in a single polling loop.
+        See wait_for_transactions() for the polling strategy. Transactions
+        still pending after STUCK_TX_LEDGERS ledgers are replaced by fee bumps
+        (see replace_stuck_tx), and the fees charged are recorded in
+        `fee_manager`.
+
+        Args:
+            tx_hashes (List[str]): The transaction hashes.
+
+        Returns:
+            Dict[str, GetTransactionResponse]: The transaction data, keyed by hash.
+
+        Raises:
+            TransactionTimeout: If some transactions are not confirmed within `wait_tx_timeout` seconds.
+        """
+        return await run_steps_async(self.wait_txs_steps(tx_hashes), self.server)
+
+    async def invoke_contract_function(self, function_name, parameters=[]):
+        """
+        Invokes a function on the contract.
+
+        Args:
+            function_name (str): The name of the contract function.
+            parameters (list, optional): The function parameters.
+
+        Returns:
+            Tuple[str, Any]: A tuple containing the transaction hash and the result of the function.
+        """
+        tx_hash = await self.submit_contract_function(function_name, parameters)
+        try:
+            tx_data = await self.wait_tx(tx_hash)
+        finally:
+            self.invalidate_metadata_for_call(function_name)
+        if tx_data.status != GetTransactionStatus.SUCCESS:
+            raise RuntimeError(f"Failed to send transaction: {tx_data}")
 
-    def parse_sc_vec(self, sc_vec):
-        vec = []
-        for val in sc_vec.sc_vec:
-            vec.append(self.parse_sc_val(val))
-        return vec
+        return tx_hash, tx_data
 
-    def parse_asset_enum(self, sc_val):
-        rust_asset_type = sc_val.vec.sc_vec[0].sym.sc_symbol.decode()
-        if rust_asset_type == "Other":
-            asset = sc_val.vec.sc_vec[1].sym.sc_symbol.decode()
-            asset_type = "other"
-        elif rust_asset_type == "Stellar":
-            asset = Address.from_xdr_sc_address(sc_val.vec.sc_vec[1].address).address
-            asset_type = "stellar"
-        else:
-            raise ValueError(f"Unexpected asset enum type: {rust_asset_type}")
-        return (asset_type, asset)
+    async def submit_contract_function(
+        self, function_name, parameters=[], on_signed=None
+    ) -> str:
+        """
+        Invokes a function on the contract without waiting for confirmation.
+        On txBAD_SEQ the sequence number is resynced and the transaction is
+        rebuilt once. With `auth_signer` set, the call is simulated first and
+        its authorization entries are signed by it.
 
-    def parse_sc_asset_map(
-        self, sc_asset_map
-    ) -> Dict[Tuple[AssetType, str], List[Price]]:
-        data = {}
-        for entry in sc_asset_map:
-            key = self.parse_asset_enum(entry.key)
-            value = self.parse_sc_val(entry.val)
-            data[key] = value
-        return data
+        Args:
+            function_name (str): The name of the contract function.
+            parameters (list, optional): The function parameters.
+            on_signed (Callable, optional): See submit_tx().
 
-    def parse_sc_map(self, sc_map):
-        data = {}
-        for entry in sc_map:
-            key = self.parse_sc_val(entry.key)
-            value = self.parse_sc_val(entry.val)
-            data[key] = value
-        return data
+        Returns:
+            str: The transaction hash.
+        """
+        auth = None
+        if self.auth_signer is not None:
+            auth = self.authorize_simulation(
+                await self.simulate_contract_function(function_name, parameters)
+            )
+        await self.refresh_fee_stats()
+        async with self.semaphore:
+            for attempt in range(2):
+                source_account = await self.next_source_account()
+                tx = self.build_invoke_contract_function_tx(
+                    source_account, function_name, parameters, auth
+                )
+                try:
+                    tx_hash = await self.submit_tx(tx, on_signed)
+                    self.invalidate_metadata_for_call(function_name)
+                    return tx_hash
+                except BadSequence:
+                    if attempt == 1:
+                        raise
+                except PrepareTransactionException as e:
+                    self.raise_for_prepare_exception(e)
+        raise AssertionError("unreachable")
+
+    async def simulate_contract_function(
+        self, function_name, parameters=[]
+    ) -> SimulateTransactionResponse:
+        """
+        Simulates a function call on the contract without submitting a transaction.
 
-    def parse_tx_data(self, tx_data, expect_asset_map=False):
-        if self.is_tx_success(tx_data):
-            result = self.parse_tx_result(tx_data)
-            if result.type == SCValType.SCV_BOOL:
-                return result.b
-            elif result.type == SCValType.SCV_VOID:
-                return
-            elif result.type == SCValType.SCV_MAP:
-                assert result.map is not None
-                if expect_asset_map:
-                    return self.parse_sc_asset_map(result.map.sc_map)
-                return self.parse_sc_map(result.map.sc_map)
-            elif result.type in [
-                SCValType.SCV_U32,
-                SCValType.SCV_I32,
-                SCValType.SCV_U64,
-                SCValType.SCV_I64,
-                SCValType.SCV_U128,
-                SCValType.SCV_I128,
-                SCValType.SCV_SYMBOL,
-            ]:
-                return self.parse_sc_val(result)
-            elif result.type == SCValType.SCV_ADDRESS:
-                return str(result.address)
-            elif result.type == SCValType.SCV_VEC:
-                return self.parse_sc_vec(result.vec)
-            else:
-                raise ValueError(f"Unexpected result type: {result.type}")
-        else:
-            raise RuntimeError(f"Cannot parse unsuccessful transaction data: {tx_data}")
+        Args:
+            function_name (str): The name of the contract function.
+            parameters (list, optional): The function parameters.
 
-    def invoke_and_parse(self, function_name, parameters=[], expect_asset_map=False):
+        Returns:
+            SimulateTransactionResponse: The simulation response.
+        """
+        source_account = Account(self.signer.public_key, 0)
+        tx = self.build_invoke_contract_function_tx(
+            source_account, function_name, parameters
+        )
+        async with self.semaphore:
+            simulate_transaction_data = await self.server.simulate_transaction(tx)
+        if simulate_transaction_data.error:
+            raise RuntimeError(
+                f"Failed to simulate transaction: {simulate_transaction_data}"
+            )
+        return simulate_transaction_data
+
+    async def invoke_and_parse(
+        self, function_name, parameters=[], expect_asset_map=False
+    ):
         """
         Invokes a contract function and parses the result.
 
@@ -383,56 +2763,141 @@ class OracleClient:
         Returns:
             Tuple[str, Any]: A tuple containing the transaction hash and the parsed result of the function.
         """
-        tx_hash, tx_data = self.invoke_contract_function(
+        tx_hash, tx_data = await self.invoke_contract_function(
             function_name,
             parameters,
         )
         return tx_hash, self.parse_tx_data(tx_data, expect_asset_map=expect_asset_map)
 
-    def asset_to_asset_u32(self, asset_type: AssetType, asset: str) -> int:
-        asset_u32 = ASSETS_TO_ASSET_U32.get((asset_type, asset))
-        if asset_u32 is None:
-            raise AssetU32NotFound(
-                f"Asset has no u32 value: {asset_type} {asset}. Make sure to "
-                "add a u32 value for this asset in ASSETS_TO_ASSET_U32."
+    async def simulate_and_parse(
+        self, function_name, parameters=[], expect_asset_map=False
+    ):
+        """
+        Simulates a contract function and parses the result.
+
+        Args:
+            function_name (str): The name of the contract function.
+            parameters (list, optional): The function parameters.
+
+        Returns:
+            Tuple[None, Any]: A tuple containing None (no transaction is sent) and the parsed result of the function.
+        """
+        simulate_transaction_data = await self.simulate_contract_function(
+            function_name,
+            parameters,
+        )
+        result = self.parse_simulation_result(simulate_transaction_data)
+        return None, self.parse_result(result, expect_asset_map=expect_asset_map)
+
+    async def get_price_data_entries(
+        self, keys: List[str]
+    ) -> Dict[str, stellar_xdr.SCVal]:
+        entries = {}
+        for i in range(0, len(keys), MAX_LEDGER_ENTRIES_KEYS):
+            response = await self.server.get_ledger_entries(
+                [
+                    stellar_xdr.LedgerKey.from_xdr(key)
+                    for key in keys[i : i + MAX_LEDGER_ENTRIES_KEYS]
+                ]
             )
-        return asset_u32
+            entries.update(self.parse_price_data_entries(response))
+        return entries
 
-    def build_add_price_args(
-        self,
-        source: int,
-        asset_type: AssetType,
-        asset: str,
-        price: str,
-        timestamp: Optional[int] = None,
+    async def ledger_read_many(self, calls: List[Tuple[str, list]]) -> List[stellar_xdr.SCVal]:
+        """
+        Answers several read-only contract calls from the contract storage:
+        one getLedgerEntries request for the contract instance, then batched
+        requests for all the price entries involved.
+
+        Args:
+            calls (List[Tuple[str, list]]): The function names and parameters.
+
+        Returns:
+            List[SCVal]: The unparsed result of each call, as the contract would return it.
+
+        Raises:
+            LedgerLayoutMismatch: The contract storage does not have the expected layout.
+        """
+        storage = self.parse_instance_entry(
+            await self.server.get_ledger_entries([self.build_instance_key()])
+        )
+        plans = [
+            self.plan_ledger_read(storage, function_name, parameters)
+            for function_name, parameters in calls
+        ]
+        entries = await self.get_price_data_entries(
+            [key for keys, _ in plans for key in keys]
+        )
+        return [finish(entries) for _, finish in plans]
+
+    async def read_and_parse(
+        self, function_name, parameters=[], expect_asset_map=False
     ):
-        price_d = Decimal(price)
-        price_d_str = "{:f}".format(price_d)
-        price_parts = price_d_str.split(".")
-        price_as_int = int(price_d_str.replace(".", ""))
-        if len(price_parts) == 2:
-            decimal_places = len(price_parts[1])
-        else:
-            decimal_places = 0
-        zeroes_to_add = self.decimal_places - decimal_places
-        if zeroes_to_add >= 0:
-            price_as_int = price_as_int * (10**zeroes_to_add)
-        else:
-            raise ValueError(
-                f"Invalid price: no more than {self.decimal_places} decimal places are allowed"
+        """
+        Invokes a read-only contract function according to `read_mode` and
+        parses the result.
+
+        Args:
+            function_name (str): The name of the contract function.
+            parameters (list, optional): The function parameters.
+
+        Returns:
+            Tuple[Optional[str], Any]: A tuple containing the transaction hash (None in the "simulation" and "ledger" read modes) and the parsed result of the function.
+        """
+        if self.read_mode == "ledger" and function_name in LEDGER_READ_FUNCTIONS:
+            try:
+                (result,) = await self.ledger_read_many([(function_name, parameters)])
+                return None, self.parse_result(result, expect_asset_map=expect_asset_map)
+            except LedgerLayoutMismatch as e:
+                logging.warning(
+                    f"Ledger read of {function_name} failed, falling back to simulation: {e}"
+                )
+        if self.read_mode in ("simulation", "ledger"):
+            return await self.simulate_and_parse(
+                function_name, parameters, expect_asset_map=expect_asset_map
             )
-        if timestamp is None:
-            timestamp = int(time.time())
-        asset_u32 = self.asset_to_asset_u32(asset_type, asset)
-        return [
-            scval.to_uint32(source),
-            self.build_asset_enum(asset_type, asset),
-            scval.to_uint32(asset_u32),
-            scval.to_int128(price_as_int),
-            scval.to_uint64(timestamp),
-        ]
+        return await self.invoke_and_parse(
+            function_name, parameters, expect_asset_map=expect_asset_map
+        )
 
-    def initialize(
+    async def read_metadata(self, function_name, parse=None):
+        """
+        Reads one of METADATA_FUNCTIONS through the metadata cache.
+
+        Args:
+            function_name (str): The name of the contract function.
+            parse (Callable, optional): Converts the parsed result before it is cached.
+
+        Returns:
+            Tuple[Optional[str], Any]: A tuple containing the transaction hash (None when cached) and the value.
+        """
+        value = self.get_cached_metadata(function_name)
+        if value is not None:
+            return None, value
+        tx_hash, value = await self.read_and_parse(function_name)
+        if parse is not None:
+            value = parse(value)
+        self.cache_metadata(function_name, value)
+        return tx_hash, value
+
+    async def load_metadata(self) -> Dict[str, Any]:
+        """
+        Loads base, decimals, resolution, assets and sources concurrently into
+        the metadata cache, e.g. at startup.
+
+        Returns:
+            Dict[str, Any]: The metadata values keyed by function name.
+        """
+        self.invalidate_metadata()
+        results = await asyncio.gather(
+            *(getattr(self, function_name)() for function_name in METADATA_FUNCTIONS)
+        )
+        return {
+            function_name: value
+            for function_name, (_, value) in zip(METADATA_FUNCTIONS, results)
+        }
+
+    async def initialize(
         self,
         admin: str,
         base_type: AssetType,
@@ -453,7 +2918,7 @@ class OracleClient:
         Returns:
             Tuple[str, None]: A tuple containing the transaction hash and None.
         """
-        return self.invoke_and_parse(  # type: ignore
+        return await self.invoke_and_parse(  # type: ignore
             "initialize",
             [
                 scval.to_address(admin),
@@ -463,7 +2928,7 @@ class OracleClient:
             ],
         )
 
-    def write_admin(self) -> Tuple[str, None]:
+    async def write_admin(self) -> Tuple[str, None]:
         """
         Writes admin information to the contract.
 
@@ -472,36 +2937,36 @@ class OracleClient:
         """
         raise RuntimeError("This function is not yet available")
 
-    def read_admin(self) -> Tuple[str, str]:
+    async def read_admin(self) -> Tuple[Optional[str], str]:
         """
         Reads the admin's public key from the contract.
 
         Returns:
-            Tuple[str, str]: A tuple containing the transaction hash and the admin's public key.
+            Tuple[Optional[str], str]: A tuple containing the transaction hash and the admin's public key.
         """
-        return self.invoke_and_parse("read_admin")  # type: ignore
+        return await self.read_and_parse("read_admin")  # type: ignore
 
-    def write_resolution(self, resolution: int) -> Tuple[str, None]:
+    async def write_resolution(self, resolution: int) -> Tuple[str, None]:
         """
         Writes the resolution value to the contract.
 
         Returns:
             Tuple[str, None]: A tuple containing the transaction hash and None.
         """
-        return self.invoke_and_parse("write_resolution", [scval.to_uint32(resolution)])  # type: ignore
+        return await self.invoke_and_parse("write_resolution", [scval.to_uint32(resolution)])  # type: ignore
 
-    def sources(self) -> Tuple[str, List[int]]:
+    async def sources(self) -> Tuple[Optional[str], List[int]]:
         """
         Retrieves the list of prices sources supported by the contract.
 
         Returns:
-            Tuple[str, List[int]]: A tuple containing the transaction hash and a list of source IDs.
+            Tuple[Optional[str], List[int]]: A tuple containing the transaction hash and a list of source IDs.
         """
-        return self.invoke_and_parse("sources")  # type: ignore
+        return await self.read_metadata("sources")  # type: ignore
 
-    def prices_by_source(
+    async def prices_by_source(
         self, source: int, asset_type: AssetType, asset: str, records: int
-    ) -> Tuple[str, List[Price]]:
+    ) -> Tuple[Optional[str], List[Price]]:
         """
         Retrieves price records for a specific source, asset, and number of records.
 
@@ -512,9 +2977,9 @@ class OracleClient:
             records (int): The number of records to retrieve.
 
         Returns:
-            Tuple[str, List[Price]]: A tuple containing the transaction hash and a list of price records.
+            Tuple[Optional[str], List[Price]]: A tuple containing the transaction hash and a list of price records.
         """
-        tx_hash, prices = self.invoke_and_parse(
+        tx_hash, prices = await self.read_and_parse(
             "prices_by_source",
             [
                 scval.to_uint32(source),
@@ -522,19 +2987,11 @@ class OracleClient:
                 scval.to_uint32(records),
             ],
         )
-        results = []
-        for price in prices:  # type: ignore
-            results.append(
-                {
-                    "price": str(Decimal(price["price"]) / self.decimal_places_divider),
-                    "timestamp": price["timestamp"],
-                }
-            )
-        return tx_hash, results
+        return tx_hash, self.parse_prices(prices)
 
-    def price_by_source(
+    async def price_by_source(
         self, source: int, asset_type: AssetType, asset: str, timestamp: int
-    ) -> Tuple[str, Optional[Price]]:
+    ) -> Tuple[Optional[str], Optional[Price]]:
         """
         Retrieves a price record for a specific source, asset, and timestamp.
 
@@ -545,9 +3002,9 @@ class OracleClient:
             timestamp (int): The timestamp of the price record.
 
         Returns:
-            Tuple[str, Optional[Price]]: A tuple containing the transaction hash and the price record (or None if not found).
+            Tuple[Optional[str], Optional[Price]]: A tuple containing the transaction hash and the price record (or None if not found).
         """
-        tx_hash, price = self.invoke_and_parse(  # type: ignore
+        tx_hash, price = await self.read_and_parse(  # type: ignore
             "price_by_source",
             [
                 scval.to_uint32(source),
@@ -555,16 +3012,11 @@ class OracleClient:
                 scval.to_uint64(timestamp),
             ],
         )
-        if price is not None:
-            price = {
-                "price": str(Decimal(price["price"]) / self.decimal_places_divider),  # type: ignore
-                "timestamp": price["timestamp"],  # type: ignore
-            }
-        return tx_hash, price  # type: ignore
+        return tx_hash, self.parse_price(price)
 
-    def lastprice_by_source(
+    async def lastprice_by_source(
         self, source: int, asset_type: AssetType, asset: str
-    ) -> Tuple[str, Optional[Price]]:
+    ) -> Tuple[Optional[str], Optional[Price]]:
         """
         Retrieves the latest price record for a specific source and asset.
 
@@ -574,23 +3026,15 @@ class OracleClient:
             asset (str): The asset identifier. For off-chain assets, this is an empty string. For on-chain asset, this is the Soroban asset address (Token Interface).
 
         Returns:
-            Tuple[str, Optional[Price]]: A tuple containing the transaction hash and the latest price record (or None if not found).
+            Tuple[Optional[str], Optional[Price]]: A tuple containing the transaction hash and the latest price record (or None if not found).
         """
-        tx_hash, price = self.invoke_and_parse(  # type: ignore
+        tx_hash, price = await self.read_and_parse(  # type: ignore
             "lastprice_by_source",
-            [
-                scval.to_uint32(source),
-                self.build_asset_enum(asset_type, asset),
-            ],
+            self.build_lastprice_by_source_args(source, asset_type, asset),
         )
-        if price is not None:
-            price = {
-                "price": str(Decimal(price["price"]) / self.decimal_places_divider),  # type: ignore
-                "timestamp": price["timestamp"],  # type: ignore
-            }
-        return tx_hash, price  # type: ignore
+        return tx_hash, self.parse_price(price)
 
-    def add_prices(self, prices: List[AssetPrice]) -> Tuple[str, None]:
+    async def add_prices(self, prices: List[AssetPrice]) -> Tuple[str, None]:
         """
         Add prices to the contract.
 
@@ -600,35 +3044,113 @@ class OracleClient:
         Returns:
             Tuple[str, None]: A tuple containing the transaction hash and None.
         """
-        price_args = []
-        for price in prices:
-            try:
-                add_price_args = self.build_add_price_args(
-                    price["source"],
-                    price["asset_type"],
-                    price["asset"],
-                    price["price"],
-                    price["timestamp"],
-                )
-            except AssetU32NotFound as e:
-                logging.warn(f"skipping price due to error: {e}")
-                continue
-            # see https://github.com/StellarCN/py-stellar-base/issues/815
-            add_price_struct = scval.to_struct(
-                {
-                    "asset": add_price_args[1],
-                    "asset_u32": add_price_args[2],
-                    "price": add_price_args[3],
-                    "source": add_price_args[0],
-                    "timestamp": add_price_args[4],
-                }
-            )
-            price_args.append(add_price_struct)
-        price_args = scval.to_vec(price_args)
-        args = [price_args]
-        return self.invoke_and_parse("add_prices", args)  # type: ignore
+        return await self.invoke_and_parse("add_prices", self.build_add_prices_args(prices))  # type: ignore
 
-    def update_contract(self, contract_wasm: Union[str, bytes]) -> Tuple[str, None]:
+    async def add_prices_light(self, prices: List[AssetPrice]) -> Tuple[str, None]:
+        """
+        Add prices to the contract through add_prices_light, which skips the
+        update of the assets and sources lists and the new_prices event. Every
+        asset and source must already be registered (see can_add_prices_light),
+        otherwise they are not listed by assets() and sources() and the prices
+        of new assets cannot be read back.
+
+        Args:
+            prices (List[AssetPrice]): List of prices
+
+        Returns:
+            Tuple[str, None]: A tuple containing the transaction hash and None.
+        """
+        return await self.invoke_and_parse("add_prices_light", self.build_add_prices_args(prices))  # type: ignore
+
+    async def submit_add_prices_light(
+        self, prices: List[AssetPrice], on_signed=None
+    ) -> str:
+        """
+        Add prices to the contract through add_prices_light without waiting for
+        confirmation.
+
+        Args:
+            prices (List[AssetPrice]): List of prices
+            on_signed (Callable, optional): See submit_tx().
+
+        Returns:
+            str: The transaction hash.
+        """
+        return await self.submit_contract_function(
+            "add_prices_light", self.build_add_prices_args(prices), on_signed
+        )
+
+    async def can_add_prices_light(self, prices: List[AssetPrice]) -> bool:
+        """
+        Checks against the (cached) assets and sources of the contract whether
+        the prices can be added through add_prices_light.
+
+        Args:
+            prices (List[AssetPrice]): List of prices
+
+        Returns:
+            bool: True if every asset and source is already registered.
+        """
+        _, assets = await self.assets()
+        _, sources = await self.sources()
+        return self.prices_are_registered(prices, assets, sources)
+
+    async def submit_add_prices(
+        self, prices: List[AssetPrice], on_signed=None
+    ) -> str:
+        """
+        Add prices to the contract without waiting for confirmation.
+
+        Args:
+            prices (List[AssetPrice]): List of prices
+            on_signed (Callable, optional): See submit_tx().
+
+        Returns:
+            str: The transaction hash.
+        """
+        return await self.submit_contract_function(
+            "add_prices", self.build_add_prices_args(prices), on_signed
+        )
+
+    async def add_prices_auto_split(self, prices: List[AssetPrice]) -> List[str]:
+        """
+        Add prices to the contract, splitting the batch in halves (recursively)
+        when it exceeds the Soroban resource limits. The largest batch size that
+        fit is remembered in `add_prices_batch_size` and later calls are split
+        to it upfront; set it to None to learn it again, e.g. after the network
+        limits change. All chunks are submitted before waiting for confirmation.
+
+        Args:
+            prices (List[AssetPrice]): List of prices
+
+        Returns:
+            List[str]: The transaction hash of each chunk, in order.
+        """
+        tx_hashes = []
+        for chunk in self.chunk_add_prices_batch(prices):
+            tx_hashes.extend(await self.submit_add_prices_auto_split(chunk))
+        tx_datas = await self.wait_txs(tx_hashes)
+        for tx_hash in tx_hashes:
+            if tx_datas[tx_hash].status != GetTransactionStatus.SUCCESS:
+                raise RuntimeError(f"Failed to send transaction: {tx_datas[tx_hash]}")
+        return tx_hashes
+
+    async def submit_add_prices_auto_split(self, prices: List[AssetPrice]) -> List[str]:
+        try:
+            tx_hash = await self.submit_add_prices(prices)
+            self.record_add_prices_batch_fit(prices)
+            return [tx_hash]
+        except ResourceLimitExceeded:
+            halves = self.split_add_prices_batch(prices)
+            if halves is None:
+                raise
+        return [
+            tx_hash
+            for half in halves
+            for tx_hash in await self.submit_add_prices_auto_split(half)
+        ]
+
+    async def update_contract(self, contract_wasm: Union[str, bytes]) -> Tuple[str, None]:
         """
         Updates the contract.
 
@@ -645,98 +3167,70 @@ class OracleClient:
             custom_rpc_url=self.rpc_server_url,
             wait_tx_interval=self.wait_tx_interval,
             tx_timeout=self.tx_timeout,
+            wait_tx_timeout=self.wait_tx_timeout,
         )
-        wasm_id = deployer.upload_contract_wasm(contract_wasm)
-        return self.invoke_and_parse("update_contract", [scval.to_bytes(bytes.fromhex(wasm_id))])  # type: ignore
+        wasm_id = await asyncio.to_thread(deployer.upload_contract_wasm, contract_wasm)
+        return await self.invoke_and_parse("update_contract", [scval.to_bytes(bytes.fromhex(wasm_id))])  # type: ignore
 
-    def lastprices_by_source_and_assets(
+    async def lastprices_by_source_and_assets(
         self, source: int, assets: List[Asset]
-    ) -> Tuple[str, dict]:
+    ) -> Tuple[Optional[str], dict]:
         """
         Retrieves the latest price records for a specific source and list of assets.
         Note: fetching too many assets might result in errors from Soroban due to return size limits.
         We recommend requesting no more than 15 assets at a time.
 
         Returns:
-            Tuple[str, dict]: A tuple containing the transaction hash and a dict of latest price records.
+            Tuple[Optional[str], dict]: A tuple containing the transaction hash and a dict of latest price records.
         """
-        asset_enums = []
-        if len(assets) > 15:
-            logging.warn(
-                "fetching too many assets might result in errors from Soroban due to return size limits. We recommend requesting no more than 15 assets at a time.",
-            )
-        for asset in assets:
-            asset_enums.append(
-                self.build_asset_enum(asset["asset_type"], asset["asset"])
-            )
-        return self.invoke_and_parse(
+        return await self.read_and_parse(
             "lastprices_by_source_and_assets",
-            [
-                scval.to_uint32(source),
-                scval.to_vec(asset_enums),
-            ],
+            self.build_lastprices_by_source_and_assets_args(source, assets),
             expect_asset_map=True,
         )  # type: ignore
 
-    def base(self) -> Tuple[str, Asset]:
+    async def base(self) -> Tuple[Optional[str], Asset]:
         """
         Retrieves the base asset of the contract.
 
         Returns:
-            Tuple[str, Asset]: A tuple containing the transaction hash and the base asset.
+            Tuple[Optional[str], Asset]: A tuple containing the transaction hash and the base asset.
         """
-        tx_hash, result = self.invoke_and_parse("base")
-        if result[0] == "Other":  # type: ignore
-            asset = Asset({"asset_type": "other", "asset": result[1]})  # type: ignore
-        elif result[0] == "Stellar":  # type: ignore
-            asset = Asset({"asset_type": "stellar", "asset": result[1]})  # type: ignore
-        else:
-            raise ValueError(f"Unexpected asset type: {result[1]}")  # type: ignore
-        return tx_hash, asset
+        return await self.read_metadata("base", self.parse_asset)  # type: ignore
 
-    def assets(self) -> Tuple[str, List[Asset]]:
+    async def assets(self) -> Tuple[Optional[str], List[Asset]]:
         """
         Retrieves the list of supported assets by the contract.
 
         Returns:
-            Tuple[str, List[Asset]]: A tuple containing the transaction hash and a list of supported assets.
+            Tuple[Optional[str], List[Asset]]: A tuple containing the transaction hash and a list of supported assets.
         """
-        tx_hash, results = self.invoke_and_parse("assets")
-        assets = []
-        for result in results:  # type: ignore
-            if result[0] == "Other":  # type: ignore
-                asset = Asset({"asset_type": "other", "asset": result[1]})  # type: ignore
-            elif result[0] == "Stellar":  # type: ignore
-                asset = Asset({"asset_type": "stellar", "asset": result[1]})  # type: ignore
-            else:
-                raise ValueError(f"Unexpected asset type: {result[1]}")  # type: ignore
-            assets.append(asset)
-        return tx_hash, assets
+        return await self.read_metadata("assets", self.parse_assets)  # type: ignore
 
-    def decimals(self):
+    async def decimals(self):
         """
         Retrieves the number of decimals for the contract's assets.
 
         Returns:
-            Tuple[str, Any]: A tuple containing the transaction hash and the number of decimals.
+            Tuple[Optional[str], Any]: A tuple containing the transaction hash and the number of decimals.
         """
-        return self.invoke_and_parse("decimals")
+        return await self.read_metadata("decimals")
 
-    def resolution(self):
+    async def resolution(self):
         """
         Retrieves the resolution value of the contract.
 
         Returns:
-            Tuple[str, Any]: A tuple containing the transaction hash and the resolution value.
+            Tuple[Optional[str], Any]: A tuple containing the transaction hash and the resolution value.
         """
-        return self.invoke_and_parse("resolution")
+        return await self.read_metadata("resolution")
 
-    def price(
+    async def price(
         self,
         asset_type: AssetType,
         asset: str,
         timestamp: int,
-    ) -> Tuple[str, Optional[Price]]:
+    ) -> Tuple[Optional[str], Optional[Price]]:
         """
         Retrieves a price record for a specific asset and timestamp.
 
@@ -746,25 +3240,20 @@ class OracleClient:
             timestamp (int): The timestamp of the price record.
 
         Returns:
-            Tuple[str, Optional[Price]]: A tuple containing the transaction hash and the price record (or None if not found).
+            Tuple[Optional[str], Optional[Price]]: A tuple containing the transaction hash and the price record (or None if not found).
         """
-        tx_hash, price = self.invoke_and_parse(
+        tx_hash, price = await self.read_and_parse(
             "price",
             [
                 self.build_asset_enum(asset_type, asset),
                 scval.to_uint64(timestamp),
             ],
         )
-        if price is not None:
-            price = {
-                "price": str(Decimal(price["price"]) / self.decimal_places_divider),  # type: ignore
-                "timestamp": price["timestamp"],  # type: ignore
-            }
-        return tx_hash, price  # type: ignore
+        return tx_hash, self.parse_price(price)
 
-    def prices(
+    async def prices(
         self, asset_type: AssetType, asset: str, records: int
-    ) -> Tuple[str, List[Price]]:
+    ) -> Tuple[Optional[str], List[Price]]:
         """
         Retrieves price records for a specific asset and number of records.
 
@@ -774,30 +3263,22 @@ class OracleClient:
             records (int): The number of records to retrieve.
 
         Returns:
-            Tuple[str, List[Price]]: A tuple containing the transaction hash and a list of price records.
+            Tuple[Optional[str], List[Price]]: A tuple containing the transaction hash and a list of price records.
         """
-        tx_hash, prices = self.invoke_and_parse(
+        tx_hash, prices = await self.read_and_parse(
             "prices",
             [
                 self.build_asset_enum(asset_type, asset),
                 scval.to_uint32(records),
             ],
         )
-        results = []
-        for price in prices:  # type: ignore
-            results.append(
-                {
-                    "price": str(Decimal(price["price"]) / self.decimal_places_divider),
-                    "timestamp": price["timestamp"],
-                }
-            )
-        return tx_hash, results
+        return tx_hash, self.parse_prices(prices)
 
-    def lastprice(
+    async def lastprice(
         self,
         asset_type: AssetType,
         asset: str,
-    ) -> Tuple[str, Optional[Price]]:
+    ) -> Tuple[Optional[str], Optional[Price]]:
         """
         Retrieves the latest price record for a specific asset.
 
@@ -806,29 +3287,162 @@ class OracleClient:
             asset (str): The asset identifier. For off-chain assets, this is an empty string. For on-chain asset, this is the Soroban asset address (Token Interface).
 
         Returns:
-            Tuple[str, Optional[Price]]: A tuple containing the transaction hash and the latest price record (or None if not found).
+            Tuple[Optional[str], Optional[Price]]: A tuple containing the transaction hash and the latest price record (or None if not found).
         """
-        tx_hash, price = self.invoke_and_parse(
+        tx_hash, price = await self.read_and_parse(
             "lastprice",
             [
                 self.build_asset_enum(asset_type, asset),
             ],
         )
-        if price is not None:
-            price = {
-                "price": str(Decimal(price["price"]) / self.decimal_places_divider),  # type: ignore
-                "timestamp": price["timestamp"],  # type: ignore
-            }
-        return tx_hash, price  # type: ignore
+        return tx_hash, self.parse_price(price)
 
-    def bump_instance(self, ledgers_to_live: int):
+    async def bump_instance(self, ledgers_to_live: int):
         """
         Bumps the contract instance.
 
         Returns:
             Tuple[str, None]: A tuple containing the transaction hash and None.
         """
-        return self.invoke_and_parse("bump_instance", [scval.to_uint32(ledgers_to_live)])  # type: ignore
+        return await self.invoke_and_parse("bump_instance", [scval.to_uint32(ledgers_to_live)])  # type: ignore
+
+    async def lastprices_by_sources(
+        self, sources: List[int], assets: List[Asset]
+    ) -> Dict[Tuple[int, AssetType, str], Optional[Price]]:
+        """
+        Retrieves the latest price record of every asset for every source,
+        fetching them concurrently (bounded by `max_concurrency`). In the
+        "ledger" read mode all records are fetched in batched getLedgerEntries
+        requests.
+
+        Args:
+            sources (List[int]): The source IDs.
+            assets (List[Asset]): The assets.
+
+        Returns:
+            Dict[Tuple[int, AssetType, str], Optional[Price]]: The latest price record (or None if not found), keyed by (source, asset_type, asset).
+        """
+        keys = [
+            (source, asset["asset_type"], asset["asset"])
+            for source in sources
+            for asset in assets
+        ]
+        if self.read_mode == "ledger":
+            try:
+                results = await self.ledger_read_many(
+                    [
+                        (
+                            "lastprice_by_source",
+                            self.build_lastprice_by_source_args(*key),
+                        )
+                        for key in keys
+                    ]
+                )
+                return {
+                    key: self.parse_price(self.parse_result(result))
+                    for key, result in zip(keys, results)
+                }
+            except LedgerLayoutMismatch as e:
+                logging.warning(
+                    f"Ledger read of lastprices failed, falling back to simulation: {e}"
+                )
+        results = await asyncio.gather(
+            *[self.lastprice_by_source(*key) for key in keys]
+        )
+        return {key: price for key, (_, price) in zip(keys, results)}
+
+
+class OracleWriterPool:
+    """
+    Fans write calls out over a pool of channel accounts. Soroban accepts one
+    transaction per source account per ledger, so batches sent through a
+    single account are serialized one ledger apart; with N channel accounts
+    up to N batches land in the same ledger. Each channel account is the
+    transaction source and pays the fees, while the admin keypair authorizes
+    every contract call. Size the pool so that all batches of a feed cycle
+    fit inside one `RESOLUTION` window.
+    """
+
+    def __init__(
+        self,
+        *,
+        admin_signer: Keypair,
+        channel_signers: List[Keypair],
+        **kwargs,
+    ):
+        """
+        Initializes an Oracle Writer Pool instance.
+
+        Args:
+            admin_signer (Keypair): The contract admin keypair, used only to authorize contract calls.
+            channel_signers (List[Keypair]): The channel account keypairs used as transaction sources.
+            **kwargs: Passed to each channel's OracleClient (contract_id, network, tx_timeout, ...).
+
+        Returns:
+            None
+        """
+        if not channel_signers:
+            raise ValueError("channel_signers must not be empty")
+        self.admin_signer = admin_signer
+        self.clients = [
+            OracleClient(signer=channel_signer, auth_signer=admin_signer, **kwargs)
+            for channel_signer in channel_signers
+        ]
+        self.idle_clients: "queue.Queue[OracleClient]" = queue.Queue()
+        for client in self.clients:
+            self.idle_clients.put(client)
+
+    def add_prices(
+        self, batches: List[List[AssetPrice]], light: bool = False
+    ) -> List[BatchResult]:
+        """
+        Adds several batches of prices in parallel, one transaction per batch.
+        A failed batch does not stop the others.
+
+        Args:
+            batches (List[List[AssetPrice]]): The price batches.
+            light (bool, optional): Use add_prices_light instead of add_prices.
+
+        Returns:
+            List[BatchResult]: The transaction hash, transaction data, error and fee charged of each batch, in the same order.
+        """
+        with ThreadPoolExecutor(max_workers=len(self.clients)) as executor:
+            return list(
+                executor.map(lambda batch: self.add_prices_batch(batch, light), batches)
+            )
+
+    def add_prices_batch(
+        self, prices: List[AssetPrice], light: bool = False
+    ) -> BatchResult:
+        client = self.idle_clients.get()
+        tx_hash = None
+        tx_data = None
+        try:
+            if light:
+                tx_hash = client.submit_add_prices_light(prices)
+            else:
+                tx_hash = client.submit_add_prices(prices)
+            tx_data = client.wait_tx(tx_hash)
+            if tx_data.status != GetTransactionStatus.SUCCESS:
+                raise RuntimeError(f"Failed to send transaction: {tx_data}")
+        except Exception as e:
+            logging.warning(
+                f"add_prices batch failed on channel {client.signer.public_key}: {e}"
+            )
+            return {
+                "tx_hash": tx_hash,
+                "tx_data": tx_data,
+                "error": e,
+                "fee_charged": get_fee_charged(tx_data),
+            }
+        finally:
+            self.idle_clients.put(client)
+        return {
+            "tx_hash": tx_hash,
+            "tx_data": tx_data,
+            "error": None,
+            "fee_charged": get_fee_charged(tx_data),
+        }
 
 
 class OracleDeployer:
@@ -841,6 +3455,7 @@ class OracleDeployer:
         custom_network_passphrase: Optional[str] = None,
         wait_tx_interval: int = 3,
         tx_timeout: int = 30,
+        wait_tx_timeout: Optional[int] = None,
     ):
         """
         Initializes an Oracle Deployer instance.
@@ -850,8 +3465,9 @@ class OracleDeployer:
             network (Network): The Stellar network to connect to (e.g., "futurenet", "testnet", "public").
             custom_rpc_url (str, optional): The custom RPC server URL. Default is None.
             custom_network_passphrase (str, optional): The custom network passphrase. Default is None.
-            wait_tx_interval (int, optional): The interval to wait for a transaction (in seconds). Default is 3 seconds.
+            wait_tx_interval (int, optional): The maximum interval between transaction status polls (in seconds). Default is 3 seconds.
             tx_timeout (int, optional): The transaction timeout (in seconds). Default is 30 seconds.
+            wait_tx_timeout (int, optional): How long to wait for a transaction confirmation before raising TransactionTimeout (in seconds). Default is tx_timeout + 30 seconds.
 
         Returns:
             None
@@ -882,6 +3498,10 @@ class OracleDeployer:
         self.signer = signer
         self.wait_tx_interval = wait_tx_interval
         self.tx_timeout = tx_timeout
+        if wait_tx_timeout is None:
+            wait_tx_timeout = tx_timeout + 30
+        self.wait_tx_timeout = wait_tx_timeout
+        self.ledger_cadence = LedgerCadence(max_interval=wait_tx_interval)
 
     def upload_contract_wasm(self, contract_wasm: Union[str, bytes]):
         """
@@ -907,13 +3527,12 @@ class OracleDeployer:
         tx.sign(self.signer)
         send_transaction_data = self.server.send_transaction(tx)
 
-        while True:
-            get_transaction_data = self.server.get_transaction(
-                send_transaction_data.hash
-            )
-            if get_transaction_data.status != GetTransactionStatus.NOT_FOUND:
-                break
-            time.sleep(self.wait_tx_interval)
+        get_transaction_data = wait_for_transactions(
+            self.server,
+            [send_transaction_data.hash],
+            self.wait_tx_timeout,
+            self.ledger_cadence,
+        )[send_transaction_data.hash]
 
         wasm_id = None
         if get_transaction_data.status == GetTransactionStatus.SUCCESS:
@@ -955,13 +3574,13 @@ class OracleDeployer:
 
         send_transaction_data = self.server.send_transaction(tx)
 
-        while True:
-            get_transaction_data = self.server.get_transaction(
-                send_transaction_data.hash
-            )
-            if get_transaction_data.status != GetTransactionStatus.NOT_FOUND:
-                break
-            time.sleep(self.wait_tx_interval)
+        # the create contract transaction is built with a 300 seconds timeout
+        get_transaction_data = wait_for_transactions(
+            self.server,
+            [send_transaction_data.hash],
+            max(self.wait_tx_timeout, 300 + 30),
+            self.ledger_cadence,
+        )[send_transaction_data.hash]
 
         if get_transaction_data.status == GetTransactionStatus.SUCCESS:
             assert get_transaction_data.result_meta_xdr is not None
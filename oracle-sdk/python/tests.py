@@ -1,17 +1,92 @@
 """
-These tests are meant to be run against an already deployed contract.
+Most of these tests are meant to be run against an already deployed contract.
 The tests assume some prices were already fed into the contract.
+
+The offline tests (from PriceEncodingTests on) need no network; the ones that
+talk to an RPC use fake_soroban_rpc.py, the local Soroban RPC stand-in of the
+CLI scripts.
 """
+import asyncio
+import importlib.util
+import sys
 import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-from stellar_sdk import Keypair
+from stellar_sdk import Keypair, StrKey, scval, xdr as stellar_xdr
+from stellar_sdk.soroban_rpc import GetTransactionStatus
 
-from lightecho_stellar_oracle import OracleClient, TESTNET_CONTRACT_XLM
+from benchmark_decode import (
+    IfChainDecoder,
+    build_asset_map_result,
+    build_price_data,
+    build_prices_result,
+)
+from lightecho_stellar_oracle import (
+    AsyncOracleClient,
+    BaseOracleClient,
+    FeeManager,
+    LedgerCadence,
+    LedgerLayoutMismatch,
+    OracleClient,
+    OracleWriterPool,
+    ResourceLimitExceeded,
+    SequenceManager,
+    TESTNET_CONTRACT_XLM,
+    TransactionTimeout,
+    decode_sc_val,
+    price_to_int,
+    wait_for_transactions,
+)
 
 CONTRACT_ID = TESTNET_CONTRACT_XLM
 SECRET = "SAES4O3NXUE2CPIB7YH3O5ROAONADPZRXOEYFC4JPLNY6STOBM2RYLGH"
 
+mod_spec = importlib.util.spec_from_file_location(
+    "fake_soroban_rpc",
+    Path(__file__).resolve().parent.parent.parent
+    / "oracle-onchain"
+    / "sep40"
+    / "cli"
+    / "scripts"
+    / "fake_soroban_rpc.py",
+)
+assert mod_spec
+fake_soroban_rpc = importlib.util.module_from_spec(mod_spec)
+sys.modules["fake_soroban_rpc"] = fake_soroban_rpc
+assert mod_spec.loader
+mod_spec.loader.exec_module(fake_soroban_rpc)
+
+
+def build_offline_client(rpc, client_class=OracleClient, **kwargs) -> OracleClient:
+    """
+    Returns a client of a random contract, signing with a random account, that
+    talks to a FakeSorobanRpc.
+    """
+    return client_class(
+        **dict(
+            {
+                "contract_id": StrKey.encode_contract(Keypair.random().raw_public_key()),
+                "signer": Keypair.random(),
+                "network": "custom",
+                "custom_rpc_url": rpc.url,
+                "custom_network_passphrase": rpc.network_passphrase,
+            },
+            **kwargs,
+        )
+    )
+
+
+def build_price(asset: str, price: str = "1.5", source: int = 0) -> dict:
+    return {
+        "source": source,
+        "asset_type": "other",
+        "asset": asset,
+        "price": price,
+        "timestamp": 600,
+    }
+
 
 class OracleTests(unittest.TestCase):
     """
@@ -87,3 +162,794 @@ class OracleTests(unittest.TestCase):
         time.sleep(10)  # avoids TRY_AGAIN_LATER error
         _, price = self.client.lastprice("other", "USD")
         self.assertNotEqual(price, None)
+
+
+class OracleSimulationTests(unittest.TestCase):
+    """
+    Same as OracleTests, but reads are answered from simulateTransaction
+    instead of sending transactions.
+    """
+    def setUp(self):
+        self.client = OracleClient(
+            contract_id=CONTRACT_ID,
+            signer=Keypair.from_secret(SECRET),
+            network="testnet",
+            read_mode="simulation",
+        )
+
+    def test_base(self):
+        tx_hash, base = self.client.base()
+        self.assertIsNone(tx_hash)
+        self.assertEqual(base, {"asset_type": "other", "asset": "XLM"})
+
+    def test_decimals(self):
+        tx_hash, decimals = self.client.decimals()
+        self.assertIsNone(tx_hash)
+        self.assertIsInstance(decimals, int)
+
+    def test_lastprice_by_source(self):
+        _, price = self.client.lastprice_by_source(0, "other", "USD")
+        self.assertIsInstance(price["price"], str)  # type: ignore
+        self.assertIsInstance(price["timestamp"], int)  # type: ignore
+
+    def test_load_metadata(self):
+        metadata = self.client.load_metadata()
+        self.assertEqual(metadata["base"], {"asset_type": "other", "asset": "XLM"})
+        self.assertEqual(self.client.decimal_places, metadata["decimals"])
+        self.assertEqual(self.client.resolution(), (None, metadata["resolution"]))
+
+    def test_prices(self):
+        _, prices = self.client.prices("other", "USD", 5)
+        self.assertGreater(len(prices), 0)
+
+
+class OracleLedgerReadTests(unittest.TestCase):
+    """
+    Same as OracleTests, but reads are answered from the contract storage
+    with getLedgerEntries.
+    """
+    def setUp(self):
+        self.client = OracleClient(
+            contract_id=CONTRACT_ID,
+            signer=Keypair.from_secret(SECRET),
+            network="testnet",
+            read_mode="ledger",
+        )
+
+    def test_lastprice_by_source(self):
+        tx_hash, price = self.client.lastprice_by_source(0, "other", "USD")
+        self.assertIsNone(tx_hash)
+        self.assertIsInstance(price["price"], str)  # type: ignore
+        self.assertIsInstance(price["timestamp"], int)  # type: ignore
+
+    def test_lastprices_by_sources(self):
+        prices = self.client.lastprices_by_sources(
+            [0], [{"asset_type": "other", "asset": "USD"}]
+        )
+        self.assertEqual(
+            prices[(0, "other", "USD")],
+            self.client.lastprice_by_source(0, "other", "USD")[1],
+        )
+
+    def test_prices(self):
+        _, prices = self.client.prices("other", "USD", 5)
+        self.assertGreater(len(prices), 0)
+
+
+class AsyncOracleTests(unittest.IsolatedAsyncioTestCase):
+    """
+    Concurrent reads through AsyncOracleClient.
+    """
+    async def asyncSetUp(self):
+        self.client = AsyncOracleClient(
+            contract_id=CONTRACT_ID,
+            signer=Keypair.from_secret(SECRET),
+            network="testnet",
+            read_mode="simulation",
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_base(self):
+        _, base = await self.client.base()
+        self.assertEqual(base, {"asset_type": "other", "asset": "XLM"})
+
+    async def test_lastprices_by_sources(self):
+        assets = [
+            {"asset_type": "other", "asset": "USD"},
+            {"asset_type": "other", "asset": "EUR"},
+        ]
+        prices = await self.client.lastprices_by_sources([0], assets)  # type: ignore
+        self.assertEqual(len(prices), 2)
+        self.assertIn((0, "other", "USD"), prices)
+
+
+class PriceEncodingTests(unittest.TestCase):
+    def test_price_to_int(self):
+        self.assertEqual(price_to_int("1.5", 4), 15000)
+        self.assertEqual(price_to_int("-0.25", 2), -25)
+        self.assertEqual(price_to_int("1E-3", 3), 1)
+        with self.assertRaises(ValueError):
+            price_to_int("0.123", 2)
+
+    def test_encode_price_columns(self):
+        client = OracleClient(
+            contract_id=CONTRACT_ID,
+            signer=Keypair.from_secret(SECRET),
+            network="testnet",
+        )
+        structs = client.encode_price_columns(
+            [0, 0], ["other", "other"], ["EUR", "BRL"], ["1.1", "0.2"], [1, None]
+        )
+        self.assertEqual(len(structs), 2)
+        self.assertEqual(
+            structs[0].to_xdr(),
+            client.build_add_prices_args(
+                [
+                    {
+                        "source": 0,
+                        "asset_type": "other",
+                        "asset": "EUR",
+                        "price": "1.1",
+                        "timestamp": 1,
+                    }
+                ]
+            )[0].vec.sc_vec[0].to_xdr(),
+        )
+
+    def test_decode_address(self):
+        account_id = Keypair.random().public_key
+        contract_id = StrKey.encode_contract(Keypair.random().raw_public_key())
+        for address in (account_id, contract_id, account_id):
+            self.assertEqual(decode_sc_val(scval.to_address(address)), address)
+
+    def test_prices_are_registered(self):
+        client = OracleClient(
+            contract_id=CONTRACT_ID,
+            signer=Keypair.from_secret(SECRET),
+            network="testnet",
+        )
+        assets = [{"asset_type": "other", "asset": "EUR"}]
+        price = {
+            "source": 0,
+            "asset_type": "other",
+            "asset": "EUR",
+            "price": "1.1",
+            "timestamp": 1,
+        }
+        self.assertTrue(client.prices_are_registered([price], assets, [0]))
+        self.assertFalse(
+            client.prices_are_registered([dict(price, source=1)], assets, [0])
+        )
+        self.assertFalse(
+            client.prices_are_registered([dict(price, asset="BRL")], assets, [0])
+        )
+
+
+class DecoderTests(unittest.TestCase):
+    """
+    The table-driven decoder against the previous one (IfChainDecoder).
+    """
+
+    def setUp(self):
+        self.client = OracleClient(
+            contract_id=CONTRACT_ID,
+            signer=Keypair.from_secret(SECRET),
+            network="testnet",
+        )
+        self.previous = IfChainDecoder()
+
+    def assert_same_result(self, result, expect_asset_map=False):
+        decoded = self.client.parse_result(result, expect_asset_map=expect_asset_map)
+        self.assertEqual(
+            decoded, self.previous.parse_result(result, expect_asset_map=expect_asset_map)
+        )
+        return decoded
+
+    def test_price_data(self):
+        for price in (0, 1, 10**18, -(10**18), 2**100, -(2**100)):
+            decoded = self.assert_same_result(build_price_data(price, 1700000000))
+            self.assertEqual(decoded, {"price": price, "timestamp": 1700000000})
+
+    def test_other_maps(self):
+        # maps that look like PriceData but take the generic path
+        for sc_map in (
+            {
+                scval.to_symbol("timestamp"): scval.to_uint64(1700000000),
+                scval.to_symbol("price"): scval.to_int128(15),
+            },
+            {
+                scval.to_symbol("price"): scval.to_uint32(15),
+                scval.to_symbol("timestamp"): scval.to_uint64(1700000000),
+            },
+            {
+                scval.to_symbol("price"): scval.to_int128(15),
+                scval.to_symbol("timestamp"): scval.to_uint64(1700000000),
+                scval.to_symbol("source"): scval.to_uint32(0),
+            },
+            {scval.to_uint32(1): scval.to_vec([scval.to_bool(True)])},
+        ):
+            self.assert_same_result(scval.to_map(sc_map))
+
+    def test_prices_result(self):
+        decoded = self.assert_same_result(build_prices_result(20))
+        self.assertEqual(len(decoded), 20)
+
+    def test_asset_map_result(self):
+        result = build_asset_map_result(20)
+        contract_id = StrKey.encode_contract(Keypair.random().raw_public_key())
+        result.map.sc_map.append(
+            stellar_xdr.SCMapEntry(
+                scval.to_enum("Stellar", scval.to_address(contract_id)),
+                build_price_data(15, 1700000000),
+            )
+        )
+        decoded = self.assert_same_result(result, expect_asset_map=True)
+        self.assertEqual(len(decoded), 21)
+        self.assertEqual(
+            decoded[("stellar", contract_id)], {"price": 15, "timestamp": 1700000000}
+        )
+        # the address cache is warm the second time
+        self.assert_same_result(result, expect_asset_map=True)
+
+    def test_scalars(self):
+        for result in (
+            scval.to_bool(False),
+            scval.to_uint32(7),
+            scval.to_int32(-7),
+            scval.to_uint64(2**64 - 1),
+            scval.to_int64(-(2**63)),
+            scval.to_uint128(2**128 - 1),
+            scval.to_int128(-(2**127)),
+            scval.to_symbol("USD"),
+            scval.to_address(Keypair.random().public_key),
+            scval.to_vec([scval.to_symbol("EUR"), scval.to_uint32(1)]),
+        ):
+            self.assert_same_result(result)
+
+    def test_void(self):
+        self.assertIsNone(self.assert_same_result(scval.to_void()))
+        # a void nested in a result fails to decode, as before
+        for result in (
+            scval.to_vec([scval.to_void()]),
+            scval.to_map({scval.to_symbol("price"): scval.to_void()}),
+        ):
+            with self.assertRaises(ValueError):
+                self.client.parse_result(result)
+            with self.assertRaises(ValueError):
+                self.previous.parse_result(result)
+
+    def test_unexpected_asset_enum(self):
+        result = build_asset_map_result(1)
+        result.map.sc_map[0].key = scval.to_enum("Fiat", scval.to_symbol("USD"))
+        with self.assertRaises(ValueError):
+            self.client.parse_result(result, expect_asset_map=True)
+        with self.assertRaises(ValueError):
+            self.previous.parse_result(result, expect_asset_map=True)
+
+
+class BaseOracleClientTests(unittest.TestCase):
+    def test_create_server_is_abstract(self):
+        class IncompleteClient(BaseOracleClient):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteClient(
+                contract_id=CONTRACT_ID,
+                signer=Keypair.from_secret(SECRET),
+                network="testnet",
+            )
+
+
+class FeeManagerTests(unittest.TestCase):
+    def test_inclusion_fee(self):
+        fee_manager = FeeManager(max_inclusion_fee=1000)
+        self.assertEqual(fee_manager.inclusion_fee(), 100)
+        fee_manager.observe_fee_stats({"sorobanInclusionFee": {"p90": "400"}})
+        self.assertEqual(fee_manager.inclusion_fee(), 400)
+        fee_manager.observe_fee_stats({"sorobanInclusionFee": {"p90": "5000"}})
+        self.assertEqual(fee_manager.inclusion_fee(), 1000)
+
+    def test_raised_inclusion_fee(self):
+        fee_manager = FeeManager(max_inclusion_fee=1000)
+        self.assertEqual(fee_manager.raised_inclusion_fee(100), 200)
+        self.assertEqual(fee_manager.raised_inclusion_fee(100, 700), 700)
+        self.assertEqual(fee_manager.raised_inclusion_fee(600), 1000)
+        self.assertIsNone(fee_manager.raised_inclusion_fee(1000))
+        self.assertEqual(fee_manager.replacement_inclusion_fee(100), 1000)
+        self.assertIsNone(fee_manager.replacement_inclusion_fee(101))
+
+
+class FeeBidTests(unittest.TestCase):
+    """
+    Resends and fee bumps against fake RPCs rejecting low fees and queueing
+    underpriced transactions, closing a ledger every 0.2s.
+    """
+
+    def start_rpc(self, **kwargs):
+        rpc = fake_soroban_rpc.FakeSorobanRpc(
+            fake_soroban_rpc.build_results(["EUR"], [0]),
+            ledger_close_time=0.2,
+            **kwargs,
+        )
+        rpc.start()
+        self.addCleanup(rpc.stop)
+        return rpc
+
+    def build_client(self, rpc, max_inclusion_fee: int) -> OracleClient:
+        client = build_offline_client(rpc, max_inclusion_fee=max_inclusion_fee)
+        client.ledger_cadence = LedgerCadence(
+            max_interval=0.5, min_interval=0.1, margin=0.05, close_interval=0.2
+        )
+        return client
+
+    def get_envelope(self, rpc, tx_hash: str) -> stellar_xdr.TransactionEnvelope:
+        return rpc.transactions[tx_hash][1]
+
+    def test_resends_with_a_higher_inclusion_fee(self):
+        rpc = self.start_rpc(min_inclusion_fee=500)
+        client = self.build_client(rpc, max_inclusion_fee=10000)
+        tx_hash = client.submit_add_prices([build_price("EUR")])
+        self.assertEqual(rpc.calls["sendTransaction"], 2)
+        # the fee stats bid 100, the rejection asks for 500
+        envelope = self.get_envelope(rpc, tx_hash)
+        self.assertEqual(envelope.v1.tx.fee.uint32, fake_soroban_rpc.RESOURCE_FEE + 500)
+        tx_data = client.wait_tx(tx_hash)
+        self.assertEqual(tx_data.status, GetTransactionStatus.SUCCESS)
+
+    def test_doesnt_resend_above_max_inclusion_fee(self):
+        rpc = self.start_rpc(min_inclusion_fee=500)
+        client = self.build_client(rpc, max_inclusion_fee=400)
+        with self.assertRaises(Exception):
+            client.submit_add_prices([build_price("EUR")])
+        # 100, then 400
+        self.assertEqual(rpc.calls["sendTransaction"], 2)
+        self.assertEqual(rpc.transactions, {})
+        # the sequence number was released
+        self.assertEqual(
+            client.sequence_manager.sequence, fake_soroban_rpc.INITIAL_SEQUENCE
+        )
+
+    def test_replaces_a_stuck_transaction_with_a_fee_bump(self):
+        rpc = self.start_rpc(queue_inclusion_fee=1000)
+        client = self.build_client(rpc, max_inclusion_fee=100000)
+        tx_hash = client.submit_add_prices([build_price("EUR")])
+        tx_data = client.wait_tx(tx_hash)
+        self.assertEqual(tx_data.status, GetTransactionStatus.SUCCESS)
+        self.assertNotIn(tx_hash, rpc.transactions)
+        (bump_hash,) = rpc.transactions
+        envelope = self.get_envelope(rpc, bump_hash)
+        self.assertIsNotNone(envelope.fee_bump)
+        inner_tx = envelope.fee_bump.tx.inner_tx.v1.tx
+        # 10 times the stuck bid, over the inner and the fee bump operation,
+        # but never below the inner fee rate
+        inner_fee = fake_soroban_rpc.RESOURCE_FEE + 100
+        self.assertEqual(inner_tx.fee.uint32, inner_fee)
+        expected_base_fee = max(
+            -(-(fake_soroban_rpc.RESOURCE_FEE + 1000 * 2) // 2), inner_fee
+        )
+        self.assertEqual(envelope.fee_bump.tx.fee.int64, expected_base_fee * 2)
+        self.assertEqual(client.fee_manager.last_fee_charged, expected_base_fee * 2)
+
+    def test_doesnt_bump_above_max_inclusion_fee(self):
+        rpc = self.start_rpc(queue_inclusion_fee=1000)
+        client = self.build_client(rpc, max_inclusion_fee=10000)
+        client.wait_tx_timeout = 2
+        tx_hash = client.submit_add_prices([build_price("EUR")])
+        with self.assertRaises(TransactionTimeout):
+            client.wait_tx(tx_hash)
+        self.assertEqual(rpc.calls["sendTransaction"], 1)
+        self.assertEqual(list(rpc.transactions), [tx_hash])
+
+
+class SequenceManagerTests(unittest.TestCase):
+    def setUp(self):
+        self.sequence_manager = SequenceManager(Keypair.random().public_key)
+
+    def test_reserve(self):
+        self.assertIsNone(self.sequence_manager.next_account())
+        self.sequence_manager.resync(100)
+        self.assertEqual(self.sequence_manager.next_account().sequence, 100)  # type: ignore
+        self.assertEqual(self.sequence_manager.next_account().sequence, 101)  # type: ignore
+        # numbers reserved locally are never handed out again
+        self.sequence_manager.resync(50)
+        self.assertEqual(self.sequence_manager.next_account().sequence, 102)  # type: ignore
+        self.sequence_manager.resync(200)
+        self.assertEqual(self.sequence_manager.next_account().sequence, 200)  # type: ignore
+
+    def test_reserve_concurrently(self):
+        self.sequence_manager.resync(0)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            sequences = list(
+                executor.map(
+                    lambda _: self.sequence_manager.next_account().sequence,  # type: ignore
+                    range(800),
+                )
+            )
+        self.assertEqual(sorted(sequences), list(range(800)))
+
+    def test_release(self):
+        self.sequence_manager.resync(100)
+        account = self.sequence_manager.next_account()
+        self.sequence_manager.release(account.sequence)  # type: ignore
+        self.assertEqual(self.sequence_manager.next_account().sequence, 100)  # type: ignore
+        # once a later number is reserved, the released one can't be reused
+        first = self.sequence_manager.next_account()
+        self.sequence_manager.next_account()
+        self.sequence_manager.release(first.sequence)  # type: ignore
+        self.assertIsNone(self.sequence_manager.next_account())
+
+    def test_invalidate(self):
+        self.sequence_manager.resync(100)
+        self.sequence_manager.invalidate()
+        self.assertIsNone(self.sequence_manager.next_account())
+
+    def test_resync_on_bad_sequence(self):
+        rpc = fake_soroban_rpc.FakeSorobanRpc(
+            fake_soroban_rpc.build_results(["EUR"], [0]), ledger_close_time=0.2
+        )
+        rpc.start()
+        try:
+            client = build_offline_client(rpc)
+            # ahead of the account on the network, as after a lost submission
+            client.sequence_manager.resync(fake_soroban_rpc.INITIAL_SEQUENCE + 5)
+            tx_hash = client.submit_add_prices([build_price("EUR")])
+            self.assertEqual(len(tx_hash), 64)
+            self.assertEqual(rpc.calls["sendTransaction"], 2)
+            self.assertEqual(
+                rpc.accounts[client.signer.public_key],
+                fake_soroban_rpc.INITIAL_SEQUENCE + 1,
+            )
+            self.assertEqual(
+                client.sequence_manager.next_account().sequence,  # type: ignore
+                fake_soroban_rpc.INITIAL_SEQUENCE + 1,
+            )
+        finally:
+            rpc.stop()
+
+
+class OracleWriterPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.rpc = fake_soroban_rpc.FakeSorobanRpc(
+            fake_soroban_rpc.build_results(["EUR", "USD", "BRL", "KES"], [0]),
+            ledger_close_time=0.2,
+        )
+        self.rpc.start()
+        self.pool = OracleWriterPool(
+            admin_signer=Keypair.random(),
+            channel_signers=[Keypair.random() for _ in range(3)],
+            contract_id=StrKey.encode_contract(Keypair.random().raw_public_key()),
+            network="custom",
+            custom_rpc_url=self.rpc.url,
+            custom_network_passphrase=self.rpc.network_passphrase,
+            wait_tx_interval=1,
+        )
+
+    def tearDown(self):
+        self.rpc.stop()
+
+    def get_tx_assets(self, tx_hash: str):
+        """
+        Returns the assets of the add_prices call of a transaction sent to the
+        fake RPC.
+        """
+        _, envelope, _ = self.rpc.transactions[tx_hash]
+        operation = envelope.v1.tx.operations[0].body.invoke_host_function_op
+        prices = operation.host_function.invoke_contract.args[0].vec.sc_vec
+        assets = []
+        for price in prices:
+            fields = {entry.key.sym.sc_symbol: entry.val for entry in price.map.sc_map}
+            assets.append(fields[b"asset"].vec.sc_vec[1].sym.sc_symbol.decode())
+        return assets
+
+    def test_results_follow_batch_order(self):
+        batches = [[build_price(asset)] for asset in ("EUR", "USD", "BRL", "KES")]
+        results = self.pool.add_prices(batches)
+        self.assertEqual([result["error"] for result in results], [None] * 4)
+        self.assertEqual(
+            [self.get_tx_assets(result["tx_hash"]) for result in results],  # type: ignore
+            [["EUR"], ["USD"], ["BRL"], ["KES"]],
+        )
+        # every batch was sent by a channel account
+        sources = {
+            fake_soroban_rpc.get_account_id(envelope.v1.tx.source_account)
+            for _, envelope, _ in self.rpc.transactions.values()
+        }
+        self.assertLessEqual(
+            sources, {client.signer.public_key for client in self.pool.clients}
+        )
+
+    def test_failed_batch_does_not_stop_the_others(self):
+        batches = [
+            [build_price("EUR")],
+            [build_price("USD", price="not a price")],
+            [build_price("BRL")],
+        ]
+        results = self.pool.add_prices(batches)
+        self.assertIsNone(results[0]["error"])
+        self.assertIsNotNone(results[1]["error"])
+        self.assertIsNone(results[1]["tx_hash"])
+        self.assertIsNone(results[2]["error"])
+        self.assertEqual(self.get_tx_assets(results[2]["tx_hash"]), ["BRL"])  # type: ignore
+        # the channel of the failed batch went back to the pool
+        self.assertEqual(self.pool.idle_clients.qsize(), len(self.pool.clients))
+
+
+class MetadataCacheTests(unittest.TestCase):
+    def test_cached_values_are_not_shared(self):
+        rpc = fake_soroban_rpc.FakeSorobanRpc(
+            fake_soroban_rpc.build_results(["EUR", "USD"], [0, 1])
+        )
+        rpc.start()
+        try:
+            client = build_offline_client(rpc, read_mode="simulation")
+            _, assets = client.assets()
+            _, sources = client.sources()
+            assets[0]["asset"] = "BRL"
+            assets.append({"asset_type": "other", "asset": "KES"})
+            sources.clear()
+            self.assertEqual(
+                client.assets(),
+                (
+                    None,
+                    [
+                        {"asset_type": "other", "asset": "EUR"},
+                        {"asset_type": "other", "asset": "USD"},
+                    ],
+                ),
+            )
+            self.assertEqual(client.sources(), (None, [0, 1]))
+            # both reads were answered from the cache
+            self.assertEqual(rpc.calls["simulateTransaction"], 2)
+        finally:
+            rpc.stop()
+
+
+class LedgerLayoutTests(unittest.TestCase):
+    def setUp(self):
+        self.client = OracleClient(
+            contract_id=CONTRACT_ID,
+            signer=Keypair.from_secret(SECRET),
+            network="testnet",
+        )
+        self.storage = {
+            "admin": scval.to_address(Keypair.random().public_key),
+            "base_asset": fake_soroban_rpc.build_asset("XLM"),
+            "decimals": scval.to_uint32(18),
+            "resolution": scval.to_uint32(600),
+            "last_timestamp": scval.to_uint64(1200),
+            "assets": scval.to_vec([fake_soroban_rpc.build_asset("USD")]),
+            "sources": scval.to_vec([scval.to_uint32(0)]),
+            "USD": scval.to_uint32(19),
+        }
+
+    def build_sc_map(self, storage):
+        return [
+            stellar_xdr.SCMapEntry(scval.to_symbol(key), value)
+            for key, value in storage.items()
+        ]
+
+    def plan(self, storage, function_name, parameters=[], check_layout=True):
+        sc_map = self.build_sc_map(storage)
+        if check_layout:
+            self.client.check_ledger_layout(sc_map)
+        keys, finish = self.client.plan_ledger_read(
+            {entry.key.to_xdr(): entry.val for entry in sc_map},
+            function_name,
+            parameters,
+        )
+        return keys, finish({})
+
+    def test_expected_layout(self):
+        usd = fake_soroban_rpc.build_asset("USD")
+        self.assertEqual(
+            self.plan(self.storage, "sources"), ([], self.storage["sources"])
+        )
+        self.assertEqual(
+            self.plan(self.storage, "read_admin"), ([], self.storage["admin"])
+        )
+        keys, _ = self.plan(self.storage, "lastprice", [usd])
+        self.assertEqual(
+            keys, [self.client.build_price_data_key(0, 19, 1200).to_xdr()]
+        )
+        # last_timestamp is an i32 until the first prices are added
+        storage = dict(self.storage, last_timestamp=scval.to_int32(0))
+        self.assertEqual(
+            self.plan(storage, "prices", [usd, scval.to_uint32(5)]),
+            ([], stellar_xdr.SCVal(stellar_xdr.SCValType.SCV_VOID)),
+        )
+
+    def test_missing_key(self):
+        for key, function_name in (
+            ("admin", "read_admin"),
+            ("assets", "assets"),
+            ("sources", "sources"),
+        ):
+            storage = dict(self.storage)
+            del storage[key]
+            with self.assertRaises(LedgerLayoutMismatch):
+                self.client.check_ledger_layout(self.build_sc_map(storage))
+            # the contract panics, so the read must not answer None or []
+            with self.assertRaises(LedgerLayoutMismatch):
+                self.plan(storage, function_name, check_layout=False)
+
+    def test_renamed_key(self):
+        storage = dict(self.storage)
+        storage["base"] = storage.pop("base_asset")
+        with self.assertRaises(LedgerLayoutMismatch):
+            self.plan(storage, "decimals")
+
+    def test_unexpected_type(self):
+        with self.assertRaises(LedgerLayoutMismatch):
+            self.plan(dict(self.storage, decimals=scval.to_uint64(18)), "decimals")
+
+    def test_falls_back_to_simulation(self):
+        # the fake RPC has no contract data, like a contract of another layout
+        rpc = fake_soroban_rpc.FakeSorobanRpc(
+            fake_soroban_rpc.build_results(["EUR"], [0])
+        )
+        rpc.start()
+        try:
+            client = build_offline_client(rpc, read_mode="ledger", metadata_ttl=None)
+            self.assertEqual(
+                client.assets(), (None, [{"asset_type": "other", "asset": "EUR"}])
+            )
+            self.assertEqual(rpc.calls["getLedgerEntries"], 1)
+            self.assertEqual(rpc.calls["simulateTransaction"], 1)
+        finally:
+            rpc.stop()
+
+
+class AddPricesSplitTests(unittest.TestCase):
+    """
+    Splitting of add_prices batches, with a submit_add_prices stub that only
+    accepts batches of up to `max_prices` prices.
+    """
+    def setUp(self):
+        self.client = OracleClient(
+            contract_id=CONTRACT_ID,
+            signer=Keypair.from_secret(SECRET),
+            network="testnet",
+        )
+        self.max_prices = 3
+        self.submitted = []
+
+        def submit_add_prices(prices, on_signed=None):
+            if len(prices) > self.max_prices:
+                raise ResourceLimitExceeded("Budget, ExceededLimit", None)
+            self.submitted.append(prices)
+            return f"tx{len(self.submitted)}"
+
+        self.client.submit_add_prices = submit_add_prices  # type: ignore
+        self.prices = [build_price(f"A{i}") for i in range(10)]
+
+    def test_oversized_batch(self):
+        tx_hashes = self.client.submit_add_prices_auto_split(self.prices)
+        self.assertEqual([len(batch) for batch in self.submitted], [3, 2, 3, 2])
+        self.assertEqual(tx_hashes, ["tx1", "tx2", "tx3", "tx4"])
+        self.assertEqual(self.client.add_prices_batch_size, 3)
+        # later batches are split to the learned size upfront
+        self.assertEqual(
+            [len(chunk) for chunk in self.client.chunk_add_prices_batch(self.prices)],
+            [3, 3, 3, 1],
+        )
+
+    def test_order_is_preserved(self):
+        self.client.submit_add_prices_auto_split(self.prices)
+        self.assertEqual(
+            [price for batch in self.submitted for price in batch], self.prices
+        )
+        self.assertEqual(
+            [
+                price
+                for chunk in self.client.chunk_add_prices_batch(self.prices)
+                for price in chunk
+            ],
+            self.prices,
+        )
+
+    def test_single_record_does_not_fit(self):
+        self.max_prices = 0
+        with self.assertRaises(ResourceLimitExceeded):
+            self.client.submit_add_prices_auto_split(self.prices[:1])
+        self.assertIsNone(self.client.split_add_prices_batch(self.prices[:1]))
+        self.assertEqual(self.submitted, [])
+
+    def test_batch_size_grows_back(self):
+        self.client.submit_add_prices_auto_split(self.prices)
+        self.max_prices = 5
+        self.client.submit_add_prices_auto_split(self.prices[:5])
+        self.assertEqual(self.client.add_prices_batch_size, 5)
+        self.assertEqual(self.client.chunk_add_prices_batch([]), [])
+
+
+class LedgerCadenceTests(unittest.TestCase):
+    def test_next_delay_follows_ledger_close(self):
+        cadence = LedgerCadence(max_interval=3, min_interval=0.5, margin=0.5, close_interval=1)
+        self.assertEqual(cadence.next_delay(), 0.5)
+        now = int(time.time())
+        self.assertTrue(cadence.observe(10, now))
+        self.assertFalse(cadence.observe(10, now))
+        # the next ledger is expected one close interval after the last one
+        self.assertAlmostEqual(
+            cadence.next_delay(), now + cadence.clock_offset + 1.5 - time.time(), 1  # type: ignore
+        )
+        self.assertTrue(cadence.observe(12, now + 6))
+        self.assertAlmostEqual(cadence.close_interval, 0.8 * 1 + 0.2 * 3)
+
+    def test_overdue_ledger_backs_off(self):
+        cadence = LedgerCadence(max_interval=3, min_interval=0.5, margin=0.5, close_interval=1)
+        now = int(time.time())
+        cadence.observe(1, now)
+        # a ledger that closed long ago, so the next one is overdue
+        cadence.observe(2, now - 100)
+        self.assertEqual(
+            [cadence.next_delay() for _ in range(5)], [0.5, 1, 2, 3, 3]
+        )
+        cadence.observe(3, now)
+        self.assertEqual(cadence.overdue_polls, 0)
+
+
+class WaitForTransactionsTests(unittest.TestCase):
+    """
+    Confirmation polling against a fake RPC closing a ledger every 0.2s.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.rpc = fake_soroban_rpc.FakeSorobanRpc(
+            fake_soroban_rpc.build_results(["EUR", "USD", "BRL"], [0]),
+            ledger_close_time=0.2,
+        )
+        cls.rpc.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.rpc.stop()
+
+    def build_cadence(self) -> LedgerCadence:
+        return LedgerCadence(max_interval=0.5, min_interval=0.1, margin=0.05, close_interval=0.2)
+
+    def test_confirms_many_transactions_in_one_loop(self):
+        client = build_offline_client(self.rpc)
+        # one transaction per account per ledger, so the submissions wait for
+        # each other's ledger
+        client.ledger_cadence = self.build_cadence()
+        tx_hashes = [
+            client.submit_add_prices([build_price(asset)])
+            for asset in ("EUR", "USD", "BRL")
+        ]
+        self.rpc.reset_calls()
+        start = time.monotonic()
+        results = wait_for_transactions(
+            client.server, tx_hashes, 5, self.build_cadence()
+        )
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(
+            {tx_hash: tx_data.status.value for tx_hash, tx_data in results.items()},
+            {tx_hash: "SUCCESS" for tx_hash in tx_hashes},
+        )
+        # at most one round of polls per ledger closed while waiting
+        self.assertLessEqual(
+            self.rpc.calls["getTransaction"], 3 * (time.monotonic() - start) / 0.2 + 3
+        )
+
+    def test_times_out(self):
+        tx_hash = "00" * 32
+        client = build_offline_client(self.rpc)
+        start = time.monotonic()
+        with self.assertRaises(TransactionTimeout) as context:
+            wait_for_transactions(client.server, [tx_hash], 1, self.build_cadence())
+        self.assertEqual(context.exception.tx_hashes, [tx_hash])
+        self.assertLess(time.monotonic() - start, 1.1)
+
+    def test_async_client_shares_the_loop(self):
+        async def add_prices():
+            async with build_offline_client(
+                self.rpc, AsyncOracleClient, wait_tx_interval=1
+            ) as client:
+                client.ledger_cadence = self.build_cadence()
+                return await client.add_prices([build_price("EUR")])
+
+        tx_hash, _ = asyncio.run(add_prices())
+        self.assertEqual(len(tx_hash), 64)